@@ -0,0 +1,120 @@
+"""
+Run the benchmark suite of boa, reporting results as JSON.
+
+Every case runs in a fresh interpreter, so that its peak RSS is
+measured alone. Examples:
+
+    python -m benchmarks --preset quick --output results.json
+    python -m benchmarks --pairs 1G:1,4K:100000 --strategies mimo --sources filepath
+"""
+
+import argparse
+import datetime
+import json
+import platform
+import shutil
+import sys
+import tempfile
+
+from benchmarks import suite
+
+import boa
+
+
+def _pairs(text):
+    pairs = []
+    for item in text.split(","):
+        size, _, count = item.partition(":")
+        pairs.append((size, int(count or 1)))
+    return pairs
+
+
+def _choices(allowed):
+    def parse(text):
+        values = tuple(value for value in text.split(",") if value)
+        for value in values:
+            if value not in allowed:
+                raise argparse.ArgumentTypeError(
+                    f"{value} not valid. Allowed are {', '.join(allowed)}"
+                )
+        return values
+
+    return parse
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description=__doc__)
+    parser.add_argument("--preset", choices=sorted(suite.PRESETS), default="quick")
+    parser.add_argument(
+        "--pairs",
+        type=_pairs,
+        help="comma separated SIZE:COUNT pairs, overriding the preset (e.g. 4K:100)",
+    )
+    parser.add_argument(
+        "--strategies", type=_choices(suite.STRATEGIES), default=suite.STRATEGIES
+    )
+    parser.add_argument(
+        "--sources", type=_choices(suite.SOURCES), default=suite.SOURCES
+    )
+    parser.add_argument(
+        "--destinations", type=_choices(suite.DESTINATIONS), default=suite.DESTINATIONS
+    )
+    parser.add_argument("--max-workers", type=int, default=1)
+    parser.add_argument("--workdir", help="where payloads are written (default: temp)")
+    parser.add_argument("--output", help="the JSON report path (default: stdout)")
+    parser.add_argument(
+        "--in-process",
+        action="store_true",
+        help="run cases in this interpreter; peak RSS is then cumulative",
+    )
+    parser.add_argument("--case", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    workdir = args.workdir or tempfile.mkdtemp(prefix="boa-bench-")
+
+    # a single case, run on behalf of run_isolated()
+    if args.case:
+        json.dump(suite.run_case(json.loads(args.case), workdir), sys.stdout)
+        return
+
+    run = suite.run_case if args.in_process else suite.run_isolated
+    cases = suite.iter_cases(
+        args.pairs or suite.PRESETS[args.preset],
+        args.strategies,
+        args.sources,
+        args.destinations,
+        args.max_workers,
+    )
+    try:
+        results = []
+        for case in cases:
+            result = run(case, workdir)
+            results.append(result)
+            print(
+                "{strategy} {source}->{destination} size={size} count={count}: "
+                "{mb_per_s:.1f} MB/s, {wall_time:.3f} s".format(**result),
+                file=sys.stderr,
+            )
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "boa": boa.__version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "date": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+import io
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import time
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from boa import Boa
+from boa.core import (
+    BytesSource,
+    CommandSource,
+    Destination,
+    FilePathDestination,
+    FilePathSource,
+    FileStreamSource,
+    Source,
+    StreamDestination,
+)
+
+try:
+    import resource
+except ImportError:  # pragma: no cover
+    resource = None
+
+STRATEGIES = ("siso", "miso", "simo", "mimo")
+SOURCES = ("bytes", "filepath", "filestream", "command")
+DESTINATIONS = ("file", "null")
+
+_UNITS = {"": 1, "K": 1024, "M": 1024**2, "G": 1024**3}
+
+# (payload size, file count) pairs swept by each preset
+PRESETS = {
+    "quick": [("1K", 1), ("1M", 1), ("64M", 1), ("4K", 100), ("4K", 1000)],
+    "full": [
+        ("1K", 1),
+        ("1M", 1),
+        ("64M", 1),
+        ("1G", 1),
+        ("4G", 1),
+        ("4K", 10),
+        ("4K", 1000),
+        ("4K", 10000),
+        ("4K", 100000),
+    ],
+}
+
+# Destinations of a simo case at most: a single source is broadcast to
+# all of them, so larger counts only measure filesystem metadata, and
+# would need more file descriptors than a stock machine allows.
+MAX_SIMO_COUNT = 1000
+
+
+def parse_size(text: str) -> int:
+    """Parse a size such as 512, 4K, 64M or 2G (powers of 1024)"""
+    text = text.strip().upper().rstrip("B")
+    unit = text[-1:] if text[-1:] in _UNITS else ""
+    return int(float(text[: len(text) - len(unit)]) * _UNITS[unit])
+
+
+class NullDestination(StreamDestination):
+    """Destination discarding its content, to measure sources alone"""
+
+    def __init__(self):
+        self.written = 0
+
+    def open(self):
+        self.written = 0
+
+    def write_chunk(self, chunk: bytes):
+        self.written += len(chunk)
+
+    def close(self):
+        return self.written
+
+
+def make_payload(dirpath: str, size: int, count: int) -> List[str]:
+    """Create count files of size bytes, with poorly compressible content"""
+    os.makedirs(dirpath, exist_ok=True)
+    block = (
+        random.Random(size).getrandbits(8 * 1024 * 1024).to_bytes(1024 * 1024, "big")
+    )
+    paths = []
+    for i in range(count):
+        path = os.path.join(dirpath, str(i))
+        paths.append(path)
+        if os.path.exists(path) and os.path.getsize(path) == size:
+            continue
+        with open(path, "wb") as f:
+            remaining = size
+            while remaining > 0:
+                view = memoryview(block)[: min(remaining, len(block))]
+                f.write(view)
+                remaining -= len(view)
+    return paths
+
+
+class _LazyFile(io.RawIOBase):
+    """Binary file opened on first read and closed at its end, not to
+    exhaust file descriptors with many file streams"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if self._file is None:
+            self._file = open(self.path, "rb", buffering=0)
+        read = self._file.readinto(buffer)
+        if not read:
+            self._file.close()
+        return read
+
+
+def _command(path: str) -> Sequence[str]:
+    if shutil.which("cat"):
+        return ["cat", path]
+    script = (
+        "import shutil, sys;"
+        "shutil.copyfileobj(open(sys.argv[1], 'rb'), sys.stdout.buffer)"
+    )
+    return [sys.executable, "-c", script, path]
+
+
+def get_source(kind: str, path: str) -> Source:
+    if kind == "bytes":
+        with open(path, "rb") as f:
+            return BytesSource(f.read())
+    if kind == "filepath":
+        return FilePathSource(path)
+    if kind == "filestream":
+        return FileStreamSource(_LazyFile(path))
+    if kind == "command":
+        return CommandSource(_command(path))
+    raise ValueError(f"Unexpected source kind {kind}")
+
+
+def get_destination(kind: str, path: str) -> Destination:
+    if kind == "file":
+        return FilePathDestination(path)
+    if kind == "null":
+        return NullDestination()
+    raise ValueError(f"Unexpected destination kind {kind}")
+
+
+def iter_cases(
+    pairs: Sequence[Tuple[str, int]],
+    strategies: Sequence[str] = STRATEGIES,
+    sources: Sequence[str] = SOURCES,
+    destinations: Sequence[str] = DESTINATIONS,
+    max_workers: int = 1,
+) -> Iterator[Dict]:
+    """
+    Iterate over the cases of a sweep.
+
+    siso only runs with a single file, and simo with MAX_SIMO_COUNT files
+    at most (larger counts are skipped).
+    """
+    for size, count in pairs:
+        for strategy in strategies:
+            if strategy == "siso" and count != 1:
+                continue
+            if strategy == "simo" and count > MAX_SIMO_COUNT:
+                continue
+            for source in sources:
+                for destination in destinations:
+                    yield {
+                        "strategy": strategy,
+                        "source": source,
+                        "destination": destination,
+                        "size": parse_size(str(size)),
+                        "count": count,
+                        "max_workers": max_workers,
+                    }
+
+
+def prepare(case: Dict, workdir: str) -> Tuple:
+    """
+    Create the sources and destinations of a case.
+
+    :return: The source(s) and destination(s) to pass to Boa.backup,
+    and the number of bytes the backup will write.
+    """
+    size, count = case["size"], case["count"]
+    inputs = make_payload(os.path.join(workdir, "in", f"{size}x{count}"), size, count)
+    outdir = os.path.join(workdir, "out")
+    shutil.rmtree(outdir, ignore_errors=True)
+    outputs = [os.path.join(outdir, str(i)) for i in range(count)]
+
+    sources = [get_source(case["source"], path) for path in inputs]
+    destinations = [get_destination(case["destination"], path) for path in outputs]
+    strategy = case["strategy"]
+    if strategy == "siso":
+        return sources[0], destinations[0], size
+    if strategy == "miso":
+        return sources, destinations[0], size * count
+    if strategy == "simo":
+        return sources[0], destinations, size * count
+    return sources, destinations, size * count
+
+
+def peak_rss() -> Optional[int]:
+    """The peak resident set size of this process, in bytes"""
+    if resource is None:  # pragma: no cover
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+def run_case(case: Dict, workdir: str) -> Dict:
+    """Run a case in this process, measuring wall time and memory"""
+    source, destination, written = prepare(case, workdir)
+    baseline = peak_rss()
+    boa = Boa(max_workers=case["max_workers"])
+
+    start = time.perf_counter()
+    boa.backup(source, destination)
+    wall_time = time.perf_counter() - start
+
+    return dict(
+        case,
+        bytes=written,
+        wall_time=wall_time,
+        mb_per_s=written / wall_time / 1e6 if wall_time else None,
+        baseline_rss=baseline,
+        peak_rss=peak_rss(),
+    )
+
+
+def run_isolated(case: Dict, workdir: str) -> Dict:
+    """Run a case in a fresh interpreter, so that peak RSS is its own"""
+    cmd = [sys.executable, "-m", "benchmarks", "--workdir", workdir, "--case"]
+    output = subprocess.run(
+        cmd + [json.dumps(case)], stdout=subprocess.PIPE, check=True
+    ).stdout
+    return json.loads(output)
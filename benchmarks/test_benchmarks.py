@@ -0,0 +1,33 @@
+"""Benchmark cases for pytest-benchmark, run with: pytest benchmarks"""
+
+import tempfile
+
+import pytest
+from benchmarks import suite
+
+pytest.importorskip("pytest_benchmark")
+
+SIZE = "1M"
+COUNT = 8
+
+
+@pytest.fixture(scope="module")
+def workdir():
+    with tempfile.TemporaryDirectory() as workdir:
+        yield workdir
+
+
+@pytest.mark.parametrize("destination", suite.DESTINATIONS)
+@pytest.mark.parametrize("source", suite.SOURCES)
+@pytest.mark.parametrize("strategy", suite.STRATEGIES)
+def test_backup(benchmark, workdir, strategy, source, destination):
+    count = 1 if strategy == "siso" else COUNT
+    (case,) = suite.iter_cases([(SIZE, count)], [strategy], [source], [destination])
+    boa = suite.Boa(max_workers=case["max_workers"])
+
+    def setup():
+        src, dst, written = suite.prepare(case, workdir)
+        benchmark.extra_info["bytes"] = written
+        return (src, dst), {}
+
+    benchmark.pedantic(boa.backup, setup=setup, rounds=5)
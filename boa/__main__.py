@@ -0,0 +1,93 @@
+import argparse
+import json
+import logging
+import signal
+import sys
+import threading
+
+from boa.scheduler import Scheduler, load_config
+
+
+def _run(args) -> int:
+    scheduler = Scheduler.from_config(load_config(args.config))
+    if args.once:
+        for name in args.once:
+            scheduler.trigger(name)
+        scheduler.join()
+        scheduler.shutdown()
+        status = scheduler.status()
+        print(json.dumps(status, indent=2))
+        return int(any(job["status"] == "failure" for job in status["jobs"]))
+
+    stop = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: stop.set())
+    scheduler.run_forever(stop)
+    return 0
+
+
+def _status(args) -> int:
+    with open(args.status_file, "r") as f:
+        status = json.load(f)
+    for job in status["jobs"]:
+        error = f" ({job['last_error']})" if job["last_error"] else ""
+        print(
+            f"{job['name']}: {job['status']}{error}, next run {job['next_run']}, "
+            f"{job['runs']} runs, {job['failures']} failed, {job['skipped']} skipped"
+        )
+    memory = status.get("memory")
+    if memory:
+        print(
+            f"memory: {memory['used']} bytes used, {memory['high_water']} at most, "
+            f"{memory['spills']} spills"
+        )
+    return 0
+
+
+def _check(args) -> int:
+    scheduler = Scheduler.from_config(load_config(args.config))
+    for name, job in scheduler.jobs.items():
+        print(f"{name}: {job.schedule.expression}, next run {job.next_run.isoformat()}")
+    scheduler.shutdown()
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m boa", description="Run backup jobs on cron-like schedules."
+    )
+    parser.add_argument(
+        "-v", "--verbose", action="store_true", help="log debug messages"
+    )
+    commands = parser.add_subparsers(dest="command")
+
+    run = commands.add_parser("run", help="run the jobs of a configuration file")
+    run.add_argument("config", help="TOML or JSON configuration file")
+    run.add_argument(
+        "--once",
+        nargs="+",
+        metavar="JOB",
+        help="run these jobs now and exit, instead of scheduling",
+    )
+    run.set_defaults(handler=_run)
+
+    status = commands.add_parser("status", help="show the status file of a scheduler")
+    status.add_argument("status_file")
+    status.set_defaults(handler=_status)
+
+    check = commands.add_parser("check", help="validate a configuration file")
+    check.add_argument("config", help="TOML or JSON configuration file")
+    check.set_defaults(handler=_check)
+
+    args = parser.parse_args(argv)
+    if args.command is None:
+        parser.error("a command is required")
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.INFO,
+        format="%(asctime)s %(name)s %(levelname)s %(message)s",
+    )
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,293 @@
+import abc
+import asyncio
+import contextlib
+import shlex
+import subprocess
+from typing import AsyncIterable, AsyncIterator, List, Optional, Sequence, Tuple
+
+from boa.core import DEFAULT_CHUNK_SIZE, STDERR_TAIL_SIZE, Destination, Source
+from boa.exception import CommandException, CommandTimeoutException
+
+
+class AsyncSource(abc.ABC):
+    """Interface for asynchronous Source objects"""
+
+    @abc.abstractmethod
+    def chunks(self, chunk_size: int = DEFAULT_CHUNK_SIZE) -> AsyncIterator[bytes]:
+        raise NotImplementedError
+
+
+class AsyncDestination(abc.ABC):
+    """Interface for asynchronous destination of backup
+
+    It follows the lifecycle of ``Destination``, with coroutines.
+    """
+
+    @abc.abstractmethod
+    async def open(self):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def write_chunk(self, chunk: bytes):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def close(self):
+        raise NotImplementedError
+
+    async def abort(self):
+        # the content is discarded, not committed by close()
+        pass
+
+    async def write(self, content: bytes):
+        return await self.write_stream(_aiter((content,)))
+
+    async def write_stream(self, chunks: AsyncIterable[bytes]):
+        """
+        Write every chunk into the destination, handling its lifecycle.
+
+        :param chunks: The content to write, as an async iterable of bytes.
+        """
+        await self.open()
+        try:
+            async for chunk in chunks:
+                await self.write_chunk(chunk)
+        except BaseException:
+            await self.abort()
+            raise
+        return await self.close()
+
+
+async def _aiter(iterable):
+    for item in iterable:
+        yield item
+
+
+class AsyncSourceAdapter(AsyncSource):
+    """Adapter running a synchronous Source in a thread"""
+
+    def __init__(self, source: Source):
+        self.source = source
+
+    async def chunks(
+        self, chunk_size: int = DEFAULT_CHUNK_SIZE
+    ) -> AsyncIterator[bytes]:
+        loop = asyncio.get_event_loop()
+        iterator = iter(self.source.chunks(chunk_size))
+        done = object()
+        try:
+            while True:
+                chunk = await loop.run_in_executor(None, next, iterator, done)
+                if chunk is done:
+                    break
+                yield chunk
+        finally:
+            # only generators have to be closed
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                await loop.run_in_executor(None, close)
+
+
+class AsyncDestinationAdapter(AsyncDestination):
+    """Adapter running a synchronous Destination in a thread"""
+
+    def __init__(self, destination: Destination):
+        self.destination = destination
+
+    async def _offload(self, func, *args):
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(None, func, *args)
+
+    async def open(self):
+        return await self._offload(self.destination.open)
+
+    async def write_chunk(self, chunk: bytes):
+        return await self._offload(self.destination.write_chunk, chunk)
+
+    async def close(self):
+        return await self._offload(self.destination.close)
+
+    async def abort(self):
+        return await self._offload(self.destination.abort)
+
+
+async def _drain(pipe: asyncio.StreamReader, tail: bytearray, limit: int):
+    """Drain a pipe, keeping only the tail of its content"""
+    while True:
+        chunk = await pipe.read(DEFAULT_CHUNK_SIZE)
+        if not chunk:
+            return
+        tail += chunk
+        del tail[:-limit]
+
+
+def _expire(process: asyncio.subprocess.Process, expired: List[bool]):
+    expired.append(True)
+    with contextlib.suppress(ProcessLookupError):
+        process.kill()
+
+
+class AsyncCommandSource(AsyncSource):
+    """Interface for Command objects, run as asyncio subprocesses"""
+
+    def __init__(
+        self,
+        args: Sequence,
+        shell: bool = False,
+        timeout: Optional[float] = None,
+        check: bool = True,
+    ):
+        """Constructor for asynchronous Command object.
+
+        The output of the command is streamed from its stdout pipe,
+        while stderr is drained concurrently.
+
+        :param args: The command to launch, a sequence or a string in shell mode
+        :param shell: Launch the command in shell mode or not
+        :param timeout: The maximum number of seconds the command may run,
+        after which it is killed
+        :param check: Raise CommandException if the command exits
+        with a non-zero status
+        """
+        self.args = args
+        self.shell = shell
+        self.timeout = timeout
+        self.check = check
+
+    async def _spawn(self) -> asyncio.subprocess.Process:
+        pipes = dict(stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        if not self.shell:
+            return await asyncio.create_subprocess_exec(*self.args, **pipes)
+        if isinstance(self.args, str):
+            cmd = self.args
+        else:
+            cmd = " ".join(shlex.quote(str(arg)) for arg in self.args)
+        return await asyncio.create_subprocess_shell(cmd, **pipes)
+
+    async def chunks(
+        self, chunk_size: int = DEFAULT_CHUNK_SIZE
+    ) -> AsyncIterator[bytes]:
+        process = await self._spawn()
+        tail = bytearray()
+        stderr = asyncio.ensure_future(_drain(process.stderr, tail, STDERR_TAIL_SIZE))
+        expired = []
+        timer = None
+        if self.timeout is not None:
+            loop = asyncio.get_event_loop()
+            timer = loop.call_later(self.timeout, _expire, process, expired)
+
+        try:
+            while True:
+                chunk = await process.stdout.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+            await process.wait()
+        finally:
+            if timer is not None:
+                timer.cancel()
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+            await stderr
+
+        if expired:
+            raise CommandTimeoutException(self.args, self.timeout, bytes(tail))
+        if self.check and process.returncode != 0:
+            raise CommandException(self.args, process.returncode, bytes(tail))
+
+
+def get_async_source(source) -> AsyncSource:
+    if isinstance(source, AsyncSource):
+        return source
+    return AsyncSourceAdapter(source)
+
+
+def get_async_destination(destination) -> AsyncDestination:
+    if isinstance(destination, AsyncDestination):
+        return destination
+    return AsyncDestinationAdapter(destination)
+
+
+async def _outcome(semaphore: Optional[asyncio.Semaphore], awaitable) -> Tuple:
+    try:
+        if semaphore is None:
+            return await awaitable, None
+        async with semaphore:
+            return await awaitable, None
+    except Exception as e:
+        return None, e
+
+
+async def chain(sources: Sequence[AsyncSource]) -> AsyncIterator[bytes]:
+    for source in sources:
+        async for chunk in source.chunks():
+            yield chunk
+
+
+async def backup_stream(
+    chunks: AsyncIterable[bytes], destination: AsyncDestination
+) -> List[Tuple]:
+    """
+    Write the chunks into a single destination.
+
+    :return: A list holding the (result, error) pair of the destination.
+    """
+    return [await _outcome(None, destination.write_stream(chunks))]
+
+
+async def broadcast(
+    chunks: AsyncIterable[bytes],
+    destinations: Sequence[AsyncDestination],
+    semaphore: Optional[asyncio.Semaphore] = None,
+) -> List[Tuple]:
+    """
+    Write every chunk into each destination, reading chunks only once.
+
+    A failing destination is aborted and dropped, while the others
+    keep receiving the content. If the chunks themselves fail,
+    every destination is aborted and the error is raised.
+
+    :return: A list of (result, error) pairs, one for each destination.
+    """
+    outcomes = [(None, None)] * len(destinations)
+    live = list(range(len(destinations)))
+
+    async def apply(method: str, *args, abort: bool = False):
+        calls = [getattr(destinations[i], method)(*args) for i in live]
+        results = await asyncio.gather(*(_outcome(semaphore, c) for c in calls))
+        for i, (result, error) in list(zip(live, results)):
+            outcomes[i] = (result, error)
+            if error is not None:
+                live.remove(i)
+                if abort:
+                    await _outcome(None, destinations[i].abort())
+
+    await apply("open")
+    try:
+        async for chunk in chunks:
+            await apply("write_chunk", chunk, abort=True)
+    except BaseException:
+        for i in live:
+            await destinations[i].abort()
+        raise
+    await apply("close")
+    return outcomes
+
+
+async def backup_pairs(
+    sources: Sequence[AsyncSource],
+    destinations: Sequence[AsyncDestination],
+    semaphore: Optional[asyncio.Semaphore] = None,
+) -> List[Tuple]:
+    """
+    Backup each source into its destination, concurrently.
+
+    :return: A list of (result, error) pairs, one for each pair.
+    """
+    return await asyncio.gather(
+        *(
+            _outcome(semaphore, destination.write_stream(source.chunks()))
+            for source, destination in zip(sources, destinations)
+        )
+    )
@@ -1,17 +1,467 @@
-from typing import List, Sequence, Tuple, Union
+import functools
+import itertools
+import os
+import time
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
 
 from boa.core import (
-    BytesSource,
     Destination,
+    FilePathDestination,
+    FilePathSource,
     Source,
     get_any_destination,
     get_any_source,
+    sync_destinations,
 )
+from boa.exception import BatchBackupException
+from boa.memory import in_waves
+from boa.resume import CHECKPOINT_INTERVAL
+from boa.tee import DEFAULT_QUEUE_SIZE
+from boa.throttle import PRIORITY_NORMAL
+
+if TYPE_CHECKING:  # pragma: no cover
+    import concurrent.futures
+
+    from boa import aio
+    from boa.metrics import Observer
+    from boa.throttle import Throttle
+
+# Optional features (containers, manifests, metrics, verification) are
+# imported once enabled, not with the application.
+
+# Destinations open at once during a sequential broadcast, the others
+# wait for their turn, not to run out of file descriptors.
+BROADCAST_WAVE_SIZE = 256
+
+
+def _outcome(func: Callable, *args) -> Tuple:
+    try:
+        return func(*args), None
+    except Exception as e:
+        return None, e
+
+
+def _future_outcome(future: "concurrent.futures.Future") -> Tuple:
+    try:
+        return future.result(), None
+    except Exception as e:
+        return None, e
+
+
+def _run(executor: Optional["concurrent.futures.Executor"], calls: Sequence[Tuple]):
+    """
+    Run every (func, *args) call, inline or through the executor.
+
+    :return: A list of (result, error) pairs, one for each call.
+    """
+    if executor is None:
+        return [_outcome(*call) for call in calls]
+    futures = [executor.submit(*call) for call in calls]
+    return [_future_outcome(future) for future in futures]
+
+
+def _default_workers() -> int:
+    """The workers of a pool given no max_workers, as ThreadPoolExecutor sizes it"""
+    return min(32, (os.cpu_count() or 1) + 4)
+
+
+def _gather(outcomes: Sequence[Tuple]) -> List:
+    """
+    Return the results of a batch, raising if any of its jobs failed.
+
+    :param outcomes: A list of (result, error) pairs.
+    """
+    results = [result for result, _ in outcomes]
+    errors = [error for _, error in outcomes]
+    failed = [error for error in errors if error is not None]
+    if failed:
+        raise BatchBackupException(results, errors) from failed[0]
+    return results
+
+
+def _single(outcomes: Sequence[Tuple]):
+    """Return the result of a single job, raising its error if it failed"""
+    ((result, error),) = outcomes
+    if error is not None:
+        raise error
+    return result
+
+
+def _broadcast(
+    chunks: Iterable[bytes],
+    destinations: Sequence[Destination],
+    observer: Optional["Observer"] = None,
+):
+    """
+    Write every chunk into each destination in turn, reading chunks only once.
+
+    A failing destination is aborted and dropped, while the others
+    keep receiving the content. If the chunks themselves fail,
+    every destination is aborted and the error is raised.
+
+    :param chunks: The content to write, as an iterable of bytes.
+    :param destinations: The destinations receiving the content.
+    :param observer: Notified of chunk writes.
+    :return: A list of (result, error) pairs, one for each destination.
+    """
+    if observer is not None:
+        from boa.metrics import ObservedDestination
+
+        destinations = [ObservedDestination(d, observer) for d in destinations]
+    outcomes = [(None, None)] * len(destinations)
+    live = list(range(len(destinations)))
+
+    def apply(method: str, *args, abort: bool = False):
+        for i in list(live):
+            result, error = _outcome(getattr(destinations[i], method), *args)
+            outcomes[i] = (result, error)
+            if error is not None:
+                live.remove(i)
+                if abort:
+                    _outcome(destinations[i].abort)
+
+    apply("open")
+    try:
+        for chunk in chunks:
+            apply("write_chunk", chunk, abort=True)
+    except BaseException:
+        for i in live:
+            destinations[i].abort()
+        raise
+    apply("close")
+    return outcomes
+
+
+def _observed(strategy: str):
+    """Report the duration and the failed destinations of a strategy"""
+
+    def decorator(method: Callable):
+        @functools.wraps(method)
+        def wrapper(self, source, destination):
+            if self.observer is None:
+                return method(self, source, destination)
+            start, error = time.perf_counter(), None
+            try:
+                return method(self, source, destination)
+            except Exception as e:
+                error = e
+                _report_errors(self.observer, destination, e)
+                raise
+            finally:
+                self.observer.finished(strategy, time.perf_counter() - start, error)
+
+        return wrapper
+
+    return decorator
+
+
+def _report_errors(observer: "Observer", destination, error: Exception):
+    if isinstance(destination, Destination):
+        observer.error(destination, error)
+    elif isinstance(error, BatchBackupException):
+        for _destination, _error in zip(destination, error.errors):
+            if _error is not None:
+                observer.error(_destination, _error)
+    else:
+        for _destination in destination:
+            observer.error(_destination, error)
 
 
 class Boa:
     """Boa is the main entry for the application"""
 
+    def __init__(
+        self,
+        max_workers: Optional[int] = 1,
+        use_processes: bool = False,
+        incremental: bool = False,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+        observer: Optional["Observer"] = None,
+        container: bool = False,
+        verify: bool = False,
+        checkpoint_interval: int = CHECKPOINT_INTERVAL,
+        throttle: Optional["Throttle"] = None,
+        priority: int = PRIORITY_NORMAL,
+    ):
+        """
+        Constructor for Boa object.
+
+        Multiple-out strategies run their jobs concurrently when more
+        than one worker is allowed: pairs go through a worker pool, while
+        broadcast destinations are each written by their own thread.
+        Every job runs even if others fail; failures are raised at the end
+        of the batch as a BatchBackupException. Broadcast destinations are
+        opened by waves, of max_workers when concurrent (else of
+        BROADCAST_WAVE_SIZE), the content read by the first wave being
+        spooled for the next ones (see ``boa.memory``).
+
+        :param max_workers: The maximum number of concurrent jobs.
+        If 1, jobs run one after another; if None, the pool default is used.
+        :param use_processes: Run multiple-in-multiple-out pairs in a process
+        pool instead of threads. Sources and destinations must be picklable,
+        and are written from the worker process.
+        :param incremental: Skip file destinations whose manifest shows
+        they already hold the current content of their file sources.
+        :param queue_size: The maximum number of chunks a concurrent
+        broadcast destination may lag behind the source.
+        :param observer: Notified of chunk reads and writes, queue waits,
+        failed destinations and finished backups (see ``boa.metrics``).
+        Pairs run in a process pool only report their failures.
+        :param container: Write multiple sources into a single destination
+        as a container (see ``boa.container``), from which members can be
+        listed and restored one by one, instead of concatenating them.
+        :param verify: Hash the content while it streams, then read back
+        the destinations (concurrently, if more than one worker is allowed)
+        and fail those whose content differs with ChecksumMismatchException.
+        The checksums of file destinations are stored next to them, in
+        sha256sum format. Destinations which can't be read back are trusted.
+        :param checkpoint_interval: The bytes written between checkpoints,
+        when a seekable source is backed up into a resumable destination
+        (see ``boa.resume``).
+        :param throttle: Limit the reads of every source, shared with
+        other Boa objects given the same throttle. Sources and destinations
+        are also limited by their own ``throttle`` attribute, if set
+        (see ``boa.throttle``). Throttled files aren't copied by the kernel.
+        :param priority: The priority of the backup for throttles,
+        see PRIORITY_URGENT, PRIORITY_NORMAL and PRIORITY_BULK.
+        """
+        self.max_workers = max_workers
+        self.use_processes = use_processes
+        self.incremental = incremental
+        self.queue_size = queue_size
+        self.observer = observer
+        self.container = container
+        self.verify = verify
+        self.checkpoint_interval = checkpoint_interval
+        self.throttle = throttle
+        self.priority = priority
+
+    def __getstate__(self):
+        # observers don't cross process boundaries
+        return dict(self.__dict__, observer=None)
+
+    def _executor(self, processes: bool = False) -> "concurrent.futures.Executor":
+        import concurrent.futures
+
+        if processes:
+            return concurrent.futures.ProcessPoolExecutor(self.max_workers)
+        return concurrent.futures.ThreadPoolExecutor(self.max_workers)
+
+    @property
+    def is_concurrent(self) -> bool:
+        return self.max_workers is None or self.max_workers > 1
+
+    def _fan_out(
+        self, chunks: Iterable[bytes], destinations: Sequence[Destination]
+    ) -> List[Tuple]:
+        if self.verify:
+            import hashlib
+
+            from boa.verify import hashed
+
+            digest = hashlib.sha256()
+            chunks = hashed(chunks, digest)
+        writers = [self._throttled(destination) for destination in destinations]
+        if self.is_concurrent:
+            from boa.tee import tee
+
+            workers = self.max_workers or _default_workers()
+            outcomes = tee(chunks, writers, self.queue_size, self.observer, workers)
+        else:
+            broadcast = functools.partial(_broadcast, observer=self.observer)
+            outcomes = in_waves(chunks, writers, BROADCAST_WAVE_SIZE, broadcast)
+        if self.verify:
+            return self._check(destinations, outcomes, digest.hexdigest())
+        return outcomes
+
+    def _check(
+        self,
+        destinations: Sequence[Destination],
+        outcomes: Sequence[Tuple],
+        checksum: str,
+    ) -> List[Tuple]:
+        """Read back the destinations written without error, failing mismatches"""
+        from boa.verify import check
+
+        written = [i for i, (_, error) in enumerate(outcomes) if error is None]
+        calls = [(check, destinations[i], checksum) for i in written]
+        if self.is_concurrent and len(calls) > 1:
+            with self._executor() as executor:
+                checked = _run(executor, calls)
+        else:
+            checked = _run(None, calls)
+
+        outcomes = list(outcomes)
+        for i, (_, error) in zip(written, checked):
+            if error is not None:
+                outcomes[i] = (None, error)
+        return outcomes
+
+    def _throttled(self, destination: Destination) -> Destination:
+        from boa.throttle import ThrottledDestination, throttles
+
+        limits = throttles(destination)
+        if not limits:
+            return destination
+        return ThrottledDestination(destination, limits, self.priority)
+
+    def _read(self, source: Source, chunks: Iterable[bytes]) -> Iterable[bytes]:
+        from boa.throttle import throttled, throttles
+
+        if self.observer is not None:
+            from boa.metrics import observe_reads
+
+            chunks = observe_reads(chunks, source, self.observer)
+        limits = throttles(source, self.throttle)
+        if limits:
+            chunks = throttled(chunks, limits, self.priority)
+        return chunks
+
+    def _written(
+        self, destination: Destination, chunks: Iterable[bytes]
+    ) -> Iterable[bytes]:
+        from boa.throttle import throttled, throttles
+
+        limits = throttles(destination)
+        if limits:
+            chunks = throttled(chunks, limits, self.priority)
+        if self.observer is not None:
+            from boa.metrics import observe_writes
+
+            chunks = observe_writes(chunks, destination, self.observer)
+        return chunks
+
+    def _chunks(self, source: Source) -> Iterable[bytes]:
+        return self._read(source, source.chunks())
+
+    def _write_stream(
+        self,
+        chunks: Iterable[bytes],
+        destination: Destination,
+        size: Optional[int] = None,
+    ):
+        if self.verify:
+            import hashlib
+
+            from boa.verify import hashed
+
+            digest = hashlib.sha256()
+            chunks = hashed(chunks, digest)
+        result = destination.write_stream(self._written(destination, chunks), size)
+        if self.verify:
+            from boa.verify import check
+
+            check(destination, digest.hexdigest())
+        return result
+
+    def _write_file(self, source: FilePathSource, destination: FilePathDestination):
+        if self.observer is None:
+            return destination.write_file(source.filepath)
+        # the kernel copy is reported as a single write
+        start = time.perf_counter()
+        result = destination.write_file(source.filepath)
+        seconds = time.perf_counter() - start
+        self.observer.write(destination, source.size(), seconds)
+        return result
+
+    def _pair(self, source: Source, destination: Destination, chunks):
+        return self._written(destination, self._read(source, chunks))
+
+    def _write_resumable(self, source: Source, destination: Destination):
+        from boa.resume import backup_resumable
+
+        wrap = functools.partial(self._pair, source, destination)
+        result, checksum = backup_resumable(
+            source, destination, self.checkpoint_interval, wrap
+        )
+        if self.verify:
+            from boa.verify import check
+
+            check(destination, checksum)
+        return result
+
+    def _merge(
+        self, sources: Sequence[Source], read: Callable[[Source], Iterable[bytes]]
+    ) -> Iterable[bytes]:
+        """Stream the content of several sources into a single destination"""
+        if self.container:
+            from boa.container import pack
+
+            return pack(sources, read=read)
+        return itertools.chain.from_iterable(read(source) for source in sources)
+
+    def _backup_incremental(
+        self,
+        sources: Sequence[Source],
+        destinations: Sequence[Destination],
+        merge: bool = False,
+    ) -> List[Tuple]:
+        """
+        Backup the sources into the destinations whose manifest is outdated.
+
+        :param merge: Merge the sources as a multiple-in strategy does.
+        :return: A list of (result, error) pairs, one for each destination;
+        skipped destinations have neither.
+        """
+        from boa.manifest import Manifest, track
+
+        manifests = [Manifest.for_destination(d) for d in destinations]
+        outcomes = [(None, None)] * len(destinations)
+        pending = []
+        for i, manifest in enumerate(manifests):
+            if manifest is None:
+                pending.append(i)
+            elif not manifest.matches(sources):
+                manifest.invalidate()
+                pending.append(i)
+        if not pending:
+            return outcomes
+
+        entries = []
+        if merge:
+            chunks = self._merge(sources, lambda s: track([s], entries, self._chunks))
+        else:
+            chunks = track(sources, entries, self._chunks)
+        written = self._fan_out(chunks, [destinations[i] for i in pending])
+        for i, (result, error) in zip(pending, written):
+            outcomes[i] = (result, error)
+            if error is None and manifests[i] is not None:
+                manifests[i].update(entries)
+        return outcomes
+
+    def _backup_pair(self, source: Source, destination: Destination):
+        from boa.resume import is_resumable
+        from boa.throttle import throttles
+
+        if self.incremental:
+            return self._backup_incremental_single_out([source], destination)
+        if is_resumable(source, destination):
+            return self._write_resumable(source, destination)
+        if (
+            not self.verify
+            and not throttles(source, destination, self.throttle)
+            and type(source) is FilePathSource
+            and isinstance(destination, FilePathDestination)
+        ):
+            # file to file, the copy can be done by the kernel
+            return self._write_file(source, destination)
+        return self._write_stream(self._chunks(source), destination, source.size())
+
+    def _backup_incremental_single_out(
+        self, sources: Sequence[Source], destination: Destination, merge: bool = False
+    ):
+        return _single(self._backup_incremental(sources, [destination], merge))
+
+    @_observed("siso")
     def backup_single_in_single_out(self, source: Source, destination: Destination):
         """
         Backup the selected source into the destination.
@@ -22,8 +472,10 @@ class Boa:
         assert isinstance(source, Source)
         assert isinstance(destination, Destination)
 
-        raw = bytes(source)
-        return destination.write(raw)
+        try:
+            return self._backup_pair(source, destination)
+        finally:
+            sync_destinations([destination])
 
     def backup_siso(self, source: Source, destination: Destination):
         """
@@ -34,6 +486,7 @@ class Boa:
         """
         return self.backup_single_in_single_out(source, destination)
 
+    @_observed("miso")
     def backup_multiple_in_single_out(
         self,
         sources: Sequence[Source],
@@ -43,7 +496,7 @@ class Boa:
         Backup the selected sources into the destination.
 
         The content will be merged across sources into
-        a single destination.
+        a single destination, concatenated or as a container.
 
         :param sources: The sources to backup.
         :param destination: The destination of backup.
@@ -52,10 +505,12 @@ class Boa:
         assert all(isinstance(source, Source) for source in sources)
         assert isinstance(destination, Destination)
 
-        raws = [bytes(source) for source in sources]
-        raw = b"".join(raws)
-        source = BytesSource(raw)
-        return self.backup_siso(source, destination)
+        try:
+            if self.incremental:
+                return self._backup_incremental_single_out(sources, destination, True)
+            return self._write_stream(self._merge(sources, self._chunks), destination)
+        finally:
+            sync_destinations([destination])
 
     def backup_miso(
         self,
@@ -73,6 +528,7 @@ class Boa:
         """
         return self.backup_multiple_in_single_out(sources, destination)
 
+    @_observed("simo")
     def backup_single_in_multiple_out(
         self,
         source: Source,
@@ -92,11 +548,12 @@ class Boa:
         assert isinstance(destinations, (Tuple, List))
         assert all(isinstance(destination, Destination) for destination in destinations)
 
-        raw = bytes(source)
-        bytesource = BytesSource(raw)
-        return [
-            self.backup_siso(bytesource, destination) for destination in destinations
-        ]
+        try:
+            if self.incremental:
+                return _gather(self._backup_incremental([source], destinations))
+            return _gather(self._fan_out(self._chunks(source), destinations))
+        finally:
+            sync_destinations(destinations)
 
     def backup_simo(
         self,
@@ -115,6 +572,7 @@ class Boa:
         """
         return self.backup_single_in_multiple_out(source, destinations)
 
+    @_observed("mimo")
     def backup_multiple_in_multiple_out(
         self,
         sources: Sequence[Source],
@@ -137,10 +595,17 @@ class Boa:
         if len(sources) != len(destinations):
             raise ValueError("Length mismatch between source and destination!")
 
-        return [
-            self.backup_siso(source, destination)
+        calls = [
+            (self._backup_pair, source, destination)
             for (source, destination) in zip(sources, destinations)
         ]
+        try:
+            if not self.is_concurrent:
+                return _gather(_run(None, calls))
+            with self._executor(self.use_processes) as executor:
+                return _gather(_run(executor, calls))
+        finally:
+            sync_destinations(destinations)
 
     def backup_mimo(
         self,
@@ -182,8 +647,63 @@ class Boa:
             else:
                 return self.backup_mimo(source, destination)
 
+    async def abackup(
+        self,
+        source: Union[Source, "aio.AsyncSource", Sequence],
+        destination: Union[Destination, "aio.AsyncDestination", Sequence],
+    ):
+        """
+        Backup the selected source(s) into the destination(s), asynchronously.
+
+        The strategy is selected as in ``backup``. Synchronous sources and
+        destinations are run in threads, and at most max_workers destinations
+        are written at once. The incremental and verify modes, and throttles,
+        are not applied.
 
-def backup(source, destination, *, return_wrappers=False):
+        :param source: The source(s) to backup.
+        :param destination: The destination(s) of backup.
+        """
+        # asyncio is only imported by asynchronous backups
+        import asyncio
+
+        from boa import aio
+
+        semaphore = asyncio.Semaphore(self.max_workers) if self.max_workers else None
+        single_in = isinstance(source, (Source, aio.AsyncSource))
+        single_out = isinstance(destination, (Destination, aio.AsyncDestination))
+
+        if not single_in and not single_out:
+            sources = [aio.get_async_source(s) for s in source]
+            destinations = [aio.get_async_destination(d) for d in destination]
+            if len(sources) != len(destinations):
+                raise ValueError("Length mismatch between source and destination!")
+            return _gather(await aio.backup_pairs(sources, destinations, semaphore))
+
+        if single_in:
+            chunks = aio.get_async_source(source).chunks()
+        else:
+            chunks = aio.chain([aio.get_async_source(s) for s in source])
+
+        if single_out:
+            _destination = aio.get_async_destination(destination)
+            return _single(await aio.backup_stream(chunks, _destination))
+        destinations = [aio.get_async_destination(d) for d in destination]
+        return _gather(await aio.broadcast(chunks, destinations, semaphore))
+
+
+def backup(
+    source,
+    destination,
+    *,
+    return_wrappers=False,
+    max_workers=1,
+    incremental=False,
+    observer=None,
+    container=False,
+    verify=False,
+    throttle=None,
+    priority=PRIORITY_NORMAL,
+):
     """
     Backup the selected source(s) into the destination(s) provided.
 
@@ -193,10 +713,25 @@ def backup(source, destination, *, return_wrappers=False):
 
     :param return_wrappers: If True, the Source and
     Destination objects will be returned.
+    :param max_workers: The maximum number of concurrent jobs.
+    :param incremental: Skip destinations already holding their sources.
+    :param observer: Notified along the backup, see ``boa.metrics``.
+    :param container: Bundle multiple sources as a container.
+    :param verify: Read back destinations, checking their content.
+    :param throttle: Limit the reads of the sources, see ``boa.throttle``.
+    :param priority: The priority of the backup for throttles.
     :param source: The source(s) to backup.
     :param destination: The destination(s) of backup.
     """
-    boa = Boa()
+    boa = Boa(
+        max_workers=max_workers,
+        incremental=incremental,
+        observer=observer,
+        container=container,
+        verify=verify,
+        throttle=throttle,
+        priority=priority,
+    )
 
     _source = get_any_source(source)
     _destination = get_any_destination(destination)
@@ -0,0 +1,337 @@
+import datetime
+import functools
+import hashlib
+import math
+import os
+import pathlib
+import uuid
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+from boa.core import DEFAULT_CHUNK_SIZE, Source, StreamDestination, iter_chunks
+
+MIN_CHUNK_SIZE = 16 * 1024
+AVG_CHUNK_SIZE = 64 * 1024
+MAX_CHUNK_SIZE = 256 * 1024
+
+RECIPE_HEADER = "boa-recipe 1\n"
+
+# The fingerprint of a position depends on the bytes up to _WINDOW before it.
+_WINDOW = 8
+# Bytes fingerprinted at once, while searching for a cut.
+_SCAN_SIZE = 64 * 1024
+_TABLE = bytes(hashlib.sha256(bytes([i])).digest()[0] for i in range(256))
+
+
+@functools.lru_cache(maxsize=None)
+def _mask(bits: int) -> int:
+    # long enough for any block searched, with its window
+    return int.from_bytes(
+        bytes([(1 << bits) - 1]) * (_SCAN_SIZE + 2 * _WINDOW), "little"
+    )
+
+
+def _fingerprints(data: bytes, bits: int) -> bytes:
+    """
+    Fingerprint every position of data at once, with big integer operations.
+
+    Byte i of the result is a hash of ``bits`` bits of the bytes from
+    i - _WINDOW to i: the bytes are mapped to random values, each value
+    is mixed with those of the previous bytes, shifted by 9 bits per byte.
+    """
+    mixed = int.from_bytes(data.translate(_TABLE), "little")
+    # the values shifted by 0 to 7 bytes and bits, xored by doubling
+    step = 9
+    while step < 9 * _WINDOW:
+        mixed ^= mixed << step
+        step *= 2
+    size = len(data)
+    masked = (mixed & _mask(bits)).to_bytes(_SCAN_SIZE + 2 * _WINDOW, "little")
+    return masked[:size]
+
+
+class Chunker:
+    """Content-defined chunker, based on rolling fingerprints
+
+    Cut points depend only on the content around them, so an insertion
+    or deletion only changes the chunks close to it. A chunk ends after
+    a run of positions with null fingerprints: fingerprints are computed
+    and searched for such runs by bytes-level operations, rather than
+    byte by byte.
+    """
+
+    def __init__(
+        self,
+        min_size: int = MIN_CHUNK_SIZE,
+        avg_size: int = AVG_CHUNK_SIZE,
+        max_size: int = MAX_CHUNK_SIZE,
+    ):
+        if not 0 < min_size < avg_size < max_size:
+            raise ValueError("Chunk sizes must satisfy 0 < min < avg < max")
+        self.min_size = min_size
+        self.max_size = max_size
+        # a cut happens with probability 1 / 2**bits after min_size
+        bits = max(1, round(math.log2(avg_size - min_size)))
+        self._run = -(-bits // 8)
+        self._bits = max(1, round(bits / self._run))
+
+        self._buffer = bytearray()
+        self._scanned = 0
+
+    def _find_cut(self) -> Optional[int]:
+        buffer, run = self._buffer, self._run
+        end = min(len(buffer), self.max_size)
+        # no cut can happen before min_size, nor in what was already searched
+        start = max(0, self.min_size - run, self._scanned - run + 1)
+        while start < end:
+            stop = min(end, start + _SCAN_SIZE)
+            # fingerprints need the window before them, then have the same
+            # value as when computed from the start of the chunk
+            base = max(0, start - _WINDOW)
+            fingerprints = _fingerprints(buffer[base:stop], self._bits)
+            found = fingerprints.find(bytes(run), start - base)
+            if found != -1:
+                return base + found + run
+            if stop == end:
+                break
+            # a run may straddle the blocks
+            start = stop - run + 1
+        if end == self.max_size:
+            return end
+
+        self._scanned = end
+        return None
+
+    def update(self, data: bytes) -> Iterator[bytes]:
+        """Feed data to the chunker, yielding every chunk completed by it"""
+        self._buffer += data
+        while True:
+            cut = self._find_cut()
+            if cut is None:
+                return
+            chunk = bytes(self._buffer[:cut])
+            del self._buffer[:cut]
+            self._scanned = 0
+            yield chunk
+
+    def finish(self) -> Iterator[bytes]:
+        """Yield the last, possibly short, chunk"""
+        if self._buffer:
+            yield bytes(self._buffer)
+        self._buffer = bytearray()
+        self._scanned = 0
+
+
+def _parse_recipe(path: pathlib.Path) -> Iterator[tuple]:
+    with open(path, "r") as f:
+        if f.readline() != RECIPE_HEADER:
+            raise ValueError(f"Invalid recipe {path.name}")
+        for line in f:
+            digest, size = line.split()
+            yield digest, int(size)
+
+
+class ChunkStore:
+    """Content-addressed store of chunks and backup recipes on filesystem
+
+    Chunks are stored once under their sha256 digest in ``chunks/``,
+    recipes list the chunks of each backup in ``recipes/``.
+    """
+
+    def __init__(self, root: Union[str, os.PathLike]):
+        self.root = pathlib.Path(root)
+
+    def chunk_path(self, digest: str) -> pathlib.Path:
+        return self.root / "chunks" / digest[:2] / digest
+
+    def recipe_path(self, name: str) -> pathlib.Path:
+        return self.root / "recipes" / name
+
+    def put(self, chunk: bytes) -> str:
+        """
+        Store a chunk, unless already present.
+
+        :return: The digest of the chunk.
+        """
+        digest = hashlib.sha256(chunk).hexdigest()
+        path = self.chunk_path(digest)
+        if not path.exists():
+            os.makedirs(path.parent, exist_ok=True)
+            # unique to the call: other threads may store the same chunk
+            tmp = path.with_name(f"{digest}.{uuid.uuid4().hex}.tmp")
+            with open(tmp, "wb") as f:
+                f.write(chunk)
+            # the content is the same whoever stores it first
+            os.replace(tmp, path)
+        return digest
+
+    def recipe(self, name: str) -> Iterator[tuple]:
+        """Iterate over the (digest, size) pairs of a recipe"""
+        return _parse_recipe(self.recipe_path(name))
+
+    def read(self, digests: Iterable[str], chunk_size: int = DEFAULT_CHUNK_SIZE):
+        """Stream the content of the chunks"""
+        for digest in digests:
+            with open(self.chunk_path(digest), "rb") as f:
+                yield from iter_chunks(f.read, chunk_size)
+
+    def recipes(self):
+        """List the names of the stored recipes"""
+        try:
+            names = os.listdir(self.root / "recipes")
+        except FileNotFoundError:
+            return []
+        # skip temporary files of backups in progress
+        return sorted(name for name in names if not name.startswith("."))
+
+
+class ChunkStoreDestination(StreamDestination):
+    """Interface for destination of backup on a deduplicating chunk store"""
+
+    def __init__(
+        self,
+        root: Union[str, os.PathLike],
+        name: Optional[str] = None,
+        min_size: int = MIN_CHUNK_SIZE,
+        avg_size: int = AVG_CHUNK_SIZE,
+        max_size: int = MAX_CHUNK_SIZE,
+        resumable: bool = False,
+    ):
+        """Constructor for ChunkStore destination object.
+
+        :param root: The directory of the chunk store.
+        :param name: The name of the recipe. If None, a UTC timestamp
+        is used at every backup.
+        :param min_size: The minimum size of a chunk.
+        :param avg_size: The expected size of a chunk.
+        :param max_size: The maximum size of a chunk.
+        :param resumable: Keep the partial recipe on failure, so that
+        a later backup can continue it (see ``boa.resume``).
+        A name is then required.
+        """
+        if resumable and name is None:
+            raise ValueError("Resumable chunk store destinations need a name")
+        self.store = ChunkStore(root)
+        self.name = name
+        self.sizes = (min_size, avg_size, max_size)
+        self.resumable = resumable
+        self.recipe_name = None
+        self._chunker = None
+        self._recipe = None
+        self._tmp = None
+        self._offset = 0
+        self._unsynced = []
+
+    @property
+    def partial_path(self) -> pathlib.Path:
+        """Where a resumable destination keeps its partial recipe"""
+        return self.store.recipe_path(f".{self.name}.partial")
+
+    def journal_path(self) -> pathlib.Path:
+        return self.store.recipe_path(f".{self.name}.partial.journal")
+
+    def _start(self, tmp: pathlib.Path, lines: Sequence[str] = ()):
+        os.makedirs(tmp.parent, exist_ok=True)
+        self._tmp = tmp
+        self._recipe = open(tmp, "w")
+        self._recipe.write(RECIPE_HEADER)
+        self._recipe.writelines(lines)
+        self._chunker = Chunker(*self.sizes)
+        self._offset = 0
+        self._unsynced = []
+
+    def open(self):
+        if self.resumable:
+            return self.reopen(0)
+        now = datetime.datetime.now(datetime.timezone.utc)
+        self.recipe_name = self.name or now.strftime("%Y%m%dT%H%M%S.%fZ")
+        path = self.store.recipe_path(self.recipe_name)
+        self._start(path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp"))
+
+    def _partial_recipe(self) -> List[Tuple[str, int]]:
+        try:
+            return list(_parse_recipe(self.partial_path))
+        except (OSError, ValueError):
+            return []
+
+    def reopen(self, offset: int):
+        """Open the partial recipe of a resumable destination at offset"""
+        self.recipe_name = self.name
+        lines, size = [], 0
+        for digest, length in self._partial_recipe():
+            if size >= offset:
+                break
+            lines.append(f"{digest} {length}\n")
+            size += length
+        if size != offset:
+            raise ValueError(f"Offset {offset} isn't a chunk boundary")
+        self._start(self.partial_path, lines)
+        self._offset = offset
+
+    def partial(self, offset: int) -> Optional[Iterator[bytes]]:
+        """The first offset bytes of the partial recipe, None if missing"""
+        digests, size = [], 0
+        for digest, length in self._partial_recipe():
+            if size >= offset:
+                break
+            digests.append(digest)
+            size += length
+        if size != offset:
+            return None
+        return self.store.read(digests)
+
+    def commit(self) -> int:
+        """
+        Make the chunks and recipe written so far durable.
+
+        :return: The size of the content referenced by the durable recipe.
+        """
+        for digest in self._unsynced:
+            with open(self.store.chunk_path(digest), "rb") as f:
+                os.fsync(f.fileno())
+        self._unsynced = []
+        self._recipe.flush()
+        os.fsync(self._recipe.fileno())
+        return self._offset
+
+    def _put(self, chunk: bytes):
+        digest = self.store.put(chunk)
+        self._recipe.write(f"{digest} {len(chunk)}\n")
+        self._offset += len(chunk)
+        if self.resumable:
+            self._unsynced.append(digest)
+
+    def write_chunk(self, chunk: bytes):
+        for piece in self._chunker.update(chunk):
+            self._put(piece)
+
+    def close(self):
+        for piece in self._chunker.finish():
+            self._put(piece)
+        self._recipe.close()
+        os.replace(self._tmp, self.store.recipe_path(self.recipe_name))
+        self._chunker = self._recipe = self._tmp = None
+        return self.recipe_name
+
+    def readback(self) -> Optional[Source]:
+        if self.recipe_name is None:
+            return None
+        return ChunkStoreSource(self.store.root, self.recipe_name)
+
+    def abort(self):
+        # stored chunks are kept, they may be shared with other recipes
+        self._recipe.close()
+        if not self.resumable:
+            os.remove(self._tmp)
+        self._chunker = self._recipe = self._tmp = None
+
+
+class ChunkStoreSource(Source):
+    """Interface for a backup stored in a chunk store, to restore it"""
+
+    def __init__(self, root: Union[str, os.PathLike], name: str):
+        self.store = ChunkStore(root)
+        self.name = name
+
+    def chunks(self, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[bytes]:
+        digests = (digest for digest, _ in self.store.recipe(self.name))
+        return self.store.read(digests, chunk_size)
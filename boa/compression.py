@@ -0,0 +1,183 @@
+import bz2
+import collections
+import concurrent.futures
+import lzma
+import os
+import zlib
+from typing import Callable, Iterable, Iterator, Optional
+
+from boa.core import DEFAULT_CHUNK_SIZE, Source
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+DEFAULT_BLOCK_SIZE = 1024 * 1024
+
+
+class Codec:
+    """A compression format whose streams can be concatenated"""
+
+    def __init__(
+        self,
+        name: str,
+        compress: Callable[[bytes, Optional[int]], bytes],
+        decompressor: Callable,
+    ):
+        """Constructor for Codec object.
+
+        :param name: The name of the codec.
+        :param compress: Compress a block into a whole stream, given a level.
+        :param decompressor: Create a decompressor for a single stream,
+        exposing decompress(), eof and unused_data.
+        """
+        self.name = name
+        self.compress = compress
+        self.decompressor = decompressor
+
+
+def _gzip_compress(block: bytes, level: Optional[int]) -> bytes:
+    # gzip header with no timestamp, so that output is reproducible
+    if level is None:
+        level = zlib.Z_DEFAULT_COMPRESSION
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return compressor.compress(block) + compressor.flush()
+
+
+def _zstd_compress(block: bytes, level: Optional[int]) -> bytes:
+    compressor = zstandard.ZstdCompressor(level=3 if level is None else level)
+    return compressor.compress(block)
+
+
+CODECS = {
+    "gzip": Codec("gzip", _gzip_compress, lambda: zlib.decompressobj(31)),
+    "bz2": Codec(
+        "bz2",
+        lambda block, level: bz2.compress(block, 9 if level is None else level),
+        bz2.BZ2Decompressor,
+    ),
+    "lzma": Codec(
+        "lzma",
+        lambda block, level: lzma.compress(block, preset=level),
+        lzma.LZMADecompressor,
+    ),
+}
+if zstandard is not None:
+    CODECS["zstd"] = Codec(
+        "zstd",
+        _zstd_compress,
+        lambda: zstandard.ZstdDecompressor().decompressobj(),
+    )
+
+
+def get_codec(codec: str) -> Codec:
+    try:
+        return CODECS[codec]
+    except KeyError:
+        available = ", ".join(sorted(CODECS))
+        raise ValueError(
+            f"Codec {codec} not available. Available are {available}"
+        ) from None
+
+
+def _blocks(chunks: Iterable[bytes], block_size: int) -> Iterator[bytes]:
+    """Regroup chunks into blocks of block_size bytes, but the last one"""
+    buffer = bytearray()
+    for chunk in chunks:
+        buffer += chunk
+        while len(buffer) >= block_size:
+            yield bytes(buffer[:block_size])
+            del buffer[:block_size]
+    if buffer:
+        yield bytes(buffer)
+
+
+class CompressedSource(Source):
+    """Decorator compressing the content of a Source
+
+    Content is split into independent blocks, compressed in parallel
+    and written one after the other: gzip, bz2, lzma (xz) and zstd
+    tools and decompressors all accept such concatenated streams.
+    """
+
+    def __init__(
+        self,
+        source: Source,
+        codec: str = "gzip",
+        level: Optional[int] = None,
+        block_size: int = DEFAULT_BLOCK_SIZE,
+        max_workers: Optional[int] = None,
+    ):
+        """Constructor for CompressedSource object.
+
+        :param source: The source to compress.
+        :param codec: One of gzip, bz2, lzma and zstd (if installed).
+        :param level: The compression level, codec default if None.
+        :param block_size: The size of independently compressed blocks.
+        :param max_workers: The number of compressing threads.
+        """
+        self.source = source
+        self.codec = get_codec(codec)
+        self.level = level
+        self.block_size = block_size
+        self.max_workers = max_workers
+
+    def _compressed_blocks(self) -> Iterator[bytes]:
+        workers = self.max_workers or os.cpu_count() or 1
+        with concurrent.futures.ThreadPoolExecutor(workers) as executor:
+            # bound the blocks in flight, yielding them in order
+            window = 2 * workers
+            pending = collections.deque()
+            chunks = self.source.chunks(DEFAULT_CHUNK_SIZE)
+            for block in _blocks(chunks, self.block_size):
+                if len(pending) >= window:
+                    yield pending.popleft().result()
+                future = executor.submit(self.codec.compress, block, self.level)
+                pending.append(future)
+            while pending:
+                yield pending.popleft().result()
+
+    def chunks(self, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[bytes]:
+        for block in self._compressed_blocks():
+            for start in range(0, len(block), chunk_size):
+                end = start + chunk_size
+                yield block[start:end]
+
+
+class DecompressedSource(Source):
+    """Decorator decompressing the content of a Source
+
+    Concatenated streams, as produced by CompressedSource, are supported.
+    """
+
+    def __init__(self, source: Source, codec: str = "gzip"):
+        """Constructor for DecompressedSource object.
+
+        :param source: The source to decompress.
+        :param codec: One of gzip, bz2, lzma and zstd (if installed).
+        """
+        self.source = source
+        self.codec = get_codec(codec)
+
+    def _decompressed(self, chunk_size: int) -> Iterator[bytes]:
+        decompressor, started = self.codec.decompressor(), False
+        for chunk in self.source.chunks(chunk_size):
+            while chunk:
+                started = True
+                raw = decompressor.decompress(chunk)
+                if raw:
+                    yield raw
+                if not decompressor.eof:
+                    break
+                # a new stream starts right after the end of the previous one
+                chunk = decompressor.unused_data
+                decompressor, started = self.codec.decompressor(), False
+        if started:
+            raise EOFError("Compressed stream ended before the end-of-stream marker")
+
+    def chunks(self, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[bytes]:
+        for raw in self._decompressed(chunk_size):
+            for start in range(0, len(raw), chunk_size):
+                end = start + chunk_size
+                yield raw[start:end]
@@ -0,0 +1,194 @@
+import collections
+import json
+import os
+import struct
+from typing import Callable, Iterable, Iterator, List, Optional, Sequence, Union
+
+from boa.core import (
+    DEFAULT_CHUNK_SIZE,
+    Destination,
+    DirectorySource,
+    FilePathSource,
+    Source,
+)
+from boa.sparse import Hole, hole_chunks, record_holes
+
+MAGIC = b"BOACONT1"
+INDEX_MAGIC = b"BOAINDEX"
+INDEX_VERSION = 2
+# Version 1 indexes have no hole maps.
+INDEX_VERSIONS = (1, 2)
+
+# Member header: magic and name length, followed by the UTF-8 name.
+MEMBER_HEADER = struct.Struct("<4sH")
+MEMBER_MAGIC = b"BOAM"
+# Footer: offset and size of the JSON index, and its magic.
+FOOTER = struct.Struct("<QQ8s")
+
+# The holes of a member are (offset, size) ranges, relative to its start.
+Member = collections.namedtuple("Member", ["name", "offset", "size", "holes"])
+Member.__new__.__defaults__ = ((),)
+
+
+def _member(name: str, offset: int, size: int, holes: Sequence = ()) -> Member:
+    return Member(name, offset, size, tuple(tuple(hole) for hole in holes))
+
+
+def member_name(source: Source, index: int) -> str:
+    """Name a member after the file or directory of its source, if any"""
+    if isinstance(source, FilePathSource):
+        path = source.filepath
+    elif isinstance(source, DirectorySource):
+        path = source.dirpath
+    else:
+        return f"member-{index}"
+    return os.path.basename(os.path.normpath(os.fspath(path)))
+
+
+def pack(
+    sources: Sequence[Source],
+    names: Optional[Sequence[str]] = None,
+    read: Optional[Callable[[Source], Iterable[bytes]]] = None,
+) -> Iterator[bytes]:
+    """
+    Stream the sources as a container, one member after another.
+
+    Every member is preceded by a header holding its name; the container
+    ends with an index of the members and a fixed size footer pointing
+    to it, so that any member can be found without reading the others.
+    Hole chunks (see boa.sparse) are recorded in the index, not stored.
+
+    :param sources: The members of the container.
+    :param names: The names of the members, see member_name() if None.
+    :param read: Get the chunks of a source, calling its chunks() if None.
+    """
+    if names is None:
+        names = [member_name(source, i) for i, source in enumerate(sources)]
+    if len(names) != len(sources):
+        raise ValueError("Length mismatch between sources and names!")
+
+    yield MAGIC
+    offset = len(MAGIC)
+    members = []
+    for source, name in zip(sources, names):
+        encoded = name.encode()
+        header = MEMBER_HEADER.pack(MEMBER_MAGIC, len(encoded)) + encoded
+        yield header
+        offset += len(header)
+
+        size = stored = 0
+        holes = []
+        chunks = source.chunks() if read is None else read(source)
+        for chunk in record_holes(chunks, holes):
+            size += len(chunk)
+            if isinstance(chunk, Hole):
+                continue
+            stored += len(chunk)
+            yield chunk
+        members.append([name, offset, size, holes])
+        offset += stored
+
+    index = json.dumps({"version": INDEX_VERSION, "members": members}).encode()
+    yield index
+    yield FOOTER.pack(offset, len(index), INDEX_MAGIC)
+
+
+class ContainerSource(Source):
+    """Interface for a container bundling several sources"""
+
+    def __init__(
+        self, sources: Sequence[Source], names: Optional[Sequence[str]] = None
+    ):
+        """Constructor for ContainerSource object.
+
+        :param sources: The members of the container.
+        :param names: The names of the members, see member_name() if None.
+        """
+        self.sources = sources
+        self.names = names
+
+    def chunks(self, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[bytes]:
+        return pack(self.sources, self.names, lambda s: s.chunks(chunk_size))
+
+
+class ContainerMemberSource(Source):
+    """Interface for a member of a container file, to restore it"""
+
+    def __init__(self, filepath: Union[str, os.PathLike], member: Member):
+        self.filepath = filepath
+        self.member = member
+
+    def size(self) -> int:
+        return self.member.size
+
+    def chunks(self, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[bytes]:
+        with open(self.filepath, "rb") as f:
+            f.seek(self.member.offset)
+            position = 0
+            # the content is stored without its holes, which are streamed as such
+            for start, size in tuple(self.member.holes) + ((self.member.size, 0),):
+                remaining = start - position
+                while remaining > 0:
+                    chunk = f.read(min(chunk_size, remaining))
+                    if not chunk:
+                        raise ValueError(f"Container {self.filepath} is truncated")
+                    remaining -= len(chunk)
+                    yield chunk
+                yield from hole_chunks(size, chunk_size)
+                position = start + size
+
+
+class Container:
+    """Reader of container files, as written by pack()"""
+
+    def __init__(self, filepath: Union[str, os.PathLike]):
+        self.filepath = filepath
+        self._members = None
+
+    def _read_index(self) -> List[Member]:
+        with open(self.filepath, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{self.filepath} is not a container")
+            end = f.seek(0, os.SEEK_END)
+            if end < len(MAGIC) + FOOTER.size:
+                raise ValueError(f"Container {self.filepath} is truncated")
+            f.seek(end - FOOTER.size)
+            offset, size, magic = FOOTER.unpack(f.read(FOOTER.size))
+            if magic != INDEX_MAGIC or offset + size != end - FOOTER.size:
+                raise ValueError(f"Container {self.filepath} has no valid index")
+            f.seek(offset)
+            index = json.loads(f.read(size))
+        if index.get("version") not in INDEX_VERSIONS:
+            raise ValueError(f"Unsupported container version {index.get('version')}")
+        return [_member(*member) for member in index["members"]]
+
+    def members(self) -> List[Member]:
+        """List the members of the container, reading only its index"""
+        if self._members is None:
+            self._members = self._read_index()
+        return self._members
+
+    def names(self) -> List[str]:
+        return [member.name for member in self.members()]
+
+    def member(self, key: Union[str, int]) -> Member:
+        """Get a member by position, or by name (the first one if repeated)"""
+        members = self.members()
+        if isinstance(key, int):
+            return members[key]
+        for member in members:
+            if member.name == key:
+                return member
+        raise KeyError(key)
+
+    def source(self, key: Union[str, int]) -> ContainerMemberSource:
+        """Get a member as a Source, reading only its own content"""
+        return ContainerMemberSource(self.filepath, self.member(key))
+
+    def read(self, key: Union[str, int]) -> bytes:
+        return bytes(self.source(key))
+
+    def extract(self, key: Union[str, int], destination: Destination):
+        """Restore a member into a destination"""
+        source = self.source(key)
+        return destination.write_stream(source.chunks(), source.size())
@@ -1,12 +1,59 @@
 import abc
+import codecs
+import fnmatch
+import functools
 import io
 import locale
 import os
 import pathlib
+import stat
 import subprocess
-from typing import List, Sequence, Tuple, Type, Union
-
-from boa.exception import InvalidDestinationException, InvalidSourceException
+import sys
+import threading
+from typing import (
+    TYPE_CHECKING,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Type,
+    Union,
+)
+
+from boa import registry
+from boa.exception import (
+    CommandException,
+    CommandTimeoutException,
+    InvalidSourceException,
+)
+from boa.memory import MemoryBudget, SpooledBuffer
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+if TYPE_CHECKING:  # pragma: no cover
+    import tarfile
+
+# Modules used by a few sources and destinations only are imported by them.
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+# Bytes of stderr kept to report the failure of a command.
+STDERR_TAIL_SIZE = 64 * 1024
+
+# I/O scheduling classes of ionice.
+IOPRIO_CLASS_BEST_EFFORT = 2
+IOPRIO_CLASS_IDLE = 3
+
+DURABILITY_NONE = "none"
+DURABILITY_FILE = "file"
+DURABILITY_BATCH = "batch"
+DURABILITIES = (DURABILITY_NONE, DURABILITY_FILE, DURABILITY_BATCH)
+
+O_BINARY = getattr(os, "O_BINARY", 0)
 
 
 def get_encoding(obj):
@@ -17,10 +64,41 @@ def get_encoding(obj):
     return encoding
 
 
+def iter_chunks(read, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[bytes]:
+    """Iterate over the results of read(chunk_size) until it returns nothing"""
+    return iter(functools.partial(read, chunk_size), b"")
+
+
 class Source(abc.ABC):
-    """Interface for Source objects"""
+    """Interface for Source objects
+
+    Content is streamed through ``chunks``, which yields bytes objects
+    of at most ``chunk_size`` bytes; ``bytes()`` collects the whole content.
+    """
+
+    def chunks(self, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[bytes]:
+        raw = bytes(self)
+        for start in range(0, len(raw), chunk_size):
+            end = start + chunk_size
+            yield raw[start:end]
 
     def __bytes__(self) -> bytes:
+        if type(self).chunks is Source.chunks:
+            raise NotImplementedError
+        return b"".join(self.chunks())
+
+    def size(self) -> Optional[int]:
+        """The expected size of the content, or None if unknown"""
+        return None
+
+    def seekable(self) -> bool:
+        """Whether chunks_from() can stream the content from any offset"""
+        return False
+
+    def chunks_from(
+        self, offset: int, chunk_size: int = DEFAULT_CHUNK_SIZE
+    ) -> Iterator[bytes]:
+        """Stream the content starting at offset, skipping what's before"""
         raise NotImplementedError
 
 
@@ -33,6 +111,9 @@ class BytesSource(Source):
     def __bytes__(self):
         return self.raw
 
+    def size(self) -> Optional[int]:
+        return len(self.raw)
+
 
 class FileSource(Source, abc.ABC):
     """Interface for File objects"""
@@ -44,8 +125,57 @@ class FilePathSource(FileSource):
     def __init__(self, filepath: Union[str, os.PathLike]):
         self.filepath = filepath
 
+    def chunks(self, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[bytes]:
+        with open(self.filepath, "rb") as f:
+            yield from iter_chunks(f.read, chunk_size)
+
     def __bytes__(self) -> bytes:
-        return open(self.filepath, "rb").read()
+        with open(self.filepath, "rb") as f:
+            return f.read()
+
+    def size(self) -> Optional[int]:
+        return os.stat(self.filepath).st_size
+
+    def seekable(self) -> bool:
+        return True
+
+    def chunks_from(
+        self, offset: int, chunk_size: int = DEFAULT_CHUNK_SIZE
+    ) -> Iterator[bytes]:
+        with open(self.filepath, "rb") as f:
+            f.seek(offset)
+            yield from iter_chunks(f.read, chunk_size)
+
+
+class MappedFilePathSource(FilePathSource):
+    """Interface for FilePath objects, memory-mapped
+
+    Chunks are memoryview slices of the mapping, so content
+    is not copied into Python bytes objects while streamed.
+    """
+
+    def chunks(self, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[memoryview]:
+        import mmap
+
+        with open(self.filepath, "rb") as f:
+            if not os.fstat(f.fileno()).st_size:
+                return
+            mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if hasattr(mapping, "madvise"):
+            mapping.madvise(mmap.MADV_SEQUENTIAL)
+
+        view = memoryview(mapping)
+        try:
+            for start in range(0, len(view), chunk_size):
+                end = start + chunk_size
+                yield view[start:end]
+        finally:
+            try:
+                view.release()
+                mapping.close()
+            except BufferError:
+                # some chunks are still referenced, they keep the mapping open
+                pass
 
 
 class FileStreamSource(FileSource):
@@ -55,17 +185,64 @@ class FileStreamSource(FileSource):
         self, filestream: Union[io.RawIOBase, io.BufferedIOBase, io.TextIOBase]
     ):
         self.filestream = filestream
-
-    def __bytes__(self) -> bytes:
-        content = self.filestream.read()
-        if not content:
-            return b""
-        if isinstance(content, str):
-            encoding = get_encoding(self.filestream)
-            raw = bytes(content, encoding=encoding)
-        else:
-            raw = bytes(content)
-        return raw
+        self._origin = None
+
+    def seekable(self) -> bool:
+        # offsets in text streams aren't byte offsets
+        if isinstance(self.filestream, io.TextIOBase):
+            return False
+        return self.filestream.seekable()
+
+    def chunks_from(
+        self, offset: int, chunk_size: int = DEFAULT_CHUNK_SIZE
+    ) -> Iterator[bytes]:
+        # offsets are relative to the position of the stream when first seeked
+        if self._origin is None:
+            self._origin = self.filestream.tell()
+        self.filestream.seek(self._origin + offset)
+        return self.chunks(chunk_size)
+
+    def chunks(self, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[bytes]:
+        encoder = None
+        while True:
+            content = self.filestream.read(chunk_size)
+            if not content:
+                break
+            if isinstance(content, str):
+                if encoder is None:
+                    encoding = get_encoding(self.filestream)
+                    encoder = codecs.getincrementalencoder(encoding)()
+                raw = encoder.encode(content)
+            else:
+                raw = bytes(content)
+            if raw:
+                yield raw
+        if encoder is not None:
+            raw = encoder.encode("", final=True)
+            if raw:
+                yield raw
+
+
+def _expire(process: subprocess.Popen, expired: threading.Event):
+    expired.set()
+    process.kill()
+
+
+class _PipeDrain(threading.Thread):
+    """Thread draining a pipe, keeping only the tail of its content"""
+
+    def __init__(self, pipe, limit: int):
+        super().__init__(daemon=True)
+        self.pipe = pipe
+        self.limit = limit
+        self.tail = bytearray()
+
+    def run(self):
+        for chunk in iter_chunks(self.pipe.read1):
+            self.tail += chunk
+            excess = len(self.tail) - self.limit
+            if excess > 0:
+                del self.tail[:excess]
 
 
 class CommandSource(Source):
@@ -76,96 +253,716 @@ class CommandSource(Source):
         args: Sequence,
         destination: Union[None, str, os.PathLike] = None,
         shell: bool = False,
+        timeout: Optional[float] = None,
+        check: bool = True,
+        nice: Optional[int] = None,
+        ionice: Optional[int] = None,
+        ionice_level: Optional[int] = None,
     ):
         """Constructor for Command object. It follows the structure of subprocess.run() call
 
+        The output of the command is streamed from its stdout pipe,
+        while stderr is drained concurrently.
+
         :param args: The command to launch, must be sequence-like
         :param destination: The filepath destination of the command.
-        If None, stdout will be used
+        If set, the output is also written there while streamed
         :param shell: Launch the command in shell mode or not
+        :param timeout: The maximum number of seconds the command may run,
+        after which it is killed
+        :param check: Raise CommandException if the command exits
+        with a non-zero status
+        :param nice: The niceness added to the command, with ``nice``
+        :param ionice: The I/O scheduling class of the command, with ``ionice``
+        where available: IOPRIO_CLASS_BEST_EFFORT or IOPRIO_CLASS_IDLE
+        :param ionice_level: The priority within the best-effort class,
+        from 0 (highest) to 7
         """
         self.args = args
         self.destination = destination
         self.shell = shell
-
-    def __bytes__(self) -> bytes:
-        destination = (
-            open(self.destination, "wb") if self.destination else subprocess.PIPE
-        )
-        status = subprocess.run(
-            self.args, stdout=destination, stderr=subprocess.PIPE, shell=self.shell
+        self.timeout = timeout
+        self.check = check
+        self.nice = nice
+        self.ionice = ionice
+        self.ionice_level = ionice_level
+
+    def _command(self):
+        """The command to launch, prefixed by nice and ionice if requested"""
+        import shutil
+
+        prefix = []
+        if self.ionice is not None and shutil.which("ionice"):
+            prefix += ["ionice", "-c", str(self.ionice)]
+            if self.ionice_level is not None:
+                prefix += ["-n", str(self.ionice_level)]
+        if self.nice is not None and shutil.which("nice"):
+            prefix += ["nice", "-n", str(self.nice)]
+        if not prefix:
+            return self.args, self.shell
+        if self.shell:
+            # as Popen does, with priorities inherited by the shell processes
+            args = [self.args] if isinstance(self.args, (str, bytes)) else self.args
+            return prefix + ["/bin/sh", "-c", *args], False
+        return prefix + [os.fspath(arg) for arg in self.args], False
+
+    def _stream(self, process: subprocess.Popen, chunk_size: int):
+        if not self.destination:
+            yield from iter_chunks(process.stdout.read, chunk_size)
+            return
+        with open(self.destination, "wb") as f:
+            for chunk in iter_chunks(process.stdout.read, chunk_size):
+                f.write(chunk)
+                yield chunk
+
+    def chunks(self, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[bytes]:
+        args, shell = self._command()
+        process = subprocess.Popen(
+            args,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            shell=shell,
         )
-        raw = open(self.destination, "rb").read() if self.destination else status.stdout
-        return raw
+        stderr = _PipeDrain(process.stderr, STDERR_TAIL_SIZE)
+        stderr.start()
+        expired = threading.Event()
+        timer = None
+        if self.timeout is not None:
+            timer = threading.Timer(self.timeout, _expire, (process, expired))
+            timer.start()
+
+        try:
+            yield from self._stream(process, chunk_size)
+            returncode = process.wait()
+        finally:
+            if timer is not None:
+                timer.cancel()
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+            stderr.join()
+            process.stdout.close()
+            process.stderr.close()
+
+        if expired.is_set():
+            raise CommandTimeoutException(self.args, self.timeout, bytes(stderr.tail))
+        if self.check and returncode != 0:
+            raise CommandException(self.args, returncode, bytes(stderr.tail))
+
+
+class _DirEntry:
+    """Metadata of a directory entry, collected by scanning threads"""
+
+    __slots__ = ("path", "arcname", "stat", "is_dir", "linkname")
+
+    def __init__(self, entry: os.DirEntry, arcname: str):
+        self.path = entry.path
+        self.arcname = arcname
+        self.stat = entry.stat(follow_symlinks=False)
+        self.is_dir = entry.is_dir(follow_symlinks=False)
+        self.linkname = os.readlink(entry.path) if entry.is_symlink() else None
+
+    def tarinfo(self) -> Optional["tarfile.TarInfo"]:
+        import tarfile
+
+        info = tarfile.TarInfo(self.arcname)
+        info.mode = stat.S_IMODE(self.stat.st_mode)
+        info.mtime = int(self.stat.st_mtime)
+        info.uid, info.gid = self.stat.st_uid, self.stat.st_gid
+        if self.linkname is not None:
+            info.type = tarfile.SYMTYPE
+            info.linkname = self.linkname
+        elif self.is_dir:
+            info.type = tarfile.DIRTYPE
+        elif stat.S_ISREG(self.stat.st_mode):
+            info.size = self.stat.st_size
+        else:
+            return None
+        return info
+
+
+def _tar_member_chunks(f, size: int, chunk_size: int) -> Iterator[bytes]:
+    """Stream exactly size bytes of f, padded to a whole number of tar blocks"""
+    import tarfile
+
+    remaining = size
+    while remaining > 0:
+        chunk = f.read(min(chunk_size, remaining))
+        if not chunk:
+            # the file shrank after being scanned
+            break
+        remaining -= len(chunk)
+        yield chunk
+    padding = remaining + (-size % tarfile.BLOCKSIZE)
+    if padding:
+        yield tarfile.NUL * padding
+
+
+class DirectorySource(Source):
+    """Interface for Directory objects, streamed as a tar archive"""
+
+    def __init__(
+        self,
+        dirpath: Union[str, os.PathLike],
+        include: Sequence[str] = (),
+        exclude: Sequence[str] = (),
+        max_workers: Optional[int] = None,
+    ):
+        """Constructor for Directory object.
+
+        Members are named relative to the directory. Glob patterns
+        are matched against these names, which use "/" as separator.
+        Directories are always archived unless excluded, in which case
+        they are not walked at all.
+
+        :param dirpath: The directory to backup.
+        :param include: If given, only files matching a pattern are archived.
+        :param exclude: Files and directories matching a pattern are skipped.
+        :param max_workers: The number of threads scanning directories.
+        """
+        self.dirpath = dirpath
+        self.include = include
+        self.exclude = exclude
+        self.max_workers = max_workers
+
+    def _included(self, entry: _DirEntry) -> bool:
+        if not self.include or entry.is_dir:
+            return True
+        return any(fnmatch.fnmatchcase(entry.arcname, p) for p in self.include)
+
+    def _scan(self, dirpath: str, relpath: str) -> List[_DirEntry]:
+        with os.scandir(dirpath) as it:
+            entries = sorted(it, key=lambda entry: entry.name)
+        scanned = []
+        for entry in entries:
+            arcname = f"{relpath}/{entry.name}" if relpath else entry.name
+            if any(fnmatch.fnmatchcase(arcname, p) for p in self.exclude):
+                continue
+            scanned.append(_DirEntry(entry, arcname))
+        return scanned
+
+    def _walk_scanned(self, executor, scan) -> Iterator[_DirEntry]:
+        entries = scan.result()
+        # scan subdirectories ahead, while entries are yielded in order
+        scans = {
+            entry.path: executor.submit(self._scan, entry.path, entry.arcname)
+            for entry in entries
+            if entry.is_dir
+        }
+        for entry in entries:
+            yield entry
+            if entry.is_dir:
+                yield from self._walk_scanned(executor, scans[entry.path])
+
+    def _walk(self) -> Iterator[_DirEntry]:
+        """Iterate over the directory tree, in depth-first sorted order"""
+        import concurrent.futures
+
+        with concurrent.futures.ThreadPoolExecutor(self.max_workers) as executor:
+            root = executor.submit(self._scan, os.fspath(self.dirpath), "")
+            yield from self._walk_scanned(executor, root)
+
+    def _members(self, chunk_size: int) -> Iterator[bytes]:
+        import tarfile
+
+        for entry in self._walk():
+            info = entry.tarinfo()
+            if info is None or not self._included(entry):
+                continue
+            if not info.isreg():
+                yield info.tobuf(tarfile.PAX_FORMAT, "utf-8", "surrogateescape")
+                continue
+            try:
+                f = open(entry.path, "rb")
+            except FileNotFoundError:
+                # the file was removed after being scanned
+                continue
+            with f:
+                yield info.tobuf(tarfile.PAX_FORMAT, "utf-8", "surrogateescape")
+                yield from _tar_member_chunks(f, info.size, chunk_size)
+
+    def chunks(self, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[bytes]:
+        import tarfile
+
+        size = 0
+        for chunk in self._members(chunk_size):
+            size += len(chunk)
+            yield chunk
+        # end of archive marker, padded to a whole record as tarfile does
+        size += 2 * tarfile.BLOCKSIZE
+        yield tarfile.NUL * (2 * tarfile.BLOCKSIZE + (-size % tarfile.RECORDSIZE))
+
+
+class Buffer(Source):
+    """Decorator for buffering Sources, in memory within the budget
+
+    The content is read once, and held in a SpooledBuffer: beyond the
+    memory budget of the process, it spills to a temporary file.
+    """
+
+    def __init__(self, source: Source, budget: Optional[MemoryBudget] = None):
+        """Constructor for Buffer object.
+
+        :param source: The source to buffer, read at once.
+        :param budget: The memory budget, see boa.memory.get_budget() if None.
+        """
+        self.buffer = SpooledBuffer(budget)
+        for chunk in source.chunks():
+            self.buffer.write(chunk)
+
+    def chunks(self, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[bytes]:
+        return self.buffer.chunks(chunk_size)
 
+    def __bytes__(self) -> bytes:
+        return bytes(self.buffer.getvalue())
 
-class Buffer(BytesSource):
-    """Decorator for buffering Sources in memory"""
+    def size(self) -> Optional[int]:
+        return self.buffer.size
 
-    def __init__(self, source: Source):
-        raw = bytes(source)
-        super().__init__(raw)
+    def close(self):
+        """Give back the memory of the content, which can't be read anymore"""
+        self.buffer.close()
 
 
 class Destination(abc.ABC):
-    """Interface for destination of backup"""
+    """Interface for destination of backup
+
+    Content is either written at once with ``write`` or streamed through
+    the ``open``, ``write_chunk`` and ``close`` lifecycle (``abort`` replaces
+    ``close`` on failure). By default chunks are collected in a SpooledBuffer
+    (in memory within the budget of the process, else in a temporary file)
+    and handed to ``write`` on close, so destinations implementing only
+    ``write`` can still be used as streaming targets. ``write`` always gets
+    bytes: a spilled content is read back in memory at once, so large
+    streams should go to destinations implementing ``write_chunk``.
+    """
+
+    def open(self):
+        self._buffer = SpooledBuffer()
+
+    def write_chunk(self, chunk: bytes):
+        self._buffer.write(chunk)
+
+    def close(self):
+        buffer, self._buffer = self._buffer, None
+        with buffer:
+            content = buffer.getvalue()
+            if not isinstance(content, bytes):
+                # the mapping of a spilled buffer doesn't outlive it
+                content = bytes(content)
+            return self.write(content)
+
+    def abort(self):
+        buffer, self._buffer = self._buffer, None
+        if buffer is not None:
+            buffer.close()
+
+    def preallocate(self, size: int):
+        """Hint the size of the content about to be written, once opened"""
+
+    def readback(self) -> Optional[Source]:
+        """The content last written, as a Source, or None if it can't be read"""
+        return None
 
     def write(self, content: bytes):
         raise NotImplementedError
 
+    def write_stream(self, chunks: Iterable[bytes], size: Optional[int] = None):
+        """
+        Write every chunk into the destination, handling its lifecycle.
 
-class FilePathDestination(Destination):
-    """Interface for destination of backup on filesystem"""
+        :param chunks: The content to write, as an iterable of bytes.
+        :param size: The expected size of the content, if known.
+        """
+        self.open()
+        try:
+            if size:
+                self.preallocate(size)
+            for chunk in chunks:
+                self.write_chunk(chunk)
+        except BaseException:
+            self.abort()
+            raise
+        return self.close()
+
+
+class StreamDestination(Destination, abc.ABC):
+    """Interface for destinations receiving content incrementally
+
+    On failure, ``abort`` leaves the content uncommitted: by default it does
+    nothing, and destinations holding resources release them there.
+    """
+
+    @abc.abstractmethod
+    def open(self):
+        raise NotImplementedError
 
-    def __init__(self, filepath: Union[str, os.PathLike]):
-        self.filepath = pathlib.Path(filepath)
+    @abc.abstractmethod
+    def write_chunk(self, chunk: bytes):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def close(self):
+        raise NotImplementedError
+
+    def abort(self):
+        pass
 
     def write(self, content: bytes):
-        os.makedirs(self.filepath.parent, exist_ok=True)
-        with open(self.filepath, "wb") as f:
-            f.write(content)
+        return self.write_stream((content,))
+
+
+# ioctl cloning a whole file on copy-on-write filesystems (Linux).
+FICLONE = 0x40049409
+# Bytes requested by each kernel copy call.
+_KERNEL_COPY_SIZE = 1024 * 1024 * 1024
+
+
+def _reflink(src_fd: int, dst_fd: int) -> bool:
+    if fcntl is None or not sys.platform.startswith("linux"):
+        return False
+    try:
+        fcntl.ioctl(dst_fd, FICLONE, src_fd)
+    except OSError:
+        return False
+    return True
+
+
+def _copy_file_range(src_fd: int, dst_fd: int, offset: int) -> int:
+    return os.copy_file_range(src_fd, dst_fd, _KERNEL_COPY_SIZE, offset)
+
+
+def _sendfile(src_fd: int, dst_fd: int, offset: int) -> int:
+    return os.sendfile(dst_fd, src_fd, offset, _KERNEL_COPY_SIZE)
+
+
+def _kernel_copy(copy, src_fd: int, dst_fd: int, offset: int) -> int:
+    """
+    Copy src_fd from offset into dst_fd, with a kernel copy function.
+
+    :param copy: copy(src_fd, dst_fd, offset) returning the bytes copied.
+    :return: The offset reached: the end of file, unless
+    the function doesn't support these files.
+    """
+    while True:
+        try:
+            copied = copy(src_fd, dst_fd, offset)
+        except OSError:
+            return offset
+        if not copied:
+            return offset
+        offset += copied
+
+
+def copy_fd(src_fd: int, dst_fd: int, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    """
+    Copy the content of a file into another one.
+
+    The fastest available way is used: a reflink on copy-on-write
+    filesystems, then copy_file_range or sendfile, which move data
+    within the kernel, and finally a plain read/write loop.
+
+    :param src_fd: The descriptor of the file to copy.
+    :param dst_fd: The descriptor of the file to write, empty and at position 0.
+    """
+    if _reflink(src_fd, dst_fd):
+        return
+
+    # kernel copies write at the position of dst_fd, moving it forward
+    offset = 0
+    if hasattr(os, "copy_file_range"):
+        offset = _kernel_copy(_copy_file_range, src_fd, dst_fd, offset)
+    if hasattr(os, "sendfile") and sys.platform.startswith("linux"):
+        offset = _kernel_copy(_sendfile, src_fd, dst_fd, offset)
+
+    os.lseek(src_fd, offset, os.SEEK_SET)
+    for chunk in iter_chunks(functools.partial(os.read, src_fd), chunk_size):
+        view = memoryview(chunk)
+        while view:
+            written = os.write(dst_fd, view)
+            view = view[written:]
+
+
+def _read_range(filepath, size: int, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    """Stream the first size bytes of a file"""
+    with open(filepath, "rb") as f:
+        while size > 0:
+            chunk = f.read(min(chunk_size, size))
+            if not chunk:
+                return
+            size -= len(chunk)
+            yield chunk
+
+
+def _fsync_dir(dirpath: Union[str, os.PathLike]):
+    if sys.platform == "win32":  # pragma: no cover
+        # directories can't be opened, renames are durable anyway
+        return
+    fd = os.open(dirpath, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class FilePathDestination(StreamDestination):
+    """Interface for destination of backup on filesystem
+
+    Content is written into a temporary file next to the target, which
+    atomically replaces it once complete: a failed or interrupted backup
+    never destroys the previous copy.
+    """
+
+    def __init__(
+        self,
+        filepath: Union[str, os.PathLike],
+        durability: str = DURABILITY_NONE,
+        resumable: bool = False,
+    ):
+        """Constructor for FilePath destination object.
+
+        :param filepath: The file to write.
+        :param durability: When content is flushed to disk. One of:
+        DURABILITY_NONE, leaving it to the operating system;
+        DURABILITY_FILE, syncing the file and its directory on close;
+        DURABILITY_BATCH, staging the file on close, to be synced and
+        moved into place at the end of the Boa strategy together with
+        the others, by sync_destinations() (which callers writing the
+        destination themselves must call).
+        :param resumable: Write into a partial file kept on failure,
+        so that a later backup can continue it (see ``boa.resume``).
+        """
+        if durability not in DURABILITIES:
+            raise ValueError(
+                f"Durability not valid ({durability}). "
+                f"Allowed are {', '.join(DURABILITIES)}"
+            )
+        self.filepath = pathlib.Path(filepath)
+        self.durability = durability
+        self.resumable = resumable
+        self._file = None
+        self._tmp = None
+        self._preallocated = False
+        # closed with DURABILITY_BATCH, waiting for sync_destinations()
+        self.staged = None
+
+    @property
+    def partial_path(self) -> pathlib.Path:
+        """Where a resumable destination keeps its partial content"""
+        return self.filepath.with_name(f".{self.filepath.name}.partial")
+
+    def journal_path(self) -> pathlib.Path:
+        return self.filepath.with_name(f".{self.filepath.name}.partial.journal")
+
+    def _open_tmp(self, tmp: pathlib.Path, flags: int, mode: str):
+        os.makedirs(tmp.parent, exist_ok=True)
+        fd = os.open(tmp, flags | os.O_CREAT | O_BINARY, 0o666)
+        self._tmp = tmp
+        self._file = os.fdopen(fd, mode)
+        self._preallocated = False
+        try:
+            # keep the permissions of the file being replaced
+            os.chmod(tmp, stat.S_IMODE(os.stat(self.filepath).st_mode))
+        except FileNotFoundError:
+            pass
+
+    def open(self):
+        if self.resumable:
+            return self.reopen(0)
+        import uuid
+
+        name = f".{self.filepath.name}.{uuid.uuid4().hex[:8]}.tmp"
+        self._open_tmp(self.filepath.with_name(name), os.O_WRONLY | os.O_EXCL, "wb")
+
+    def reopen(self, offset: int):
+        """Open the partial content of a resumable destination at offset"""
+        self._open_tmp(self.partial_path, os.O_RDWR, "r+b")
+        self._file.truncate(offset)
+        self._file.seek(offset)
+
+    def partial(self, offset: int) -> Optional[Iterator[bytes]]:
+        """The first offset bytes of the partial content, None if missing"""
+        try:
+            if os.stat(self.partial_path).st_size < offset:
+                return None
+        except FileNotFoundError:
+            return None
+        return _read_range(self.partial_path, offset)
+
+    def commit(self) -> int:
+        """
+        Make the content written so far durable.
 
+        :return: The size of the durable content.
+        """
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        return self._file.tell()
+
+    def preallocate(self, size: int):
+        if not hasattr(os, "posix_fallocate"):
+            return
+        try:
+            os.posix_fallocate(self._file.fileno(), 0, size)
+        except OSError:
+            # not supported by the filesystem
+            return
+        self._preallocated = True
+
+    def write_chunk(self, chunk: bytes):
+        self._file.write(chunk)
+
+    def close(self):
+        f, tmp = self._file, self._tmp
+        self._file = self._tmp = None
+        with f:
+            if self._preallocated:
+                # the content may be shorter than expected
+                f.truncate()
+            f.flush()
+            if self.durability == DURABILITY_FILE:
+                os.fsync(f.fileno())
+        if self.durability == DURABILITY_BATCH:
+            # the content must be on disk before the rename is
+            self.staged = tmp
+            return
+        os.replace(tmp, self.filepath)
+        if self.durability == DURABILITY_FILE:
+            _fsync_dir(self.filepath.parent)
+
+    def abort(self):
+        f, tmp = self._file, self._tmp
+        self._file = self._tmp = None
+        f.close()
+        if not self.resumable:
+            os.remove(tmp)
+
+    def readback(self) -> Optional[Source]:
+        return FilePathSource(self.staged or self.filepath)
+
+    def write_file(self, filepath: Union[str, os.PathLike]):
+        """
+        Write the content of a file, letting the kernel copy it if possible.
 
-class FileStreamDestination(Destination):
+        :param filepath: The file to copy.
+        """
+        self.open()
+        try:
+            with open(filepath, "rb") as f:
+                copy_fd(f.fileno(), self._file.fileno())
+        except BaseException:
+            self.abort()
+            raise
+        return self.close()
+
+
+def _fsync_file(filepath: Union[str, os.PathLike]):
+    # read-only, the file may not be writable by its owner
+    flags = os.O_RDWR if sys.platform == "win32" else os.O_RDONLY
+    fd = os.open(filepath, flags | O_BINARY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def sync_destinations(destinations: Sequence[Destination]):
+    """
+    Flush to disk the destinations written with DURABILITY_BATCH.
+
+    The files staged by the destinations are synced, in a single pass,
+    then moved into place, and each of their directories is synced once.
+
+    :param destinations: The destinations written by a backup.
+    """
+    staged = [
+        d
+        for d in destinations
+        if isinstance(d, FilePathDestination) and d.staged is not None
+    ]
+    for destination in staged:
+        _fsync_file(destination.staged)
+    for destination in staged:
+        staged_path, destination.staged = destination.staged, None
+        if staged_path != destination.filepath:
+            os.replace(staged_path, destination.filepath)
+    for dirpath in {destination.filepath.parent for destination in staged}:
+        _fsync_dir(dirpath)
+
+
+class FileStreamDestination(StreamDestination):
     """Interface for destination of backup on in-memory stream"""
 
     def __init__(
         self, filestream: Union[io.RawIOBase, io.TextIOBase, io.BufferedIOBase]
     ):
         self.filestream = filestream
+        self._decoder = None
+        self._span = None
 
-    def write(self, content: bytes):
+    def open(self):
         if isinstance(self.filestream, io.StringIO):
             encoding = get_encoding(self.filestream)
-            content = str(content, encoding=encoding)
-        self.filestream.write(content)
+            self._decoder = codecs.getincrementaldecoder(encoding)()
+        if isinstance(self.filestream, io.BytesIO):
+            self._span = (self.filestream.tell(), None)
+
+    def write_chunk(self, chunk: bytes):
+        if self._decoder is not None:
+            chunk = self._decoder.decode(chunk)
+        self.filestream.write(chunk)
+
+    def close(self):
+        if self._decoder is not None:
+            self.filestream.write(self._decoder.decode(b"", final=True))
+        self._decoder = None
+        if self._span is not None:
+            self._span = (self._span[0], self.filestream.tell())
+
+    def abort(self):
+        self._decoder = None
+        self._span = None
+
+    def readback(self) -> Optional[Source]:
+        # only in-memory binary streams can be read without side effects
+        if self._span is None or self._span[1] is None:
+            return None
+        start, end = self._span
+        return BytesSource(self.filestream.getbuffer()[start:end].tobytes())
+
+
+def _path_source(obj) -> Source:
+    path = pathlib.Path(obj)
+    if not path.exists():
+        raise InvalidSourceException("Source path doesn't exist")
+    elif path.is_dir():
+        return DirectorySource(obj)
+    else:
+        return FilePathSource(obj)
+
+
+def _same(obj):
+    return obj
+
+
+_STREAMS = (io.RawIOBase, io.TextIOBase, io.BufferedIOBase)
+
+registry.sources.register_type(Source, _same)
+registry.sources.register_type(bytes, BytesSource)
+registry.sources.register_type((str, os.PathLike), _path_source)
+registry.sources.register_type(_STREAMS, FileStreamSource)
+registry.sources.register_type("sqlite3:Connection", "boa.sqlite:SQLiteSource")
+registry.destinations.register_type(Destination, _same)
+registry.destinations.register_type((str, os.PathLike), FilePathDestination)
+registry.destinations.register_type(_STREAMS, FileStreamDestination)
 
 
 def _get_source(obj) -> Source:
-    if isinstance(obj, Source):
-        return obj
-    elif isinstance(obj, bytes):
-        return BytesSource(obj)
-    elif isinstance(obj, (str, os.PathLike)):
-        if not pathlib.Path(obj).exists():
-            raise InvalidSourceException("Source path doesn't exist")
-        else:
-            return FilePathSource(obj)
-    elif isinstance(obj, (io.RawIOBase, io.TextIOBase, io.BufferedIOBase)):
-        return FileStreamSource(obj)
-    else:
-        raise InvalidSourceException("Unexpected source given")
+    return registry.sources.get(obj)
 
 
 def _get_destination(obj) -> Destination:
-    if isinstance(obj, Destination):
-        return obj
-    elif isinstance(obj, (str, os.PathLike)):
-        return FilePathDestination(obj)
-    elif isinstance(obj, (io.RawIOBase, io.TextIOBase, io.BufferedIOBase)):
-        return FileStreamDestination(obj)
-    else:
-        raise InvalidDestinationException("Unexpected destination given")
+    return registry.destinations.get(obj)
 
 
 def _get(obj, expected: Type) -> Union[Source, Destination]:
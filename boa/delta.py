@@ -0,0 +1,213 @@
+import hashlib
+import os
+import pathlib
+import struct
+import zlib
+from typing import List, Optional, Tuple, Union
+
+from boa.core import (
+    DURABILITY_BATCH,
+    DURABILITY_FILE,
+    DURABILITY_NONE,
+    O_BINARY,
+    FilePathDestination,
+    FilePathSource,
+)
+
+DELTA_BLOCK_SIZE = 64 * 1024
+SIGNATURE_MAGIC = b"BOADSIG1"
+# Signature header: magic, block size, block count, and the size,
+# mtime and inode of the file it describes.
+SIGNATURE_HEADER = struct.Struct("<8sIQQqQ")
+# Block signature: weak (Adler-32) and strong (16 bytes BLAKE2b) checksums.
+BLOCK_SIGNATURE = struct.Struct("<I16s")
+
+Signature = Tuple[int, bytes]
+
+
+def block_signature(block: bytes) -> Signature:
+    return zlib.adler32(block), hashlib.blake2b(block, digest_size=16).digest()
+
+
+def _stat_key(stat: os.stat_result) -> Tuple[int, int, int]:
+    return stat.st_size, stat.st_mtime_ns, stat.st_ino
+
+
+def save_signature(
+    filepath: Union[str, os.PathLike],
+    block_size: int,
+    signatures: List[Signature],
+    stat: os.stat_result,
+):
+    """Store the block signatures of a file, valid while it is unchanged"""
+    path = pathlib.Path(filepath)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        header = (SIGNATURE_MAGIC, block_size, len(signatures)) + _stat_key(stat)
+        f.write(SIGNATURE_HEADER.pack(*header))
+        f.write(b"".join(BLOCK_SIGNATURE.pack(*s) for s in signatures))
+    os.replace(tmp, path)
+
+
+def load_signature(
+    filepath: Union[str, os.PathLike], block_size: int, stat: os.stat_result
+) -> Optional[List[Signature]]:
+    """Load the block signatures of a file, None if missing or outdated"""
+    try:
+        with open(filepath, "rb") as f:
+            header = f.read(SIGNATURE_HEADER.size)
+            if len(header) != SIGNATURE_HEADER.size:
+                return None
+            magic, size, count, *key = SIGNATURE_HEADER.unpack(header)
+            if (magic, size, tuple(key)) != (
+                SIGNATURE_MAGIC,
+                block_size,
+                _stat_key(stat),
+            ):
+                return None
+            content = f.read()
+    except OSError:
+        return None
+    if len(content) != count * BLOCK_SIGNATURE.size:
+        return None
+    return list(BLOCK_SIGNATURE.iter_unpack(content))
+
+
+class DeltaFilePathDestination(FilePathDestination):
+    """Interface for destination of backup on filesystem, updated in place
+
+    Content is compared block by block with the file already there, and
+    only the blocks which changed are written, in place. The signatures
+    of the blocks (weak and strong checksums) are stored next to the file,
+    so that while it isn't modified by others it is never read back;
+    otherwise blocks are compared with the file content.
+
+    Unlike FilePathDestination, updates are not atomic: a failed backup
+    leaves the file partially updated, until the next backup completes.
+    New files are written as by FilePathDestination.
+    """
+
+    def __init__(
+        self,
+        filepath: Union[str, os.PathLike],
+        durability: str = DURABILITY_NONE,
+        block_size: int = DELTA_BLOCK_SIZE,
+    ):
+        """Constructor for DeltaFilePath destination object.
+
+        :param filepath: The file to write.
+        :param durability: When content is flushed to disk,
+        see FilePathDestination.
+        :param block_size: The size of the blocks compared.
+        """
+        super().__init__(filepath, durability)
+        self.block_size = block_size
+        self.blocks_written = 0
+        self.blocks_skipped = 0
+        self._in_place = False
+
+    @property
+    def signature_path(self) -> pathlib.Path:
+        return self.filepath.with_name(f".{self.filepath.name}.signature")
+
+    def open(self):
+        self._pending = bytearray()
+        self._size = 0
+        self._signatures = []
+        self.blocks_written = self.blocks_skipped = 0
+        try:
+            fd = os.open(self.filepath, os.O_RDWR | O_BINARY)
+        except FileNotFoundError:
+            self._in_place = False
+            return super().open()
+
+        self._in_place = True
+        self._file = os.fdopen(fd, "r+b")
+        stat = os.fstat(fd)
+        self._old_size = stat.st_size
+        self._old = load_signature(self.signature_path, self.block_size, stat)
+        # outdated as soon as the file is modified
+        try:
+            os.remove(self.signature_path)
+        except FileNotFoundError:
+            pass
+
+    def preallocate(self, size: int):
+        if not self._in_place:
+            super().preallocate(size)
+
+    def _unchanged(self, index: int, block: bytes, signature: Signature) -> bool:
+        offset = index * self.block_size
+        if offset + len(block) > self._old_size:
+            return False
+        if self._old is None:
+            self._file.seek(offset)
+            return self._file.read(len(block)) == block
+        if index >= len(self._old):
+            return False
+        weak, strong = self._old[index]
+        # the strong checksum only confirms a weak match
+        return weak == signature[0] and strong == signature[1]
+
+    def _write_block(self, block: bytes):
+        index = len(self._signatures)
+        signature = block_signature(block)
+        self._signatures.append(signature)
+        if not self._in_place:
+            self._file.write(block)
+        elif self._unchanged(index, block, signature):
+            self.blocks_skipped += 1
+        else:
+            self._file.seek(index * self.block_size)
+            self._file.write(block)
+            self.blocks_written += 1
+
+    def write_chunk(self, chunk: bytes):
+        self._size += len(chunk)
+        self._pending += chunk
+        start = 0
+        while len(self._pending) - start >= self.block_size:
+            end = start + self.block_size
+            self._write_block(bytes(self._pending[start:end]))
+            start = end
+        del self._pending[:start]
+
+    def _close_in_place(self):
+        f = self._file
+        self._file = None
+        with f:
+            f.truncate(self._size)
+            f.flush()
+            if self.durability == DURABILITY_FILE:
+                os.fsync(f.fileno())
+        if self.durability == DURABILITY_BATCH:
+            # updated in place, only synced by sync_destinations()
+            self.staged = self.filepath
+
+    def close(self):
+        if self._pending:
+            self._write_block(bytes(self._pending))
+            self._pending = bytearray()
+        if self._in_place:
+            self._close_in_place()
+        else:
+            super().close()
+        save_signature(
+            self.signature_path,
+            self.block_size,
+            self._signatures,
+            os.stat(self.staged or self.filepath),
+        )
+
+    def abort(self):
+        self._pending = bytearray()
+        if not self._in_place:
+            return super().abort()
+        f = self._file
+        self._file = None
+        f.close()
+
+    def write_file(self, filepath: Union[str, os.PathLike]):
+        # compared block by block, rather than copied by the kernel
+        source = FilePathSource(filepath)
+        return self.write_stream(source.chunks(self.block_size), source.size())
@@ -8,3 +8,58 @@ class InvalidSourceException(BoaException):
 
 class InvalidDestinationException(BoaException):
     """Invalid destination provided"""
+
+
+class BatchBackupException(BoaException):
+    """One or more jobs of a backup batch failed"""
+
+    def __init__(self, results, errors):
+        self.results = results
+        self.errors = errors
+        failed = sum(error is not None for error in errors)
+        super().__init__(f"{failed} of {len(errors)} backup jobs failed")
+
+
+class CommandException(BoaException):
+    """Command exited with a non-zero status"""
+
+    def __init__(self, cmd, returncode, stderr=b""):
+        super().__init__(cmd, returncode, stderr)
+        self.cmd = cmd
+        self.returncode = returncode
+        self.stderr = stderr
+
+    def __str__(self):
+        return f"Command {self.cmd!r} exited with status {self.returncode}"
+
+
+class CommandTimeoutException(CommandException):
+    """Command didn't complete in time, and was killed"""
+
+    def __init__(self, cmd, timeout, stderr=b""):
+        super().__init__(cmd, None, stderr)
+        self.args = (cmd, timeout, stderr)
+        self.timeout = timeout
+
+    def __str__(self):
+        return f"Command {self.cmd!r} timed out after {self.timeout} seconds"
+
+
+class ChecksumMismatchException(BoaException):
+    """Content read back from a destination differs from what was written"""
+
+    def __init__(self, destination, expected, actual):
+        super().__init__(destination, expected, actual)
+        self.destination = destination
+        self.expected = expected
+        self.actual = actual
+
+    def __str__(self):
+        return (
+            f"Checksum mismatch for {self.destination}: "
+            f"expected sha256 {self.expected}, got {self.actual}"
+        )
+
+
+class SQLiteBusyException(BoaException):
+    """SQLite database stayed locked by others, or by its own connection"""
@@ -1,30 +1,107 @@
 import abc
+import concurrent.futures
+import math
 import os
+import threading
+import time
+from typing import Optional
 
+from telegram import Bot
+from telegram.error import BadRequest, NetworkError, RetryAfter, TimedOut
 from telegram.ext import Updater
+from telegram.utils.request import Request
 
 import boa.core as core
+from boa.exception import BatchBackupException
+
+# Bots can send documents of up to 50 MB.
+MAX_DOCUMENT_SIZE = 50 * 1000 * 1000
+# Connections kept alive by each shared bot, and chats sent to at once.
+POOL_SIZE = 8
+MAX_RETRIES = 5
+# Seconds to wait before retrying after a network error, doubled every time.
+BACKOFF = 1.0
+SEND_TIMEOUT = 60.0
+# Digits of part numbers, the same for every part so that they sort in order,
+# even before the count of a stream is known.
+PART_NUMBER_WIDTH = 5
+
+_bots = {}
+_bots_lock = threading.Lock()
+
+
+def get_bot(token: str, base_url: Optional[str] = None) -> Bot:
+    """
+    Get the bot of a token, shared with every destination using it.
+
+    The bot holds a pool of POOL_SIZE keep-alive connections.
+
+    :param token: The token of the bot.
+    :param base_url: The Bot API endpoint, up to the token excluded.
+    """
+    key = (token, base_url)
+    with _bots_lock:
+        bot = _bots.get(key)
+        if bot is None:
+            request = Request(con_pool_size=POOL_SIZE)
+            bot = _bots[key] = Bot(token, base_url=base_url, request=request)
+    return bot
 
 
 class TelegramDestination(core.Destination, abc.ABC):
-    def __init__(self):
+    def __init__(self, base_url: Optional[str] = None):
+        """Constructor for TelegramDestination object.
+
+        :param base_url: The Bot API endpoint, such as
+        ``https://api.telegram.org/bot``; TELEGRAM_API_URL if None,
+        else the official one.
+        """
         token = os.getenv("TELEGRAM_TOKEN", None)
         if not token:
             raise ValueError("Missing token!")
-        updater = Updater(token, use_context=True)
-        self.updater = updater
+        base_url = base_url or os.getenv("TELEGRAM_API_URL", None) or None
+        self.bot = get_bot(token, base_url)
+        self._updater = None
 
+    @property
+    def updater(self) -> Updater:
+        """An Updater of the bot, as exposed by earlier versions"""
+        if self._updater is None:
+            self._updater = Updater(bot=self.bot, use_context=True)
+        return self._updater
 
-class TelegramBotDestination(TelegramDestination):
+
+class TelegramBotDestination(TelegramDestination, core.StreamDestination):
     def __init__(
         self,
         filename: str = None,
         message: str = None,
+        base_url: Optional[str] = None,
+        part_size: int = MAX_DOCUMENT_SIZE,
+        max_retries: int = MAX_RETRIES,
     ):
-        super().__init__()
+        """Constructor for TelegramBotDestination object.
+
+        Content is sent as a document to every chat of TELEGRAM_CHAT_IDS,
+        concurrently. Content larger than part_size is split into parts
+        named filename.00001, filename.00002 and so on, which ``cat``
+        joins back together. Parts are sent as soon as they are filled,
+        so at most a part is held in memory; parts already sent remain
+        in the chats if the backup is aborted.
+
+        :param filename: The name of the document.
+        :param message: The caption of the document.
+        :param base_url: The Bot API endpoint, see TelegramDestination.
+        :param part_size: The maximum size of a document.
+        :param max_retries: How many times a document is sent again,
+        when rate limited or on network errors.
+        """
+        super().__init__(base_url)
 
         self.message = message
         self.filename = filename
+        self.part_size = part_size
+        self.max_retries = max_retries
 
         chat_ids = os.getenv("TELEGRAM_CHAT_IDS", None)
         # if not empty string, get array
@@ -36,11 +113,95 @@ class TelegramBotDestination(TelegramDestination):
 
         self.chat_ids = chat_ids
 
+    def _name(self, index: int, count: Optional[int]):
+        """The filename and caption of a part, numbered from 1"""
+        if index == 1 and count == 1:
+            return self.filename, self.message
+        filename = f"{self.filename or 'backup'}.{index:0{PART_NUMBER_WIDTH}d}"
+        number = f"{index}/{count}" if count else str(index)
+        caption = f"{self.message} ({number})" if self.message else number
+        return filename, caption
+
+    def _send(self, chat_id: str, document: bytes, filename: str, caption: str):
+        for attempt in range(self.max_retries + 1):
+            try:
+                return self.bot.send_document(
+                    chat_id=chat_id,
+                    document=document,
+                    filename=filename,
+                    caption=caption,
+                    timeout=SEND_TIMEOUT,
+                )
+            except RetryAfter as e:
+                error, delay = e, e.retry_after
+            except (BadRequest, TimedOut):
+                # rejected, or maybe delivered: sending again won't help
+                raise
+            except NetworkError as e:
+                error, delay = e, BACKOFF * 2**attempt
+            if attempt < self.max_retries:
+                time.sleep(delay)
+        raise error
+
+    def open(self):
+        self._pending = bytearray()
+        self._sent = 0
+        self._count = None
+        self._results = [[] for _ in self.chat_ids]
+        self._errors = [None] * len(self.chat_ids)
+        workers = min(POOL_SIZE, len(self.chat_ids))
+        self._executor = concurrent.futures.ThreadPoolExecutor(workers)
+
+    def preallocate(self, size: int):
+        self._count = max(1, math.ceil(size / self.part_size))
+
+    def _send_part(self, document: bytes, last: bool = False):
+        self._sent += 1
+        count = self._sent if last and self._count is None else self._count
+        filename, caption = self._name(self._sent, count)
+        # parts of a chat are sent in order, chats failing get no more parts
+        futures = {
+            i: self._executor.submit(self._send, chat_id, document, filename, caption)
+            for i, chat_id in enumerate(self.chat_ids)
+            if self._errors[i] is None
+        }
+        for i, future in futures.items():
+            try:
+                self._results[i].append(future.result())
+            except Exception as e:
+                self._errors[i] = e
+
+    def write_chunk(self, chunk: bytes):
+        view = memoryview(chunk)
+        # a part is sent once more content follows it
+        while len(self._pending) + len(view) > self.part_size:
+            size = self.part_size - len(self._pending)
+            if self._pending:
+                self._pending += view[:size]
+                document, self._pending = bytes(self._pending), bytearray()
+            else:
+                document = bytes(view[:size])
+            view = view[size:]
+            self._send_part(document)
+        self._pending += view
+
+    def close(self):
+        try:
+            if self._pending or not self._sent:
+                document, self._pending = bytes(self._pending), bytearray()
+                self._send_part(document, last=True)
+        finally:
+            self._executor.shutdown()
+        errors = self._errors
+        results = [r if e is None else None for r, e in zip(self._results, errors)]
+        failed = [error for error in errors if error is not None]
+        if failed:
+            raise BatchBackupException(results, errors) from failed[0]
+        return results
+
+    def abort(self):
+        self._pending = bytearray()
+        self._executor.shutdown()
+
     def write(self, content: bytes):
-        for chat_id in self.chat_ids:
-            self.updater.bot.send_document(
-                chat_id=chat_id,
-                document=content,
-                filename=self.filename,
-                caption=self.message,
-            )
+        return self.write_stream((content,), len(content))
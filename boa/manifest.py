@@ -0,0 +1,181 @@
+import hashlib
+import json
+import os
+import pathlib
+import time
+from typing import Callable, Iterable, Iterator, List, Optional, Sequence, Union
+
+from boa.core import (
+    DEFAULT_CHUNK_SIZE,
+    Destination,
+    FilePathDestination,
+    FilePathSource,
+    Source,
+    iter_chunks,
+)
+
+MANIFEST_SUFFIX = ".manifest.json"
+MANIFEST_VERSION = 1
+
+# Changes made within this window (in seconds) from the time a file was
+# checked may not be reflected by its mtime, so its content is hashed.
+MTIME_RESOLUTION = 2.0
+
+
+def file_digest(
+    filepath: Union[str, os.PathLike], chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> str:
+    digest = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        for chunk in iter_chunks(f.read, chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _entry(filepath, stat: os.stat_result, digest: str) -> dict:
+    return {
+        "path": os.path.abspath(filepath),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha256": digest,
+        "checked": time.time(),
+    }
+
+
+def _check(source: Source, entry: dict) -> Optional[dict]:
+    """
+    Check whether a source still matches its manifest entry.
+
+    Size and mtime are trusted when they match and the mtime is not too
+    close to the time of the last check; otherwise the content is hashed.
+
+    :return: The refreshed entry if the source is unchanged, else None.
+    """
+    if not isinstance(source, FilePathSource):
+        return None
+    if os.path.abspath(source.filepath) != entry["path"]:
+        return None
+    try:
+        stat = os.stat(source.filepath)
+    except OSError:
+        return None
+    if stat.st_size != entry["size"]:
+        return None
+
+    racy = stat.st_mtime_ns / 1e9 >= entry["checked"] - MTIME_RESOLUTION
+    if stat.st_mtime_ns == entry["mtime_ns"] and not racy:
+        return entry
+    if file_digest(source.filepath) != entry["sha256"]:
+        return None
+    return _entry(source.filepath, stat, entry["sha256"])
+
+
+def track(
+    sources: Sequence[Source],
+    entries: List,
+    read: Optional[Callable[[Source], Iterable[bytes]]] = None,
+) -> Iterator[bytes]:
+    """
+    Stream the content of the sources, hashing it on the fly.
+
+    Once a source is exhausted, its manifest entry is appended
+    to entries (None for sources which can't be tracked).
+
+    :param sources: The sources to stream.
+    :param entries: The list collecting manifest entries.
+    :param read: Get the chunks of a source, calling its chunks() if None.
+    """
+    for source in sources:
+        chunks = source.chunks() if read is None else read(source)
+        if not isinstance(source, FilePathSource):
+            yield from chunks
+            entries.append(None)
+            continue
+
+        stat = os.stat(source.filepath)
+        digest = hashlib.sha256()
+        for chunk in chunks:
+            digest.update(chunk)
+            yield chunk
+        entries.append(_entry(source.filepath, stat, digest.hexdigest()))
+
+
+class Manifest:
+    """Record of the sources last written into a file destination"""
+
+    def __init__(
+        self, filepath: Union[str, os.PathLike], target: Union[str, os.PathLike]
+    ):
+        """Constructor for Manifest object.
+
+        :param filepath: Where the manifest is stored.
+        :param target: The file written by the backup.
+        """
+        self.filepath = pathlib.Path(filepath)
+        self.target = pathlib.Path(target)
+        self.entries = self._load()
+
+    @classmethod
+    def for_destination(cls, destination: Destination) -> Optional["Manifest"]:
+        """Get the manifest of a destination, or None if it can't have one"""
+        if not isinstance(destination, FilePathDestination):
+            return None
+        target = destination.filepath
+        return cls(target.with_name(target.name + MANIFEST_SUFFIX), target)
+
+    def _load(self) -> List[dict]:
+        try:
+            with open(self.filepath, "r") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return []
+        if manifest.get("version") != MANIFEST_VERSION:
+            return []
+        return manifest.get("sources", [])
+
+    def save(self):
+        manifest = {"version": MANIFEST_VERSION, "sources": self.entries}
+        tmp = self.filepath.with_name(self.filepath.name + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump(manifest, f)
+        os.replace(tmp, self.filepath)
+
+    def invalidate(self):
+        """Forget the recorded sources, before the target is rewritten"""
+        self.entries = []
+        try:
+            os.remove(self.filepath)
+        except FileNotFoundError:
+            pass
+
+    def matches(self, sources: Sequence[Source]) -> bool:
+        """
+        Check whether the target already holds the content of the sources.
+
+        On success, entries refreshed with the current metadata are saved.
+
+        :param sources: The sources about to be backed up.
+        """
+        if not self.entries or len(self.entries) != len(sources):
+            return False
+        if not self.target.exists():
+            return False
+
+        entries = []
+        for source, entry in zip(sources, self.entries):
+            current = _check(source, entry)
+            if current is None:
+                return False
+            entries.append(current)
+        if entries != self.entries:
+            self.entries = entries
+            self.save()
+        return True
+
+    def update(self, entries: Sequence[Optional[dict]]):
+        """Record the sources just written, as collected by track()"""
+        if all(entries):
+            self.entries = list(entries)
+            self.save()
+        else:
+            self.invalidate()
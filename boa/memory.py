@@ -0,0 +1,272 @@
+import os
+import threading
+import weakref
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Union,
+)
+
+if TYPE_CHECKING:  # pragma: no cover
+    import mmap
+
+# Bytes which buffers of the process may hold in memory, all together,
+# before spilling to temporary files.
+DEFAULT_MEMORY_BUDGET = 256 * 1024 * 1024
+# Chunks streamed back from buffers, by default.
+_CHUNK_SIZE = 64 * 1024
+
+
+class MemoryBudget:
+    """Bytes which in-flight buffers may hold in memory, all together
+
+    Buffers reserve the memory of their content before holding it, and
+    spill to disk what doesn't fit. Usage is tracked, with its high-water
+    mark, to size hosts.
+    """
+
+    def __init__(self, limit: Optional[int] = DEFAULT_MEMORY_BUDGET):
+        """Constructor for MemoryBudget object.
+
+        :param limit: The bytes which may be held, unlimited if None.
+        """
+        if limit is not None and limit < 0:
+            raise ValueError(f"Memory budget must not be negative ({limit})")
+        self.limit = limit
+        self.used = 0
+        self.high_water = 0
+        self.spills = 0
+        self.spilled_bytes = 0
+        self._lock = threading.Lock()
+
+    def reserve(self, nbytes: int) -> bool:
+        """Reserve nbytes of memory, False if beyond the limit"""
+        with self._lock:
+            if self.limit is not None and self.used + nbytes > self.limit:
+                return False
+            self.used += nbytes
+            self.high_water = max(self.high_water, self.used)
+            return True
+
+    def release(self, nbytes: int):
+        with self._lock:
+            self.used -= nbytes
+
+    def spilled(self, nbytes: int):
+        """Record a buffer spilling nbytes to disk"""
+        with self._lock:
+            self.spills += 1
+            self.spilled_bytes += nbytes
+
+    def reset_high_water(self):
+        with self._lock:
+            self.high_water = self.used
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "limit": self.limit,
+                "used": self.used,
+                "high_water": self.high_water,
+                "spills": self.spills,
+                "spilled_bytes": self.spilled_bytes,
+            }
+
+
+_budget = MemoryBudget()
+
+
+def get_budget() -> MemoryBudget:
+    """The budget shared by the buffers of the process"""
+    return _budget
+
+
+def set_memory_budget(limit: Optional[int]):
+    """Change the limit of the budget of the process, unlimited if None"""
+    if limit is not None and limit < 0:
+        raise ValueError(f"Memory budget must not be negative ({limit})")
+    _budget.limit = limit
+
+
+def _cleanup(budget: MemoryBudget, state: dict):
+    budget.release(state["reserved"])
+    state["reserved"] = 0
+    if state["view"] is not None:
+        try:
+            state["view"].close()
+        except BufferError:
+            # still exported, freed with its last reference
+            pass
+        state["view"] = None
+    if state["file"] is not None:
+        state["file"].close()
+        state["file"] = None
+
+
+class SpooledBuffer:
+    """Bytes buffered in memory within a budget, spilled to a file beyond it
+
+    Chunks are held in memory as long as the budget allows it; then the
+    buffer moves its content into a temporary file and appends to it.
+    Memory is given back to the budget on close(), or once the buffer is
+    garbage collected.
+    """
+
+    def __init__(
+        self,
+        budget: Optional[MemoryBudget] = None,
+        dir: Union[None, str, os.PathLike] = None,
+    ):
+        """Constructor for SpooledBuffer object.
+
+        :param budget: The budget of the memory held, see get_budget() if None.
+        :param dir: Where the temporary file is created, see tempfile.
+        """
+        self.budget = get_budget() if budget is None else budget
+        self.dir = dir
+        self.size = 0
+        self._chunks: List[bytes] = []
+        self._lock = threading.Lock()
+        # shared with the finalizer, which must not reference the buffer
+        self._state = {"reserved": 0, "file": None, "view": None}
+        self._finalizer = weakref.finalize(self, _cleanup, self.budget, self._state)
+
+    def __len__(self) -> int:
+        return self.size
+
+    @property
+    def spilled(self) -> bool:
+        return self._state["file"] is not None
+
+    def _spill(self):
+        import tempfile
+
+        f = tempfile.TemporaryFile(dir=self.dir)
+        self._state["file"] = f
+        for chunk in self._chunks:
+            f.write(chunk)
+        self._chunks = []
+        self.budget.release(self._state["reserved"])
+        self._state["reserved"] = 0
+        self.budget.spilled(self.size)
+
+    def write(self, chunk: bytes):
+        """Append a chunk, copied: it may be reused by its owner"""
+        if not chunk:
+            return
+        with self._lock:
+            if not self.spilled:
+                if self.budget.reserve(len(chunk)):
+                    self._state["reserved"] += len(chunk)
+                    self._chunks.append(bytes(chunk))
+                    self.size += len(chunk)
+                    return
+                self._spill()
+            f = self._state["file"]
+            # chunks() may have moved the position
+            f.seek(self.size)
+            f.write(chunk)
+            self.size += len(chunk)
+
+    def chunks(self, chunk_size: int = _CHUNK_SIZE) -> Iterator[bytes]:
+        if not self.spilled:
+            for chunk in list(self._chunks):
+                for start in range(0, len(chunk), chunk_size):
+                    end = start + chunk_size
+                    yield chunk[start:end] if start or end < len(chunk) else chunk
+            return
+        offset = 0
+        while offset < self.size:
+            with self._lock:
+                f = self._state["file"]
+                f.flush()
+                f.seek(offset)
+                chunk = f.read(min(chunk_size, self.size - offset))
+            if not chunk:
+                return
+            offset += len(chunk)
+            yield chunk
+
+    def getvalue(self) -> Union[bytes, "mmap.mmap"]:
+        """
+        The whole content, as bytes if held in memory.
+
+        A spilled content is mapped from its file instead, read-only,
+        and valid until the buffer is closed.
+        """
+        with self._lock:
+            if not self.spilled and len(self._chunks) > 1:
+                self._join()
+            if not self.spilled:
+                return self._chunks[0] if self._chunks else b""
+            if self.size == 0:
+                return b""
+            if self._state["view"] is None:
+                import mmap
+
+                f = self._state["file"]
+                f.flush()
+                self._state["view"] = mmap.mmap(
+                    f.fileno(), self.size, access=mmap.ACCESS_READ
+                )
+            return self._state["view"]
+
+    def _join(self):
+        # joining copies the content, which has to fit in the budget too
+        if not self.budget.reserve(self.size):
+            self._spill()
+            return
+        content = b"".join(self._chunks)
+        self._chunks = [content]
+        self.budget.release(self.size)
+
+    def close(self):
+        """Give back the memory and remove the temporary file"""
+        self._chunks = []
+        self._finalizer()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _spooling(chunks: Iterable[bytes], buffer: SpooledBuffer) -> Iterator[bytes]:
+    for chunk in chunks:
+        buffer.write(chunk)
+        yield chunk
+
+
+def in_waves(
+    chunks: Iterable[bytes],
+    items: Sequence,
+    size: Optional[int],
+    write: Callable[[Iterable[bytes], Sequence], List],
+) -> List:
+    """
+    Write the chunks into the items, a wave of at most size items at a time.
+
+    The content is spooled in a SpooledBuffer while the first wave reads
+    it, then streamed again to each of the next waves.
+
+    :param chunks: The content to write, read only once.
+    :param items: The destinations of the content.
+    :param size: The items of a wave, every item if None.
+    :param write: Called with the chunks and the items of a wave,
+    returning a list of outcomes, one for each item.
+    :return: The outcomes of every item.
+    """
+    if size is None or len(items) <= size:
+        return write(chunks, items)
+    with SpooledBuffer() as buffer:
+        outcomes = list(write(_spooling(chunks, buffer), items[:size]))
+        for start in range(size, len(items), size):
+            end = start + size
+            outcomes += write(buffer.chunks(), items[start:end])
+    return outcomes
@@ -0,0 +1,350 @@
+import bisect
+import collections
+import json
+import logging
+import shlex
+import threading
+import time
+from typing import Iterable, Iterator, Optional, Sequence
+
+from boa.core import Destination
+from boa.memory import MemoryBudget, get_budget
+
+# Upper bounds (in seconds) of the write latency histogram buckets.
+LATENCY_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+logger = logging.getLogger("boa")
+
+
+def describe(obj) -> str:
+    """
+    Label a source or destination for metrics and logs.
+
+    A ``label`` attribute is used if set, else the class name
+    followed by the path or command of the object, if any.
+    """
+    label = getattr(obj, "label", None)
+    if label is not None:
+        return str(label)
+    name = type(obj).__name__
+    for attr in ("filepath", "dirpath", "args"):
+        detail = getattr(obj, attr, None)
+        if detail is None:
+            continue
+        if not isinstance(detail, (str, bytes)) and attr == "args":
+            detail = " ".join(shlex.quote(str(arg)) for arg in detail)
+        return f"{name}:{detail}"
+    return name
+
+
+class Observer:
+    """Hooks called along a backup; every hook does nothing by default
+
+    Hooks may be called from several threads at once.
+    """
+
+    def read(self, source, nbytes: int, seconds: float):
+        """A chunk of nbytes was read from the source in seconds"""
+
+    def write(self, destination, nbytes: int, seconds: float):
+        """A chunk of nbytes was written into the destination in seconds"""
+
+    def wait(self, destination, seconds: float):
+        """The source waited seconds for the queue of the destination"""
+
+    def error(self, destination, error: Exception):
+        """The backup into the destination failed"""
+
+    def finished(self, strategy: str, seconds: float, error: Optional[Exception]):
+        """A backup with the strategy ended in seconds, failing if error"""
+
+
+class Observers(Observer):
+    """Observer forwarding every hook to several observers"""
+
+    def __init__(self, *observers: Observer):
+        self.observers = observers
+
+    def read(self, source, nbytes, seconds):
+        for observer in self.observers:
+            observer.read(source, nbytes, seconds)
+
+    def write(self, destination, nbytes, seconds):
+        for observer in self.observers:
+            observer.write(destination, nbytes, seconds)
+
+    def wait(self, destination, seconds):
+        for observer in self.observers:
+            observer.wait(destination, seconds)
+
+    def error(self, destination, error):
+        for observer in self.observers:
+            observer.error(destination, error)
+
+    def finished(self, strategy, seconds, error):
+        for observer in self.observers:
+            observer.finished(strategy, seconds, error)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels) -> str:
+    pairs = ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items())
+    return "{" + pairs + "}"
+
+
+_HELP = {
+    "boa_source_read_bytes_total": "Bytes read from sources",
+    "boa_source_read_seconds_total": "Time spent reading sources",
+    "boa_destination_write_bytes_total": "Bytes written into destinations",
+    "boa_destination_queue_wait_seconds_total": "Time spent waiting for queues",
+    "boa_destination_write_seconds": "Latency of chunk writes into destinations",
+    "boa_destination_errors_total": "Failed backups into destinations",
+    "boa_backups_total": "Backups run, by strategy and status",
+    "boa_backup_seconds_total": "Time spent in backups, by strategy",
+    "boa_memory_used_bytes": "Memory held by buffers",
+    "boa_memory_high_water_bytes": "Most memory held by buffers at once",
+    "boa_memory_limit_bytes": "Memory budget of buffers",
+    "boa_memory_spills_total": "Buffers spilled to disk",
+    "boa_memory_spilled_bytes_total": "Bytes moved from memory to disk by spills",
+}
+
+
+def _header(name: str, kind: str = "counter"):
+    return [f"# HELP {name} {_HELP[name]}", f"# TYPE {name} {kind}"]
+
+
+class MetricsCollector(Observer):
+    """Observer aggregating metrics, exported in Prometheus text format"""
+
+    def __init__(
+        self,
+        label=describe,
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+        budget: Optional[MemoryBudget] = None,
+    ):
+        """Constructor for MetricsCollector object.
+
+        :param label: The function labeling sources and destinations.
+        :param buckets: The upper bounds of the write latency histogram.
+        :param budget: The memory budget whose usage is exported,
+        see boa.memory.get_budget() if None.
+        """
+        self.label = label
+        self.budget = get_budget() if budget is None else budget
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self.read_bytes = collections.Counter()
+        self.read_seconds = collections.Counter()
+        self.write_bytes = collections.Counter()
+        self.write_seconds = collections.Counter()
+        self.write_latency = collections.defaultdict(lambda: [0] * len(self.buckets))
+        self.write_count = collections.Counter()
+        self.wait_seconds = collections.Counter()
+        self.errors = collections.Counter()
+        self.backups = collections.Counter()
+        self.backup_seconds = collections.Counter()
+
+    def read(self, source, nbytes, seconds):
+        label = self.label(source)
+        with self._lock:
+            self.read_bytes[label] += nbytes
+            self.read_seconds[label] += seconds
+
+    def write(self, destination, nbytes, seconds):
+        label = self.label(destination)
+        bucket = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            self.write_bytes[label] += nbytes
+            self.write_seconds[label] += seconds
+            self.write_count[label] += 1
+            if bucket < len(self.buckets):
+                self.write_latency[label][bucket] += 1
+
+    def wait(self, destination, seconds):
+        label = self.label(destination)
+        with self._lock:
+            self.wait_seconds[label] += seconds
+
+    def error(self, destination, error):
+        label = self.label(destination)
+        with self._lock:
+            self.errors[label, type(error).__name__] += 1
+
+    def finished(self, strategy, seconds, error):
+        status = "success" if error is None else "failure"
+        with self._lock:
+            self.backups[strategy, status] += 1
+            self.backup_seconds[strategy] += seconds
+
+    def _histogram(self, name: str) -> Iterator[str]:
+        for label, total in sorted(self.write_count.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, self.write_latency[label]):
+                cumulative += count
+                labels = _labels(destination=label, le=repr(float(bound)))
+                yield f"{name}_bucket{labels} {cumulative}"
+            labels = _labels(destination=label, le="+Inf")
+            yield f"{name}_bucket{labels} {total}"
+            yield f"{name}_sum{_labels(destination=label)} {self.write_seconds[label]}"
+            yield f"{name}_count{_labels(destination=label)} {total}"
+
+    def export(self) -> str:
+        """Render the metrics in Prometheus text exposition format"""
+        counters = [
+            ("boa_source_read_bytes_total", "source", self.read_bytes),
+            ("boa_source_read_seconds_total", "source", self.read_seconds),
+            ("boa_destination_write_bytes_total", "destination", self.write_bytes),
+            (
+                "boa_destination_queue_wait_seconds_total",
+                "destination",
+                self.wait_seconds,
+            ),
+        ]
+        lines = []
+        with self._lock:
+            for name, key, counter in counters:
+                lines += _header(name)
+                for label, value in sorted(counter.items()):
+                    lines.append(f"{name}{_labels(**{key: label})} {value}")
+
+            name = "boa_destination_write_seconds"
+            lines += _header(name, "histogram")
+            lines.extend(self._histogram(name))
+
+            name = "boa_destination_errors_total"
+            lines += _header(name)
+            for (label, error), value in sorted(self.errors.items()):
+                lines.append(f"{name}{_labels(destination=label, error=error)} {value}")
+
+            name = "boa_backups_total"
+            lines += _header(name)
+            for (strategy, status), value in sorted(self.backups.items()):
+                labels = _labels(strategy=strategy, status=status)
+                lines.append(f"{name}{labels} {value}")
+
+            name = "boa_backup_seconds_total"
+            lines += _header(name)
+            for strategy, value in sorted(self.backup_seconds.items()):
+                lines.append(f"{name}{_labels(strategy=strategy)} {value}")
+
+        lines.extend(self._memory())
+        return "\n".join(lines) + "\n"
+
+    def _memory(self) -> Iterator[str]:
+        stats = self.budget.stats()
+        gauges = [
+            ("boa_memory_used_bytes", "gauge", stats["used"]),
+            ("boa_memory_high_water_bytes", "gauge", stats["high_water"]),
+            ("boa_memory_limit_bytes", "gauge", stats["limit"]),
+            ("boa_memory_spills_total", "counter", stats["spills"]),
+            ("boa_memory_spilled_bytes_total", "counter", stats["spilled_bytes"]),
+        ]
+        for name, kind, value in gauges:
+            if value is None:
+                # unlimited
+                continue
+            yield from _header(name, kind)
+            yield f"{name} {value}"
+
+
+class LoggingObserver(Observer):
+    """Observer logging every event as a JSON object
+
+    Chunk events are logged at DEBUG level, failures and ends of backup
+    at INFO level. The event is also attached to records as ``boa``.
+    """
+
+    def __init__(self, logger: logging.Logger = logger, label=describe):
+        """Constructor for LoggingObserver object.
+
+        :param logger: The logger receiving the events.
+        :param label: The function labeling sources and destinations.
+        """
+        self.logger = logger
+        self.label = label
+
+    def _log(self, level: int, event: dict):
+        if self.logger.isEnabledFor(level):
+            self.logger.log(level, json.dumps(event), extra={"boa": event})
+
+    def read(self, source, nbytes, seconds):
+        event = dict(event="read", source=self.label(source), bytes=nbytes)
+        self._log(logging.DEBUG, dict(event, seconds=seconds))
+
+    def write(self, destination, nbytes, seconds):
+        event = dict(event="write", destination=self.label(destination), bytes=nbytes)
+        self._log(logging.DEBUG, dict(event, seconds=seconds))
+
+    def wait(self, destination, seconds):
+        event = dict(event="wait", destination=self.label(destination))
+        self._log(logging.DEBUG, dict(event, seconds=seconds))
+
+    def error(self, destination, error):
+        event = dict(event="error", destination=self.label(destination))
+        self._log(logging.INFO, dict(event, error=repr(error)))
+
+    def finished(self, strategy, seconds, error):
+        event = dict(event="finished", strategy=strategy, seconds=seconds)
+        self._log(
+            logging.INFO, dict(event, error=None if error is None else repr(error))
+        )
+
+
+def observe_reads(
+    chunks: Iterable[bytes], source, observer: Observer
+) -> Iterator[bytes]:
+    """Stream chunks of the source, reporting the time spent reading each"""
+    iterator = iter(chunks)
+    clock = time.perf_counter
+    while True:
+        start = clock()
+        try:
+            chunk = next(iterator)
+        except StopIteration:
+            return
+        observer.read(source, len(chunk), clock() - start)
+        yield chunk
+
+
+def observe_writes(
+    chunks: Iterable[bytes], destination, observer: Observer
+) -> Iterator[bytes]:
+    """
+    Stream chunks into the destination, reporting the time spent writing each.
+
+    The destination writes a chunk between receiving it and asking for the
+    next one, which is the time measured.
+    """
+    clock = time.perf_counter
+    for chunk in chunks:
+        start = clock()
+        yield chunk
+        observer.write(destination, len(chunk), clock() - start)
+
+
+class ObservedDestination(Destination):
+    """Proxy reporting the chunk writes of a destination, for broadcasts"""
+
+    def __init__(self, destination: Destination, observer: Observer):
+        self.destination = destination
+        self.observer = observer
+
+    def open(self):
+        return self.destination.open()
+
+    def write_chunk(self, chunk: bytes):
+        start = time.perf_counter()
+        self.destination.write_chunk(chunk)
+        self.observer.write(self.destination, len(chunk), time.perf_counter() - start)
+
+    def close(self):
+        return self.destination.close()
+
+    def abort(self):
+        return self.destination.abort()
+
+    def write(self, content: bytes):
+        return self.destination.write(content)
@@ -0,0 +1,183 @@
+import importlib
+import re
+import sys
+import threading
+import urllib.parse
+from typing import Callable, Dict, List, Type, Union
+
+from boa.exception import InvalidDestinationException, InvalidSourceException
+
+# Entry point groups where packages register factories by URI scheme.
+SOURCE_GROUP = "boa.sources"
+DESTINATION_GROUP = "boa.destinations"
+
+_URI = re.compile(r"[A-Za-z][A-Za-z0-9+.-]+://")
+
+Factory = Callable[[urllib.parse.SplitResult], object]
+
+
+def is_uri(obj) -> bool:
+    """Whether obj is a string like ``scheme://...``"""
+    return isinstance(obj, str) and _URI.match(obj) is not None
+
+
+def _load(spec):
+    """Import a factory given as ``module:attribute``, or an entry point"""
+    if callable(spec):
+        return spec
+    if not isinstance(spec, str):
+        return spec.load()
+    module, _, qualname = spec.partition(":")
+    obj = importlib.import_module(module)
+    for attr in qualname.split("."):
+        obj = getattr(obj, attr)
+    return obj
+
+
+def _imported(spec: str):
+    """Get a type given as ``module:attribute``, None if not imported yet"""
+    module, _, qualname = spec.partition(":")
+    if module not in sys.modules:
+        return None
+    return _load(spec)
+
+
+def _entry_points(group: str) -> List:
+    try:
+        from importlib import metadata
+    except ImportError:  # pragma: no cover
+        try:
+            import importlib_metadata as metadata
+        except ImportError:
+            return []
+    entry_points = metadata.entry_points()
+    if hasattr(entry_points, "select"):
+        return list(entry_points.select(group=group))
+    return list(entry_points.get(group, []))  # pragma: no cover
+
+
+class Registry:
+    """Factories of sources or destinations, imported on first use
+
+    URIs are dispatched on their scheme. Factories are registered as
+    ``module:attribute`` strings, or discovered from the entry points
+    of the group (looked up only for unknown schemes), and imported
+    the first time their scheme is used. Other objects are dispatched
+    on their type, looked up once per concrete type.
+    """
+
+    def __init__(self, kind: str, group: str, exception: Type[Exception]):
+        """Constructor for Registry object.
+
+        :param kind: What the factories create, for error messages.
+        :param group: The entry point group of the factories.
+        :param exception: Raised for objects no factory accepts.
+        """
+        self.kind = kind
+        self.group = group
+        self.exception = exception
+        self._specs: Dict[str, object] = {}
+        self._factories: Dict[str, Factory] = {}
+        self._types: List[tuple] = []
+        self._type_cache: Dict[type, Callable] = {}
+        self._discovered = False
+        self._lock = threading.Lock()
+
+    def register(self, scheme: str, factory: Union[str, Factory]):
+        """
+        Register the factory of a URI scheme.
+
+        :param scheme: The scheme, such as ``file``.
+        :param factory: A callable receiving the URI split by
+        urllib.parse.urlsplit(), or its ``module:attribute`` path.
+        """
+        with self._lock:
+            self._specs[scheme.lower()] = factory
+            self._factories.pop(scheme.lower(), None)
+
+    def register_type(self, cls: Union[str, type], factory: Union[str, Callable]):
+        """
+        Register the factory of objects of a type, checked in order.
+
+        :param cls: The type, or its ``module:attribute`` path: such types
+        are only checked once their module is imported (by someone else),
+        as no object could be an instance of them before.
+        :param factory: A callable receiving the object, or its
+        ``module:attribute`` path.
+        """
+        with self._lock:
+            self._types.append((cls, factory))
+            self._type_cache.clear()
+
+    def _discover(self):
+        for entry_point in _entry_points(self.group):
+            # explicit registrations take precedence
+            self._specs.setdefault(entry_point.name.lower(), entry_point)
+        self._discovered = True
+
+    def schemes(self) -> List[str]:
+        """Every known scheme, discovering entry points"""
+        with self._lock:
+            if not self._discovered:
+                self._discover()
+            return sorted(self._specs)
+
+    def factory(self, scheme: str) -> Factory:
+        scheme = scheme.lower()
+        factory = self._factories.get(scheme)
+        if factory is not None:
+            return factory
+        with self._lock:
+            if scheme not in self._specs and not self._discovered:
+                self._discover()
+            spec = self._specs.get(scheme)
+        if spec is None:
+            raise self.exception(f"Unknown {self.kind} scheme {scheme}")
+        factory = self._factories[scheme] = _load(spec)
+        return factory
+
+    def from_uri(self, uri: str):
+        parsed = urllib.parse.urlsplit(uri)
+        return self.factory(parsed.scheme)(parsed)
+
+    def _type_factory(self, obj):
+        cls = type(obj)
+        factory = self._type_cache.get(cls)
+        if factory is None:
+            for registered, candidate in self._types:
+                if isinstance(registered, str):
+                    registered = _imported(registered)
+                if registered is not None and isinstance(obj, registered):
+                    factory = self._type_cache[cls] = _load(candidate)
+                    break
+        return factory
+
+    def get(self, obj):
+        """Create the source or destination of a URI or an object"""
+        if is_uri(obj):
+            return self.from_uri(obj)
+        factory = self._type_factory(obj)
+        if factory is None:
+            raise self.exception(f"Unexpected {self.kind} given")
+        return factory(obj)
+
+
+sources = Registry("source", SOURCE_GROUP, InvalidSourceException)
+destinations = Registry("destination", DESTINATION_GROUP, InvalidDestinationException)
+
+sources.register("file", "boa.uri:file_source")
+sources.register("cmd", "boa.uri:command_source")
+sources.register("chunkstore", "boa.uri:chunkstore_source")
+sources.register("sqlite", "boa.uri:sqlite_source")
+destinations.register("file", "boa.uri:file_destination")
+destinations.register("chunkstore", "boa.uri:chunkstore_destination")
+destinations.register("versions", "boa.uri:versioned_destination")
+destinations.register("tg", "boa.uri:telegram_destination")
+
+
+def register_source(scheme: str, factory: Union[str, Factory]):
+    sources.register(scheme, factory)
+
+
+def register_destination(scheme: str, factory: Union[str, Factory]):
+    destinations.register(scheme, factory)
@@ -0,0 +1,226 @@
+import collections
+import contextlib
+import os
+import pathlib
+from typing import Callable, Iterable, Iterator, Optional, Tuple, Union
+
+from boa.core import Destination, FilePathSource, Source
+
+# Bytes written between two checkpoints.
+CHECKPOINT_INTERVAL = 64 * 1024 * 1024
+JOURNAL_VERSION = 1
+# Bytes a destination may hold back when committing, kept unhashed.
+HASH_WINDOW = 4 * 1024 * 1024
+
+
+def identity(source: Source) -> Optional[dict]:
+    """
+    Identify the content of a source without reading it, if possible.
+
+    :return: The path, size and mtime of file sources, else None.
+    """
+    if not isinstance(source, FilePathSource):
+        return None
+    stat = os.stat(source.filepath)
+    return {
+        "path": os.path.abspath(source.filepath),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+    }
+
+
+def is_resumable(source: Source, destination: Destination) -> bool:
+    return getattr(destination, "resumable", False) and source.seekable()
+
+
+class Journal:
+    """Checkpoint of a resumable backup: the offset committed so far
+    by the destination, and the sha256 of the content before it"""
+
+    def __init__(self, filepath: Union[str, os.PathLike]):
+        self.filepath = pathlib.Path(filepath)
+
+    def load(self) -> Optional[dict]:
+        import json
+
+        try:
+            with open(self.filepath, "r") as f:
+                journal = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if journal.get("version") != JOURNAL_VERSION:
+            return None
+        return journal
+
+    def save(self, source: Optional[dict], offset: int, sha256: str):
+        import json
+
+        journal = {
+            "version": JOURNAL_VERSION,
+            "source": source,
+            "offset": offset,
+            "sha256": sha256,
+        }
+        tmp = self.filepath.with_name(self.filepath.name + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump(journal, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.filepath)
+
+    def remove(self):
+        try:
+            os.remove(self.filepath)
+        except FileNotFoundError:
+            pass
+
+
+class _RollingHash:
+    """Running sha256 of the content committed by a destination
+
+    Destinations may commit less than what they were given, so the
+    last window bytes are held until committed; older chunks are
+    hashed as they are fed.
+    """
+
+    def __init__(self, digest, offset: int, window: int = HASH_WINDOW):
+        self.digest = digest
+        self.offset = offset
+        self.window = window
+        self._pending = collections.deque()
+        self._size = 0
+
+    def feed(self, chunk: bytes):
+        self._pending.append(chunk)
+        self._size += len(chunk)
+        while self._size - len(self._pending[0]) >= self.window:
+            chunk = self._pending.popleft()
+            self._size -= len(chunk)
+            self.digest.update(chunk)
+            self.offset += len(chunk)
+
+    def advance(self, offset: int):
+        """Hash the content up to offset"""
+        if offset < self.offset:
+            raise ValueError(f"Content before {self.offset} is already hashed")
+        while self.offset < offset:
+            chunk = self._pending.popleft()
+            size = offset - self.offset
+            if len(chunk) > size:
+                self._pending.appendleft(chunk[size:])
+                chunk = chunk[:size]
+            self._size -= len(chunk)
+            self.digest.update(chunk)
+            self.offset += len(chunk)
+
+    def hexdigest(self) -> str:
+        return self.digest.hexdigest()
+
+
+def _hash_prefix(chunks: Iterable[bytes], size: int):
+    """Hash the first size bytes of chunks, None if there are fewer"""
+    import hashlib
+
+    digest = hashlib.sha256()
+    for chunk in chunks:
+        if size <= 0:
+            break
+        chunk = chunk[:size]
+        digest.update(chunk)
+        size -= len(chunk)
+    return digest if size <= 0 else None
+
+
+def resume_point(source: Source, destination, journal: Journal) -> Tuple[int, object]:
+    """
+    Find where a backup can continue from its journal.
+
+    The content kept by the destination must still match the journal,
+    and so must the source: file sources are compared by metadata,
+    others by hashing the same prefix.
+
+    :return: The offset to continue from, and the sha256 of the content
+    before it.
+    """
+    import hashlib
+
+    start = (0, hashlib.sha256())
+    state = journal.load()
+    if state is None:
+        return start
+    offset, sha256 = state["offset"], state["sha256"]
+
+    prefix = destination.partial(offset)
+    digest = None if prefix is None else _hash_prefix(prefix, offset)
+    if digest is None or digest.hexdigest() != sha256:
+        return start
+
+    expected = identity(source)
+    if expected is not None:
+        if expected != state["source"]:
+            return start
+    else:
+        check = _hash_prefix(source.chunks_from(0), offset)
+        if check is None or check.hexdigest() != sha256:
+            return start
+    return offset, digest
+
+
+def _checkpoint(destination, journal: Journal, rolling: _RollingHash, source):
+    offset = destination.commit()
+    if offset < rolling.offset:
+        # held back more than the window, the last checkpoint stays
+        return
+    rolling.advance(offset)
+    journal.save(source, rolling.offset, rolling.hexdigest())
+
+
+def backup_resumable(
+    source: Source,
+    destination: Destination,
+    interval: int = CHECKPOINT_INTERVAL,
+    wrap: Optional[Callable[[Iterable[bytes]], Iterator[bytes]]] = None,
+) -> Tuple[object, str]:
+    """
+    Backup a seekable source into a resumable destination.
+
+    Every interval bytes, and when the backup fails, the destination
+    commits its content and the journal records the committed offset
+    with a running hash of the content. A later backup of the same source
+    checks the content kept by the destination against the journal and
+    continues from there.
+
+    :param source: A seekable source.
+    :param destination: A resumable destination.
+    :param interval: The number of bytes written between checkpoints.
+    :param wrap: Wrap the chunks streamed from the source.
+    :return: The result of the destination, and the sha256 of the content.
+    """
+    journal = Journal(destination.journal_path())
+    offset, digest = resume_point(source, destination, journal)
+    rolling = _RollingHash(digest, offset)
+    expected = identity(source)
+
+    destination.reopen(offset)
+    chunks = source.chunks_from(offset)
+    if wrap is not None:
+        chunks = wrap(chunks)
+    last = written = offset
+    try:
+        for chunk in chunks:
+            destination.write_chunk(chunk)
+            rolling.feed(chunk)
+            written += len(chunk)
+            if written - last >= interval:
+                _checkpoint(destination, journal, rolling, expected)
+                last = written
+    except BaseException:
+        with contextlib.suppress(Exception):
+            _checkpoint(destination, journal, rolling, expected)
+        destination.abort()
+        raise
+
+    result = destination.close()
+    journal.remove()
+    rolling.advance(written)
+    return result, rolling.hexdigest()
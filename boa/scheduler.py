@@ -0,0 +1,513 @@
+import concurrent.futures
+import datetime
+import json
+import logging
+import os
+import pathlib
+import threading
+import urllib.parse
+from typing import Callable, Dict, List, Optional, Sequence, Union
+
+from boa.app import Boa
+from boa.chunkstore import ChunkStoreDestination
+from boa.core import (
+    DURABILITY_NONE,
+    CommandSource,
+    Destination,
+    FilePathDestination,
+    Source,
+    get_any_source,
+    get_destination,
+)
+from boa.memory import get_budget, set_memory_budget
+from boa.registry import is_uri
+from boa.throttle import PRIORITIES, Throttle
+from boa.uri import uri_path
+from boa.versions import Retention, VersionedDestination
+
+try:
+    import tomllib
+except ImportError:  # pragma: no cover
+    try:
+        import tomli as tomllib
+    except ImportError:
+        tomllib = None
+
+logger = logging.getLogger("boa.scheduler")
+
+_ALIASES = {
+    "@yearly": "0 0 1 1 *",
+    "@annually": "0 0 1 1 *",
+    "@monthly": "0 0 1 * *",
+    "@weekly": "0 0 * * 0",
+    "@daily": "0 0 * * *",
+    "@midnight": "0 0 * * *",
+    "@hourly": "0 * * * *",
+}
+# minute, hour, day of month, month, day of week (0 or 7 is Sunday)
+_RANGES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+# Days searched for the next run, before giving up on a schedule.
+_HORIZON = 5 * 366
+
+# URI schemes of destinations limited by their path.
+_PATH_SCHEMES = ("file", "chunkstore", "versions")
+
+STATUS_IDLE = "idle"
+STATUS_PENDING = "pending"
+STATUS_RUNNING = "running"
+STATUS_SUCCESS = "success"
+STATUS_FAILURE = "failure"
+
+
+def _parse_field(text: str, low: int, high: int) -> frozenset:
+    values = set()
+    for part in text.split(","):
+        expr, slash, step = part.partition("/")
+        step = int(step) if slash else 1
+        if expr == "*":
+            start, end = low, high
+        elif "-" in expr:
+            start, end = (int(value) for value in expr.split("-", 1))
+        else:
+            start = int(expr)
+            end = high if slash else start
+        if not low <= start <= end <= high or step < 1:
+            raise ValueError(f"Invalid schedule field {text}")
+        values.update(range(start, end + 1, step))
+    return frozenset(values)
+
+
+class Schedule:
+    """Cron-like schedule: minute, hour, day of month, month, day of week
+
+    Fields accept ``*``, values, ranges, lists and steps (``*/15``,
+    ``1-5``, ``0,30``); ``@hourly``, ``@daily``, ``@weekly``,
+    ``@monthly`` and ``@yearly`` are shortcuts. As in cron, a day
+    matches either restricted day field when both are restricted.
+    """
+
+    def __init__(self, expression: str):
+        self.expression = expression
+        fields = _ALIASES.get(expression.strip(), expression).split()
+        if len(fields) != 5:
+            raise ValueError(f"Schedule {expression} must have 5 fields")
+        try:
+            parsed = [_parse_field(f, *bounds) for f, bounds in zip(fields, _RANGES)]
+        except ValueError:
+            raise ValueError(f"Invalid schedule {expression}") from None
+        self.minutes, self.hours, self.days, self.months, weekdays = parsed
+        self.weekdays = frozenset(day % 7 for day in weekdays)
+        self.any_day = fields[2] == "*"
+        self.any_weekday = fields[4] == "*"
+
+    def _day_matches(self, dt: datetime.datetime) -> bool:
+        day = dt.day in self.days
+        weekday = (dt.weekday() + 1) % 7 in self.weekdays
+        if self.any_day or self.any_weekday:
+            return day and weekday
+        return day or weekday
+
+    def next(self, after: datetime.datetime) -> datetime.datetime:
+        """The first time strictly after the given one matching the schedule"""
+        dt = after.replace(second=0, microsecond=0) + datetime.timedelta(minutes=1)
+        limit = dt + datetime.timedelta(days=_HORIZON)
+        while dt < limit:
+            if dt.month not in self.months or not self._day_matches(dt):
+                dt = dt.replace(hour=0, minute=0) + datetime.timedelta(days=1)
+            elif dt.hour not in self.hours:
+                dt = dt.replace(minute=0) + datetime.timedelta(hours=1)
+            elif dt.minute not in self.minutes:
+                dt += datetime.timedelta(minutes=1)
+            else:
+                return dt
+        raise ValueError(f"Schedule {self.expression} never runs")
+
+
+def _make_source(spec) -> Source:
+    if isinstance(spec, dict) and "command" in spec:
+        keys = ("shell", "timeout", "check", "nice", "ionice", "ionice_level")
+        options = {k: spec[k] for k in keys if k in spec}
+        return CommandSource(spec["command"], **options)
+    return get_any_source(spec)
+
+
+def _make_destination(spec, durability: str) -> Destination:
+    if isinstance(spec, dict) and "chunkstore" in spec:
+        return ChunkStoreDestination(spec["chunkstore"], spec.get("name"))
+    if isinstance(spec, dict) and "versions" in spec:
+        retention = Retention(**spec.get("retention", {}))
+        name = spec.get("name", "backup")
+        return VersionedDestination(spec["versions"], name, retention, durability)
+    if is_uri(spec):
+        return get_destination(spec)
+    if isinstance(spec, (str, os.PathLike)):
+        return FilePathDestination(spec, durability)
+    raise ValueError(f"Unexpected destination {spec!r}")
+
+
+def _destination_key(spec) -> str:
+    if isinstance(spec, dict):
+        spec = spec.get("chunkstore", spec.get("versions", ""))
+    elif is_uri(spec):
+        uri = urllib.parse.urlsplit(spec)
+        if uri.scheme not in _PATH_SCHEMES:
+            return spec
+        spec = uri_path(uri)
+    return os.path.abspath(spec)
+
+
+def _is_under(key: str, path: str) -> bool:
+    return key == path or key.startswith(path.rstrip(os.sep) + os.sep)
+
+
+class Job:
+    """A backup run on a schedule, and the status of its last run"""
+
+    def __init__(
+        self,
+        name: str,
+        schedule: str,
+        source,
+        destination,
+        durability: str = DURABILITY_NONE,
+        priority: str = "normal",
+        throttle: Optional[dict] = None,
+        **options,
+    ):
+        """Constructor for Job object.
+
+        :param name: The name of the job.
+        :param schedule: When the job runs, see Schedule.
+        :param source: A path, a URI (see boa.registry), a {command = [...]}
+        table, or a list of them.
+        :param destination: A path, a URI, a {chunkstore = root, name = ...} table,
+        a {versions = dirpath, name = ..., retention = {last = ...}} table,
+        or a list of them.
+        :param durability: The durability of file destinations.
+        :param priority: The priority of the job: urgent jobs start first,
+        and take precedence in throttles. One of urgent, normal or bulk.
+        :param throttle: Limit the reads of the job, as the arguments of
+        boa.throttle.Throttle.
+        :param options: Passed to Boa, such as max_workers, incremental,
+        verify or container.
+        """
+        self.name = name
+        self.schedule = Schedule(schedule)
+        self.source = source
+        self.destination = destination
+        self.durability = durability
+        if priority not in PRIORITIES:
+            raise ValueError(f"Priority not valid ({priority})")
+        self.priority = PRIORITIES[priority]
+        self.throttle = None if throttle is None else Throttle(**throttle)
+        self.options = options
+        # set by the scheduler, shared with other jobs
+        self.shared_throttle = None
+        self.destination_throttles = {}
+
+        destinations = destination if isinstance(destination, list) else [destination]
+        self.destination_keys = sorted({_destination_key(d) for d in destinations})
+
+        self.status = STATUS_IDLE
+        self.next_run = None
+        self.last_start = None
+        self.last_end = None
+        self.last_error = None
+        self.runs = 0
+        self.failures = 0
+        self.skipped = 0
+
+    def _source(self, spec) -> Source:
+        source = _make_source(spec)
+        if self.throttle is not None:
+            source.throttle = self.throttle
+        return source
+
+    def _destination(self, spec) -> Destination:
+        destination = _make_destination(spec, self.durability)
+        key = _destination_key(spec)
+        # the most specific prefix applies
+        prefixes = [path for path in self.destination_throttles if _is_under(key, path)]
+        if prefixes:
+            destination.throttle = self.destination_throttles[max(prefixes, key=len)]
+        return destination
+
+    def sources(self):
+        if isinstance(self.source, list):
+            return [self._source(spec) for spec in self.source]
+        return self._source(self.source)
+
+    def destinations(self):
+        if isinstance(self.destination, list):
+            return [self._destination(spec) for spec in self.destination]
+        return self._destination(self.destination)
+
+    def run(self):
+        boa = Boa(throttle=self.shared_throttle, priority=self.priority, **self.options)
+        return boa.backup(self.sources(), self.destinations())
+
+    @property
+    def busy(self) -> bool:
+        return self.status in (STATUS_PENDING, STATUS_RUNNING)
+
+    def to_dict(self) -> dict:
+        def iso(dt):
+            return None if dt is None else dt.isoformat()
+
+        return {
+            "name": self.name,
+            "schedule": self.schedule.expression,
+            "status": self.status,
+            "next_run": iso(self.next_run),
+            "last_start": iso(self.last_start),
+            "last_end": iso(self.last_end),
+            "last_error": self.last_error,
+            "runs": self.runs,
+            "failures": self.failures,
+            "skipped": self.skipped,
+        }
+
+
+def load_config(filepath: Union[str, os.PathLike]) -> dict:
+    """Load a configuration file, TOML or JSON depending on its extension"""
+    path = pathlib.Path(filepath)
+    if path.suffix == ".toml":
+        if tomllib is None:
+            raise RuntimeError("Reading TOML requires Python 3.11+ or tomli")
+        with open(path, "rb") as f:
+            return tomllib.load(f)
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+class Scheduler:
+    """Run jobs on their schedules, sharing a pool of workers
+
+    At most max_workers jobs run at once, and at most the limit of
+    a destination prefix run jobs writing under it. A job due while
+    its previous run is still pending or running is skipped.
+    """
+
+    def __init__(
+        self,
+        jobs: Sequence[Job],
+        max_workers: int = 4,
+        destination_limits: Optional[Dict[str, int]] = None,
+        throttle: Optional[dict] = None,
+        destination_throttles: Optional[Dict[str, dict]] = None,
+        status_file: Optional[Union[str, os.PathLike]] = None,
+        runner: Callable[[Job], object] = Job.run,
+        clock: Callable[[], datetime.datetime] = datetime.datetime.now,
+    ):
+        """Constructor for Scheduler object.
+
+        :param jobs: The jobs to run.
+        :param max_workers: The maximum number of jobs running at once.
+        :param destination_limits: The maximum number of jobs running at once
+        with a destination under each path (or chunk store root).
+        :param throttle: Limit the reads of every job altogether, as the
+        arguments of boa.throttle.Throttle.
+        :param destination_throttles: Limit the writes of every job
+        under each path altogether, as the arguments of Throttle.
+        :param status_file: Where the status of jobs is written as JSON.
+        :param runner: Run a job.
+        :param clock: Get the current local time.
+        """
+        names = [job.name for job in jobs]
+        if len(set(names)) != len(names):
+            raise ValueError("Job names must be unique")
+        self.jobs = {job.name: job for job in jobs}
+        self.max_workers = max_workers
+        self.destination_limits = {
+            os.path.abspath(path): limit
+            for path, limit in (destination_limits or {}).items()
+        }
+        self.throttle = None if throttle is None else Throttle(**throttle)
+        self.destination_throttles = {
+            os.path.abspath(path): Throttle(**options)
+            for path, options in (destination_throttles or {}).items()
+        }
+        self.status_file = status_file
+        self.runner = runner
+        self.clock = clock
+
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._queue: List[Job] = []
+        self._running = 0
+        self._usage = {path: 0 for path in self.destination_limits}
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers)
+        self._stopped = False
+
+        now = self.clock()
+        for job in self.jobs.values():
+            job.next_run = job.schedule.next(now)
+            job.shared_throttle = self.throttle
+            job.destination_throttles = self.destination_throttles
+
+    @classmethod
+    def from_config(cls, config: dict, **kwargs) -> "Scheduler":
+        """
+        Create a scheduler from a configuration such as::
+
+            max_workers = 4
+            status_file = "/var/lib/boa/status.json"
+            memory_budget = 268435456  # of the process, see boa.memory
+
+            [destination_limits]
+            "/mnt/nas" = 1
+
+            [[jobs]]
+            name = "database"
+            schedule = "30 2 * * *"
+            source = {command = ["pg_dump", "app"]}
+            destination = "/mnt/nas/app.sql"
+        """
+        jobs = [Job(**spec) for spec in config.get("jobs", [])]
+        if "memory_budget" in config:
+            set_memory_budget(config["memory_budget"])
+        options = {
+            key: config[key]
+            for key in (
+                "max_workers",
+                "destination_limits",
+                "throttle",
+                "destination_throttles",
+                "status_file",
+            )
+            if key in config
+        }
+        return cls(jobs, **dict(options, **kwargs))
+
+    def _limits(self, job: Job) -> List[str]:
+        """The limited destination prefixes a job writes under"""
+        return [
+            path
+            for path in self.destination_limits
+            if any(_is_under(key, path) for key in job.destination_keys)
+        ]
+
+    def _can_start(self, job: Job) -> bool:
+        if self._running >= self.max_workers:
+            return False
+        return all(
+            self._usage[path] < self.destination_limits[path]
+            for path in self._limits(job)
+        )
+
+    def _dispatch(self):
+        """Start queued jobs while workers and destinations allow,
+        the most urgent first, then the oldest"""
+        for job in sorted(self._queue, key=lambda j: j.priority):
+            if self._stopped or self._running >= self.max_workers:
+                return
+            if not self._can_start(job):
+                continue
+            self._queue.remove(job)
+            self._running += 1
+            for path in self._limits(job):
+                self._usage[path] += 1
+            job.status = STATUS_RUNNING
+            job.last_start = self.clock()
+            self._executor.submit(self._run, job)
+
+    def _run(self, job: Job):
+        error = None
+        try:
+            self.runner(job)
+        except Exception as e:
+            error = e
+            logger.exception("Job %s failed", job.name)
+        with self._lock:
+            self._running -= 1
+            for path in self._limits(job):
+                self._usage[path] -= 1
+            job.last_end = self.clock()
+            job.runs += 1
+            if error is None:
+                job.status, job.last_error = STATUS_SUCCESS, None
+            else:
+                job.status, job.last_error = STATUS_FAILURE, repr(error)
+                job.failures += 1
+            self._dispatch()
+            self._save_status()
+            self._wakeup.notify_all()
+
+    def tick(self):
+        """Queue the jobs due, skipping those whose previous run isn't over"""
+        with self._lock:
+            now = self.clock()
+            for job in self.jobs.values():
+                if job.next_run > now:
+                    continue
+                job.next_run = job.schedule.next(now)
+                if job.busy:
+                    job.skipped += 1
+                    logger.warning(
+                        "Job %s skipped, its previous run isn't over", job.name
+                    )
+                    continue
+                job.status = STATUS_PENDING
+                self._queue.append(job)
+            self._dispatch()
+            self._save_status()
+
+    def trigger(self, name: str) -> bool:
+        """Queue a job now, unless busy; return whether it was queued"""
+        with self._lock:
+            job = self.jobs[name]
+            if job.busy:
+                return False
+            job.status = STATUS_PENDING
+            self._queue.append(job)
+            self._dispatch()
+            self._save_status()
+            return True
+
+    def status(self) -> dict:
+        with self._lock:
+            return self._status()
+
+    def _status(self) -> dict:
+        return {
+            "updated": self.clock().isoformat(),
+            "running": self._running,
+            "jobs": [job.to_dict() for job in self.jobs.values()],
+            "memory": get_budget().stats(),
+        }
+
+    def _save_status(self):
+        if self.status_file is None:
+            return
+        path = pathlib.Path(self.status_file)
+        tmp = path.with_name(f".{path.name}.tmp")
+        with open(tmp, "w") as f:
+            json.dump(self._status(), f, indent=2)
+        os.replace(tmp, path)
+
+    def run_forever(self, stop: threading.Event):
+        """Run jobs on schedule until stop is set, then wait for running jobs"""
+        self._save_status()
+        while not stop.is_set():
+            self.tick()
+            next_run = min((job.next_run for job in self.jobs.values()), default=None)
+            timeout = 60.0
+            if next_run is not None:
+                timeout = min(timeout, (next_run - self.clock()).total_seconds())
+            stop.wait(max(timeout, 0.0) + 0.01)
+        self.shutdown()
+
+    def join(self):
+        """Wait until no job is queued nor running"""
+        with self._lock:
+            self._wakeup.wait_for(lambda: not self._queue and not self._running)
+
+    def shutdown(self, wait: bool = True):
+        """Drop queued jobs and stop, waiting for running ones if asked"""
+        with self._lock:
+            self._stopped = True
+            for job in self._queue:
+                job.status = STATUS_IDLE
+            self._queue.clear()
+            self._save_status()
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,163 @@
+import errno
+import functools
+import os
+from typing import Iterator, List, Tuple, Union
+
+from boa.core import DEFAULT_CHUNK_SIZE, FilePathDestination, FilePathSource
+
+# Holes are only detected on whole filesystem blocks.
+HOLE_MIN_SIZE = 4096
+
+Extent = Tuple[int, int]
+
+
+class Hole(bytes):
+    """
+    A chunk of zeros standing for a hole of a sparse file.
+
+    Being bytes, it is written as zeros by any destination; sparse
+    destinations skip it instead, and containers record it in their
+    index without storing it. Build them with hole().
+    """
+
+    __slots__ = ()
+
+
+@functools.lru_cache(maxsize=8)
+def hole(size: int) -> Hole:
+    """A hole of size bytes, shared by the chunks of the same size"""
+    return Hole(size)
+
+
+@functools.lru_cache(maxsize=8)
+def _zeros(size: int) -> bytes:
+    return bytes(size)
+
+
+def is_zero(chunk: bytes) -> bool:
+    return isinstance(chunk, Hole) or (
+        len(chunk) >= HOLE_MIN_SIZE and chunk == _zeros(len(chunk))
+    )
+
+
+def _seek(fd: int, offset: int, whence: int, size: int) -> int:
+    try:
+        return min(os.lseek(fd, offset, whence), size)
+    except OSError as e:
+        if e.errno == errno.ENXIO:
+            # no more data after offset
+            return size
+        raise
+
+
+def extents(fd: int, offset: int, size: int) -> Iterator[Tuple[int, int, bool]]:
+    """
+    Map the data and holes of a file with SEEK_DATA and SEEK_HOLE.
+
+    :param fd: The file descriptor, its position is changed.
+    :param offset: Where the map starts.
+    :param size: The size of the file.
+    :return: The (start, end, is_data) extents, all data if the
+    platform or the filesystem doesn't report holes.
+    """
+    if not hasattr(os, "SEEK_DATA"):
+        if offset < size:
+            yield offset, size, True
+        return
+    while offset < size:
+        try:
+            data = _seek(fd, offset, os.SEEK_DATA, size)
+        except OSError:
+            # not supported by the filesystem
+            yield offset, size, True
+            return
+        if data > offset:
+            yield offset, data, False
+        if data >= size:
+            return
+        end = _seek(fd, data, os.SEEK_HOLE, size)
+        yield data, end, True
+        offset = end
+
+
+def hole_chunks(size: int, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[Hole]:
+    while size > 0:
+        chunk = hole(min(chunk_size, size))
+        size -= len(chunk)
+        yield chunk
+
+
+def record_holes(chunks: Iterator[bytes], into: List[Extent]) -> Iterator[bytes]:
+    """Stream the chunks, recording the (offset, size) of holes into a list"""
+    offset = 0
+    for chunk in chunks:
+        if isinstance(chunk, Hole) and chunk:
+            if into and sum(into[-1]) == offset:
+                into[-1] = (into[-1][0], into[-1][1] + len(chunk))
+            else:
+                into.append((offset, len(chunk)))
+        offset += len(chunk)
+        yield chunk
+
+
+class SparseFilePathSource(FilePathSource):
+    """Interface for a sparse file as source of backup
+
+    Holes reported by the filesystem are never read, and blocks of
+    zeros are detected within data: both are streamed as Hole chunks.
+    """
+
+    def chunks(self, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[bytes]:
+        return self.chunks_from(0, chunk_size)
+
+    def chunks_from(
+        self, offset: int, chunk_size: int = DEFAULT_CHUNK_SIZE
+    ) -> Iterator[bytes]:
+        with open(self.filepath, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            for start, end, is_data in extents(f.fileno(), offset, size):
+                if not is_data:
+                    yield from hole_chunks(end - start, chunk_size)
+                    continue
+                f.seek(start)
+                remaining = end - start
+                while remaining > 0:
+                    chunk = f.read(min(chunk_size, remaining))
+                    if not chunk:
+                        # truncated meanwhile
+                        return
+                    remaining -= len(chunk)
+                    yield hole(len(chunk)) if is_zero(chunk) else chunk
+
+
+class SparseFilePathDestination(FilePathDestination):
+    """Interface for destination of backup on filesystem, written sparse
+
+    Holes and blocks of zeros are seeked over rather than written, and
+    the file is truncated to its final size, so that the filesystem
+    allocates no space for them.
+    """
+
+    def preallocate(self, size: int):
+        # allocating would fill the holes
+        pass
+
+    def write_chunk(self, chunk: bytes):
+        if is_zero(chunk):
+            self._file.seek(len(chunk), os.SEEK_CUR)
+        else:
+            self._file.write(chunk)
+
+    def commit(self) -> int:
+        # a trailing hole isn't part of the file until truncated
+        self._file.truncate()
+        return super().commit()
+
+    def close(self):
+        self._file.truncate()
+        super().close()
+
+    def write_file(self, filepath: Union[str, os.PathLike]):
+        # copied chunk by chunk, as the kernel may fill the holes
+        source = SparseFilePathSource(filepath)
+        return self.write_stream(source.chunks(), source.size())
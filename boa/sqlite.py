@@ -0,0 +1,130 @@
+import os
+import pathlib
+import sqlite3
+import tempfile
+import time
+from typing import Callable, Iterator, Optional, Union
+
+from boa.core import DEFAULT_CHUNK_SIZE, FilePathSource, Source
+from boa.exception import SQLiteBusyException
+
+# Pages copied by each step of the online backup, and the seconds slept
+# between steps, during which writers can take the database lock.
+SQLITE_PAGES = 1024
+SQLITE_SLEEP = 0.01
+# How long steps are retried while the database is locked by others,
+# waiting SQLITE_BUSY_SLEEP seconds between retries.
+SQLITE_BUSY_TIMEOUT = 60.0
+SQLITE_BUSY_SLEEP = 0.05
+
+# Result codes of the steps, as given to progress callbacks.
+SQLITE_BUSY = 5
+SQLITE_LOCKED = 6
+
+
+class SQLiteSource(Source):
+    """Interface for a live SQLite database as source of backup
+
+    The database is copied with the online backup API, a few pages at a
+    time, into a temporary snapshot which is then streamed: between the
+    steps, writers can take the database lock, and the snapshot is
+    consistent even if they commit meanwhile (the copy restarts if
+    another connection writes to the database). Requires Python 3.7.
+    """
+
+    def __init__(
+        self,
+        database: Union[str, os.PathLike, sqlite3.Connection],
+        pages: int = SQLITE_PAGES,
+        sleep: float = SQLITE_SLEEP,
+        name: str = "main",
+        tmpdir: Union[None, str, os.PathLike] = None,
+        progress: Optional[Callable[[int, int, int], object]] = None,
+        busy_timeout: float = SQLITE_BUSY_TIMEOUT,
+    ):
+        """Constructor for SQLite source object.
+
+        :param database: The path of the database, opened read-only, or
+        a connection to it, which must be usable from the thread running
+        the backup (see check_same_thread of sqlite3.connect()), and
+        must not be in a transaction.
+        :param pages: The pages copied by each step, all at once if <= 0.
+        :param sleep: The seconds slept between steps.
+        :param name: The database of the connection to copy, such as
+        ``main``, ``temp`` or the name of an attached database.
+        :param tmpdir: Where the snapshot is written, see tempfile.
+        :param progress: Called after each step with the status,
+        the remaining and the total pages, see Connection.backup().
+        :param busy_timeout: The seconds a step is retried while the
+        database is locked, before raising SQLiteBusyException.
+        """
+        if pages == 0:
+            pages = -1
+        self.database = database
+        self.pages = pages
+        self.sleep = sleep
+        self.name = name
+        self.tmpdir = tmpdir
+        self.progress = progress
+        self.busy_timeout = busy_timeout
+
+    def _connect(self) -> sqlite3.Connection:
+        if isinstance(self.database, sqlite3.Connection):
+            if self.database.in_transaction:
+                # its own lock would make every step busy
+                raise SQLiteBusyException(
+                    "Can't back up a connection in a transaction, commit it first"
+                )
+            return self.database
+        path = pathlib.Path(self.database).resolve()
+        if not path.is_file():
+            raise FileNotFoundError(f"Database {self.database} doesn't exist")
+        return sqlite3.connect(
+            f"{path.as_uri()}?mode=ro", uri=True, timeout=self.busy_timeout
+        )
+
+    def _step(self, status: int, remaining: int, total: int):
+        """Called by Connection.backup() after each step"""
+        if status in (SQLITE_BUSY, SQLITE_LOCKED):
+            if self._busy_since is None:
+                self._busy_since = time.monotonic()
+            elif time.monotonic() - self._busy_since > self.busy_timeout:
+                raise SQLiteBusyException(
+                    f"Database {self.database} locked for more than "
+                    f"{self.busy_timeout} seconds"
+                )
+            return
+        self._busy_since = None
+        if self.progress is not None:
+            self.progress(status, remaining, total)
+        # backup() itself only sleeps after busy steps
+        if remaining > 0 and self.sleep > 0:
+            time.sleep(self.sleep)
+
+    def snapshot(self, filepath: Union[str, os.PathLike]):
+        """Copy a consistent snapshot of the database into a new file"""
+        if not hasattr(sqlite3.Connection, "backup"):
+            raise NotImplementedError("SQLite backups require Python 3.7 or later")
+        source = self._connect()
+        self._busy_since = None
+        try:
+            target = sqlite3.connect(os.fspath(filepath))
+            try:
+                source.backup(
+                    target,
+                    pages=self.pages,
+                    progress=self._step,
+                    name=self.name,
+                    sleep=SQLITE_BUSY_SLEEP,
+                )
+            finally:
+                target.close()
+        finally:
+            if source is not self.database:
+                source.close()
+
+    def chunks(self, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[bytes]:
+        with tempfile.TemporaryDirectory(dir=self.tmpdir) as tmpdir:
+            filepath = os.path.join(tmpdir, "snapshot.sqlite3")
+            self.snapshot(filepath)
+            yield from FilePathSource(filepath).chunks(chunk_size)
@@ -0,0 +1,156 @@
+import functools
+import queue
+import threading
+import time
+from typing import TYPE_CHECKING, Iterable, List, Optional, Sequence, Tuple
+
+from boa.core import Destination
+from boa.memory import in_waves
+
+if TYPE_CHECKING:  # pragma: no cover
+    from boa.metrics import Observer
+
+# Number of chunks each destination may lag behind the source.
+DEFAULT_QUEUE_SIZE = 8
+
+_END = object()
+_ABORT = object()
+
+
+class _Writer(threading.Thread):
+    """Thread writing the chunks of its queue into a destination"""
+
+    def __init__(
+        self,
+        destination: Destination,
+        queue_size: int,
+        observer: Optional["Observer"] = None,
+    ):
+        super().__init__(daemon=True)
+        self.destination = destination
+        self.queue = queue.Queue(queue_size)
+        self.observer = observer
+        self.result = None
+        self.error = None
+
+    def put(self, chunk: bytes):
+        if self.observer is None:
+            self.queue.put(chunk)
+            return
+        start = time.perf_counter()
+        self.queue.put(chunk)
+        self.observer.wait(self.destination, time.perf_counter() - start)
+
+    def _write_chunk(self, chunk: bytes):
+        if self.observer is None:
+            self.destination.write_chunk(chunk)
+            return
+        start = time.perf_counter()
+        self.destination.write_chunk(chunk)
+        seconds = time.perf_counter() - start
+        self.observer.write(self.destination, len(chunk), seconds)
+
+    def _drain(self):
+        """Discard chunks until the end of the stream, not to block the reader"""
+        while True:
+            item = self.queue.get()
+            if item is _END or item is _ABORT:
+                return
+
+    def _consume(self) -> bool:
+        """Write chunks until the end of the stream, return False if aborted"""
+        while True:
+            item = self.queue.get()
+            if item is _END:
+                return True
+            if item is _ABORT:
+                self.destination.abort()
+                return False
+            self._write_chunk(item)
+
+    def run(self):
+        # any error, even not an Exception, must leave the queue drained
+        try:
+            self.destination.open()
+        except BaseException as e:
+            self.error = e
+            self._drain()
+            return
+
+        try:
+            if not self._consume():
+                return
+        except BaseException as e:
+            self.error = e
+            try:
+                self.destination.abort()
+            except BaseException:
+                pass
+            self._drain()
+            return
+
+        try:
+            self.result = self.destination.close()
+        except BaseException as e:
+            self.error = e
+
+
+def _stop(writers: Sequence[_Writer], item):
+    for writer in writers:
+        writer.queue.put(item)
+    for writer in writers:
+        writer.join()
+
+
+def _tee_wave(
+    chunks: Iterable[bytes],
+    destinations: Sequence[Destination],
+    queue_size: int,
+    observer: Optional["Observer"],
+) -> List[Tuple]:
+    writers = [_Writer(d, queue_size, observer) for d in destinations]
+    for writer in writers:
+        writer.start()
+
+    try:
+        for chunk in chunks:
+            for writer in writers:
+                if writer.error is None:
+                    writer.put(chunk)
+    except BaseException:
+        _stop(writers, _ABORT)
+        raise
+
+    _stop(writers, _END)
+    return [(writer.result, writer.error) for writer in writers]
+
+
+def tee(
+    chunks: Iterable[bytes],
+    destinations: Sequence[Destination],
+    queue_size: int = DEFAULT_QUEUE_SIZE,
+    observer: Optional["Observer"] = None,
+    max_workers: Optional[int] = None,
+) -> List[Tuple]:
+    """
+    Write every chunk into each destination concurrently, reading chunks once.
+
+    Every destination is written by its own thread, through a bounded queue:
+    when a queue is full the reader waits, so a slow destination throttles
+    the source instead of buffering without limit. A failing destination
+    is aborted and dropped, while the others keep receiving the content.
+    If the chunks themselves fail, every destination is aborted and
+    the error is raised. Destinations run by waves of max_workers, each
+    opened only when its wave starts: the content read by the first wave
+    is spooled for the next ones (see ``boa.memory.in_waves``).
+
+    :param chunks: The content to write, as an iterable of bytes.
+    :param destinations: The destinations receiving the content.
+    :param queue_size: The maximum number of chunks queued per destination.
+    :param observer: Notified of chunk writes and of waits on full queues.
+    :param max_workers: The maximum number of destinations, and threads,
+    running at once; every destination if None.
+    :return: A list of (result, error) pairs, one for each destination.
+    """
+    wave = functools.partial(_tee_wave, queue_size=queue_size, observer=observer)
+    return in_waves(chunks, destinations, max_workers, wave)
@@ -0,0 +1,186 @@
+import collections
+import threading
+import time
+from typing import Iterable, Iterator, List, Optional, Sequence
+
+from boa.core import Destination
+
+PRIORITY_URGENT = 0
+PRIORITY_NORMAL = 1
+PRIORITY_BULK = 2
+PRIORITIES = {
+    "urgent": PRIORITY_URGENT,
+    "normal": PRIORITY_NORMAL,
+    "bulk": PRIORITY_BULK,
+}
+
+
+class TokenBucket:
+    """Rate limiter refilling rate tokens per second, up to burst
+
+    Requests larger than the burst are granted once the bucket is full,
+    leaving it in debt, so that chunks of any size can be throttled.
+    While a request of higher priority (lower value) is waiting,
+    requests of lower priority wait too.
+    """
+
+    def __init__(
+        self, rate: float, burst: Optional[float] = None, clock=time.monotonic
+    ):
+        """Constructor for TokenBucket object.
+
+        :param rate: The tokens added every second.
+        :param burst: The capacity of the bucket, rate if None.
+        :param clock: Get the current time in seconds.
+        """
+        if rate <= 0:
+            raise ValueError("Rate must be positive")
+        self.rate = rate
+        self.burst = rate if burst is None else burst
+        self.clock = clock
+        self._tokens = self.burst
+        self._updated = clock()
+        self._init_sync()
+
+    def _init_sync(self):
+        self._condition = threading.Condition()
+        self._waiting = collections.Counter()
+
+    def __getstate__(self):
+        # a bucket copied into a process throttles that process alone
+        state = dict(self.__dict__)
+        del state["_condition"], state["_waiting"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._init_sync()
+
+    def _refill(self):
+        now = self.clock()
+        elapsed = max(now - self._updated, 0.0)
+        self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+        self._updated = now
+
+    def _preempted(self, priority: int) -> bool:
+        return any(count for p, count in self._waiting.items() if p < priority)
+
+    def acquire(self, amount: float, priority: int = PRIORITY_NORMAL):
+        """Wait until amount tokens can be taken, then take them"""
+        needed = min(amount, self.burst)
+        with self._condition:
+            self._waiting[priority] += 1
+            try:
+                while True:
+                    self._refill()
+                    if self._preempted(priority):
+                        # woken up when the preempting request is granted
+                        self._condition.wait(1.0)
+                    elif self._tokens >= needed:
+                        self._tokens -= amount
+                        return
+                    else:
+                        self._condition.wait((needed - self._tokens) / self.rate)
+            finally:
+                self._waiting[priority] -= 1
+                self._condition.notify_all()
+
+
+class Throttle:
+    """Limit of bytes and operations (chunks) per second
+
+    A throttle shared by several sources, destinations or Boa objects
+    limits them altogether.
+    """
+
+    def __init__(
+        self,
+        bytes_per_second: Optional[float] = None,
+        ops_per_second: Optional[float] = None,
+        burst_seconds: float = 1.0,
+    ):
+        """Constructor for Throttle object.
+
+        :param bytes_per_second: The bandwidth, unlimited if None.
+        :param ops_per_second: The chunks read or written every second,
+        unlimited if None.
+        :param burst_seconds: How many seconds of unused rate may be
+        spent at once.
+        """
+        self.bytes = None
+        self.ops = None
+        if bytes_per_second is not None:
+            self.bytes = TokenBucket(bytes_per_second, bytes_per_second * burst_seconds)
+        if ops_per_second is not None:
+            self.ops = TokenBucket(
+                ops_per_second, max(ops_per_second * burst_seconds, 1)
+            )
+
+    def acquire(self, nbytes: int, priority: int = PRIORITY_NORMAL):
+        """Wait until an operation of nbytes is allowed"""
+        if self.ops is not None:
+            self.ops.acquire(1, priority)
+        if self.bytes is not None:
+            self.bytes.acquire(nbytes, priority)
+
+
+def throttles(*objects) -> List[Throttle]:
+    """
+    Collect the throttles applying to the given objects.
+
+    Sources and destinations are throttled by their ``throttle``
+    attribute, if set; throttles themselves are kept as is.
+    """
+    found = []
+    for obj in objects:
+        throttle = obj if isinstance(obj, Throttle) else getattr(obj, "throttle", None)
+        if throttle is not None:
+            found.append(throttle)
+    return found
+
+
+def throttled(
+    chunks: Iterable[bytes],
+    limits: Sequence[Throttle],
+    priority: int = PRIORITY_NORMAL,
+) -> Iterator[bytes]:
+    """Stream chunks, waiting for every throttle before each"""
+    for chunk in chunks:
+        for throttle in limits:
+            throttle.acquire(len(chunk), priority)
+        yield chunk
+
+
+class ThrottledDestination(Destination):
+    """Proxy throttling the chunk writes of a destination, for broadcasts"""
+
+    def __init__(
+        self,
+        destination: Destination,
+        limits: Sequence[Throttle],
+        priority: int = PRIORITY_NORMAL,
+    ):
+        self.destination = destination
+        self.limits = limits
+        self.priority = priority
+        from boa.metrics import describe
+
+        # observers report the proxied destination
+        self.label = describe(destination)
+
+    def open(self):
+        return self.destination.open()
+
+    def write_chunk(self, chunk: bytes):
+        for throttle in self.limits:
+            throttle.acquire(len(chunk), self.priority)
+        self.destination.write_chunk(chunk)
+
+    def close(self):
+        return self.destination.close()
+
+    def abort(self):
+        return self.destination.abort()
+
+    def write(self, content: bytes):
+        return self.destination.write(content)
@@ -0,0 +1,130 @@
+# Factories of the built-in URI schemes, registered in boa.registry.
+# Paths may be relative (file://backups/db.sql) and percent-encoded.
+import shlex
+import urllib.parse
+from typing import Callable, Dict
+
+from boa.core import (
+    CommandSource,
+    Destination,
+    FilePathDestination,
+    Source,
+    _path_source,
+)
+
+_TRUE = ("1", "true", "yes", "on")
+
+
+def uri_path(uri: urllib.parse.SplitResult) -> str:
+    """The path of a URI, including its authority"""
+    return urllib.parse.unquote(uri.netloc + uri.path)
+
+
+def _options(uri: urllib.parse.SplitResult, types: Dict[str, Callable]) -> dict:
+    query = urllib.parse.parse_qs(uri.query, keep_blank_values=True)
+    unknown = set(query) - set(types)
+    if unknown:
+        raise ValueError(
+            f"Unknown options {', '.join(sorted(unknown))} in {uri.geturl()}"
+        )
+    return {key: types[key](values[-1]) for key, values in query.items()}
+
+
+def _bool(value: str) -> bool:
+    return value.lower() in _TRUE
+
+
+def file_source(uri: urllib.parse.SplitResult) -> Source:
+    if _options(uri, {"sparse": _bool}).get("sparse"):
+        from boa.sparse import SparseFilePathSource
+
+        return SparseFilePathSource(uri_path(uri))
+    return _path_source(uri_path(uri))
+
+
+def command_source(uri: urllib.parse.SplitResult) -> Source:
+    options = _options(
+        uri,
+        {
+            "shell": _bool,
+            "timeout": float,
+            "check": _bool,
+            "nice": int,
+            "ionice": int,
+            "ionice_level": int,
+        },
+    )
+    command = uri_path(uri)
+    args = command if options.get("shell") else shlex.split(command)
+    return CommandSource(args, **options)
+
+
+def chunkstore_source(uri: urllib.parse.SplitResult) -> Source:
+    from boa.chunkstore import ChunkStoreSource
+
+    options = _options(uri, {"name": str})
+    if "name" not in options:
+        raise ValueError(f"Missing name in {uri.geturl()}")
+    return ChunkStoreSource(uri_path(uri), options["name"])
+
+
+def sqlite_source(uri: urllib.parse.SplitResult) -> Source:
+    from boa.sqlite import SQLiteSource
+
+    options = _options(uri, {"pages": int, "sleep": float, "name": str})
+    return SQLiteSource(uri_path(uri), **options)
+
+
+def file_destination(uri: urllib.parse.SplitResult) -> Destination:
+    types = {
+        "durability": str,
+        "resumable": _bool,
+        "delta": _bool,
+        "block_size": int,
+        "sparse": _bool,
+    }
+    options = _options(uri, types)
+    if options.pop("sparse", False):
+        from boa.sparse import SparseFilePathDestination
+
+        if options.get("delta") or "block_size" in options:
+            raise ValueError(f"Delta destinations can't be sparse: {uri.geturl()}")
+        return SparseFilePathDestination(uri_path(uri), **options)
+    if options.pop("delta", False):
+        from boa.delta import DeltaFilePathDestination
+
+        if options.pop("resumable", False):
+            raise ValueError(f"Delta destinations can't be resumable: {uri.geturl()}")
+        return DeltaFilePathDestination(uri_path(uri), **options)
+    if "block_size" in options:
+        raise ValueError(f"block_size requires delta: {uri.geturl()}")
+    return FilePathDestination(uri_path(uri), **options)
+
+
+def chunkstore_destination(uri: urllib.parse.SplitResult) -> Destination:
+    from boa.chunkstore import ChunkStoreDestination
+
+    options = _options(uri, {"name": str, "resumable": _bool})
+    return ChunkStoreDestination(uri_path(uri), **options)
+
+
+def versioned_destination(uri: urllib.parse.SplitResult) -> Destination:
+    from boa.versions import Retention, VersionedDestination
+
+    rules = ("last", "daily", "weekly", "monthly", "yearly")
+    types = dict({rule: int for rule in rules}, name=str, durability=str)
+    options = _options(uri, types)
+    retention = Retention(
+        **{rule: options.pop(rule) for rule in rules if rule in options}
+    )
+    return VersionedDestination(uri_path(uri), retention=retention, **options)
+
+
+def telegram_destination(uri: urllib.parse.SplitResult) -> Destination:
+    # the Telegram library is only imported when a tg:// URI is used
+    from boa.ext.telegram import TelegramBotDestination
+
+    options = _options(
+        uri, {"message": str, "base_url": str, "part_size": int, "max_retries": int}
+    )
+    return TelegramBotDestination(uri_path(uri) or None, **options)
@@ -0,0 +1,49 @@
+import hashlib
+import os
+from typing import Iterable, Iterator, Optional
+
+from boa.core import Destination, FilePathDestination
+from boa.exception import ChecksumMismatchException
+from boa.metrics import describe
+
+CHECKSUM_SUFFIX = ".sha256"
+
+
+def hashed(chunks: Iterable[bytes], digest) -> Iterator[bytes]:
+    """Stream the chunks, feeding them to the digest on the fly"""
+    for chunk in chunks:
+        digest.update(chunk)
+        yield chunk
+
+
+def record(destination: Destination, checksum: str):
+    """Store the checksum of a file destination next to it, as sha256sum does"""
+    if not isinstance(destination, FilePathDestination):
+        return
+    path = destination.filepath.with_name(destination.filepath.name + CHECKSUM_SUFFIX)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp, "w") as f:
+        f.write(f"{checksum}  {destination.filepath.name}\n")
+    os.replace(tmp, path)
+
+
+def check(destination: Destination, expected: str) -> Optional[str]:
+    """
+    Read back a destination, comparing its content with the expected sha256.
+
+    The checksum of a file destination is recorded next to it.
+    Destinations which can't be read back are not checked.
+
+    :return: The checksum of the destination, None if not checked.
+    """
+    source = destination.readback()
+    if source is None:
+        return None
+    digest = hashlib.sha256()
+    for chunk in source.chunks():
+        digest.update(chunk)
+    actual = digest.hexdigest()
+    if actual != expected:
+        raise ChecksumMismatchException(describe(destination), expected, actual)
+    record(destination, actual)
+    return actual
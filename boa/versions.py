@@ -0,0 +1,250 @@
+import collections
+import datetime
+import logging
+import os
+import pathlib
+import re
+import threading
+import time
+import uuid
+from typing import Iterable, List, Optional, Union
+
+from boa.core import DURABILITY_NONE, FilePathDestination, FilePathSource
+from boa.verify import CHECKSUM_SUFFIX
+
+# Versions deleted by a garbage collection step, before pausing.
+GC_BATCH_SIZE = 64
+# Seconds paused between two garbage collection steps.
+GC_PAUSE = 0.01
+TIMESTAMP_FORMAT = "%Y%m%dT%H%M%S.%fZ"
+
+logger = logging.getLogger("boa")
+
+Version = collections.namedtuple("Version", ["path", "time"])
+
+
+class Retention:
+    """Which versions to keep, the others expire
+
+    The newest ``last`` versions are kept, and so is the newest version
+    of each of the newest ``daily`` days, ``weekly`` ISO weeks,
+    ``monthly`` months and ``yearly`` years having versions.
+    With no rule at all, every version is kept.
+    """
+
+    def __init__(
+        self,
+        last: int = 0,
+        daily: int = 0,
+        weekly: int = 0,
+        monthly: int = 0,
+        yearly: int = 0,
+    ):
+        if min(last, daily, weekly, monthly, yearly) < 0:
+            raise ValueError("Retention rules can't be negative")
+        self.last = last
+        self.tiers = [
+            (daily, lambda t: t.date()),
+            (weekly, lambda t: t.isocalendar()[:2]),
+            (monthly, lambda t: (t.year, t.month)),
+            (yearly, lambda t: t.year),
+        ]
+
+    def keeps_all(self) -> bool:
+        return not self.last and not any(count for count, _ in self.tiers)
+
+    def expired(self, versions: Iterable[Version]) -> List[Version]:
+        """The versions to delete, oldest first"""
+        versions = sorted(versions, key=lambda v: v.time, reverse=True)
+        if self.keeps_all():
+            return []
+        kept = set(versions[: self.last])
+        for count, period in self.tiers:
+            periods = set()
+            for version in versions:
+                if len(periods) >= count:
+                    break
+                key = period(version.time)
+                if key not in periods:
+                    periods.add(key)
+                    kept.add(version)
+        return [version for version in reversed(versions) if version not in kept]
+
+
+class GarbageCollector:
+    """Background deletion of expired versions, a few at a time
+
+    A daemon thread deletes queued files by batches of batch_size,
+    pausing between batches so that deleting many versions neither
+    blocks backups nor saturates the disk.
+    """
+
+    def __init__(self, batch_size: int = GC_BATCH_SIZE, pause: float = GC_PAUSE):
+        self.batch_size = batch_size
+        self.pause = pause
+        self._queue = collections.deque()
+        self._queued = set()
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def collect(self, paths: Iterable[Union[str, os.PathLike]]):
+        """Queue files for deletion, ignoring those already queued"""
+        with self._condition:
+            for path in map(pathlib.Path, paths):
+                if path not in self._queued:
+                    self._queued.add(path)
+                    self._queue.append(path)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="boa-gc", daemon=True
+                )
+                self._thread.start()
+            self._condition.notify_all()
+
+    def pending(self) -> List[pathlib.Path]:
+        """The files queued and not deleted yet"""
+        with self._condition:
+            return list(self._queue)
+
+    def drain(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every queued file is deleted; False on timeout"""
+        with self._condition:
+            return self._condition.wait_for(lambda: not self._queued, timeout)
+
+    def step(self) -> int:
+        """Delete a batch of queued files, return how many were handled"""
+        with self._condition:
+            batch = [
+                self._queue.popleft()
+                for _ in range(min(self.batch_size, len(self._queue)))
+            ]
+        for path in batch:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError:
+                logger.exception("Failed to delete expired version %s", path)
+        with self._condition:
+            self._queued.difference_update(batch)
+            self._condition.notify_all()
+        return len(batch)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                if not self._condition.wait_for(lambda: self._queue, timeout=60):
+                    # exit when idle, collect() starts a new thread
+                    self._thread = None
+                    return
+            self.step()
+            time.sleep(self.pause)
+
+
+_collector = None
+_collector_lock = threading.Lock()
+
+
+def get_collector() -> GarbageCollector:
+    """Get the garbage collector shared by every versioned destination"""
+    global _collector
+    with _collector_lock:
+        if _collector is None:
+            _collector = GarbageCollector()
+    return _collector
+
+
+def _sidecar(path: pathlib.Path) -> pathlib.Path:
+    """The checksum of a version, written in verify mode"""
+    return path.with_name(path.name + CHECKSUM_SUFFIX)
+
+
+class VersionedDestination(FilePathDestination):
+    """Interface for destination of backup keeping every version in a directory
+
+    Every backup writes a new version ``name.<UTC timestamp>.<random>``
+    into the directory. Once written, versions expired by the retention are queued
+    to the garbage collector, which deletes them in the background.
+    """
+
+    def __init__(
+        self,
+        dirpath: Union[str, os.PathLike],
+        name: str = "backup",
+        retention: Optional[Retention] = None,
+        durability: str = DURABILITY_NONE,
+        collector: Optional[GarbageCollector] = None,
+    ):
+        """Constructor for Versioned destination object.
+
+        :param dirpath: The directory of the versions.
+        :param name: The prefix of the versions.
+        :param retention: The versions to keep, every one if None.
+        :param durability: When versions are flushed to disk, see
+        FilePathDestination.
+        :param collector: The garbage collector deleting expired versions,
+        the shared one (see get_collector()) if None.
+        """
+        if "/" in name or os.sep in name:
+            raise ValueError(f"Invalid version name {name}")
+        self.dirpath = pathlib.Path(dirpath)
+        self.name = name
+        self.retention = retention or Retention()
+        self.collector = collector
+        # versions written before the suffix have none
+        self._pattern = re.compile(
+            re.escape(name) + r"\.(\d{8}T\d{6}\.\d{6}Z)(?:\.[0-9a-f]{8})?"
+        )
+        super().__init__(self.dirpath / name, durability)
+
+    def versions(self) -> List[Version]:
+        """The versions in the directory, oldest first"""
+        versions = []
+        try:
+            entries = list(os.scandir(self.dirpath))
+        except FileNotFoundError:
+            return []
+        for entry in entries:
+            match = self._pattern.fullmatch(entry.name)
+            if match is None:
+                continue
+            timestamp = datetime.datetime.strptime(match.group(1), TIMESTAMP_FORMAT)
+            versions.append(Version(pathlib.Path(entry.path), timestamp))
+        return sorted(versions, key=lambda v: v.time)
+
+    def source(self, index: int = -1) -> FilePathSource:
+        """Get a version as a Source to restore it, the latest by default"""
+        return FilePathSource(self.versions()[index].path)
+
+    def _version_path(self) -> pathlib.Path:
+        now = datetime.datetime.now(datetime.timezone.utc)
+        # writers starting at the same time must not replace each other
+        suffix = uuid.uuid4().hex[:8]
+        return self.dirpath / f"{self.name}.{now.strftime(TIMESTAMP_FORMAT)}.{suffix}"
+
+    def open(self):
+        self.filepath = self._version_path()
+        super().open()
+
+    def close(self):
+        result = super().close()
+        try:
+            self.prune()
+        except OSError:
+            # the version is written, pruning is retried by the next one
+            logger.exception("Failed to prune versions of %s", self.dirpath)
+        return result
+
+    def prune(self) -> List[Version]:
+        """Queue the expired versions for deletion, and return them"""
+        if self.retention.keeps_all():
+            return []
+        expired = self.retention.expired(self.versions())
+        if expired:
+            collector = self.collector or get_collector()
+            collector.collect(
+                path
+                for version in expired
+                for path in (version.path, _sidecar(version.path))
+            )
+        return expired
@@ -0,0 +1,204 @@
+import asyncio
+import io
+import os
+import sys
+import tempfile
+import time
+
+import pytest
+
+import boa.aio as aio
+from boa import Boa
+from boa.core import (
+    DEFAULT_CHUNK_SIZE,
+    BytesSource,
+    FilePathDestination,
+    FileStreamDestination,
+    Source,
+)
+from boa.exception import (
+    BatchBackupException,
+    CommandException,
+    CommandTimeoutException,
+)
+
+is_win = sys.platform == "win32"
+
+
+class ListSource(aio.AsyncSource):
+    def __init__(self, chunks):
+        self._chunks = chunks
+
+    async def chunks(self, chunk_size=None):
+        for chunk in self._chunks:
+            await asyncio.sleep(0)
+            yield chunk
+
+
+class ListDestination(aio.AsyncDestination):
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.written = None
+        self.aborted = False
+
+    async def open(self):
+        self.written = []
+
+    async def write_chunk(self, chunk):
+        if self.fail:
+            raise OSError("disk full")
+        self.written.append(chunk)
+
+    async def close(self):
+        return len(self.written)
+
+    async def abort(self):
+        self.aborted = True
+
+
+def run(coro):
+    # asyncio.run() requires Python 3.7; subprocesses need a current loop,
+    # watched for its children before Python 3.8
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    if sys.version_info < (3, 8) and not is_win:
+        asyncio.get_child_watcher().attach_loop(loop)
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        asyncio.set_event_loop(None)
+        loop.close()
+
+
+class IteratorSource(Source):
+    def chunks(self, chunk_size=DEFAULT_CHUNK_SIZE):
+        return iter([b"foo", b"bar"])
+
+
+def test_abackup_siso():
+    boa = Boa()
+
+    destination = ListDestination()
+    assert run(boa.abackup(ListSource([b"foo", b"bar"]), destination)) == 2
+    assert destination.written == [b"foo", b"bar"]
+
+    # sync sources and destinations are adapted
+    destination = FileStreamDestination(io.BytesIO())
+    run(boa.abackup(BytesSource(b"foo"), destination))
+    assert destination.filestream.getvalue() == b"foo"
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "dst")
+        run(boa.abackup(ListSource([b"foo", b"bar"]), FilePathDestination(path)))
+        with open(path, "rb") as f:
+            assert f.read() == b"foobar"
+
+    # sources may return plain iterators
+    destination = ListDestination()
+    run(boa.abackup(IteratorSource(), destination))
+    assert destination.written == [b"foo", b"bar"]
+
+    # errors are raised as they are
+    destination = ListDestination(fail=True)
+    with pytest.raises(OSError):
+        run(boa.abackup(ListSource([b"foo"]), destination))
+    assert destination.aborted
+
+
+def test_abackup_miso_simo():
+    boa = Boa(max_workers=2)
+    length = 3
+
+    # miso
+    destination = ListDestination()
+    sources = [ListSource([b"foo"]), BytesSource(b"bar")]
+    run(boa.abackup(sources, destination))
+    assert destination.written == [b"foo", b"bar"]
+
+    # simo
+    destinations = [ListDestination() for _ in range(length)]
+    assert run(boa.abackup(ListSource([b"foo", b"bar"]), destinations)) == [2] * 3
+    for destination in destinations:
+        assert destination.written == [b"foo", b"bar"]
+
+    # simo with a failing destination
+    destinations = [ListDestination(), ListDestination(fail=True)]
+    with pytest.raises(BatchBackupException) as excinfo:
+        run(boa.abackup(ListSource([b"foo"]), destinations))
+    assert excinfo.value.results == [1, None]
+    assert isinstance(excinfo.value.errors[1], OSError)
+    assert destinations[1].aborted
+
+
+def test_abackup_mimo():
+    boa = Boa(max_workers=2)
+    length = 4
+    running, peak = 0, 0
+
+    class SlowDestination(ListDestination):
+        async def open(self):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await super().open()
+
+        async def close(self):
+            nonlocal running
+            await asyncio.sleep(0.01)
+            running -= 1
+            return await super().close()
+
+    sources = [ListSource([b"foo"] * i) for i in range(length)]
+    destinations = [SlowDestination() for _ in range(length)]
+    assert run(boa.abackup(sources, destinations)) == list(range(length))
+    assert peak == 2
+
+    with pytest.raises(ValueError):
+        run(boa.abackup(sources, destinations[1:]))
+
+
+def test_async_command_source():
+    async def read(source):
+        return b"".join([chunk async for chunk in source.chunks(1)])
+
+    shell = bool(is_win)
+    assert run(read(aio.AsyncCommandSource(["echo", "foo"], shell=shell))).strip() == (
+        b"foo"
+    )
+    assert run(read(aio.AsyncCommandSource("echo foo | tr o a", shell=True))) == (
+        b"faa\n"
+    )
+
+
+@pytest.mark.skipif(is_win, reason="requires a posix shell")
+def test_async_command_source_failure():
+    async def read(source):
+        return [chunk async for chunk in source.chunks()]
+
+    with pytest.raises(CommandException) as excinfo:
+        run(read(aio.AsyncCommandSource("exit 3", shell=True)))
+    assert excinfo.value.returncode == 3
+    assert run(read(aio.AsyncCommandSource("exit 3", shell=True, check=False))) == []
+
+    # stderr is kept for the error
+    with pytest.raises(CommandException) as excinfo:
+        run(read(aio.AsyncCommandSource("echo oops >&2; exit 1", shell=True)))
+    assert excinfo.value.stderr == b"oops\n"
+
+
+@pytest.mark.skipif(is_win, reason="requires a posix shell")
+def test_async_command_source_timeout():
+    async def read(source):
+        return [chunk async for chunk in source.chunks()]
+
+    start = time.monotonic()
+    with pytest.raises(CommandTimeoutException) as excinfo:
+        run(
+            read(
+                aio.AsyncCommandSource(
+                    "echo foo; exec sleep 10", shell=True, timeout=0.2
+                )
+            )
+        )
+    assert time.monotonic() - start < 5
+    assert excinfo.value.timeout == 0.2
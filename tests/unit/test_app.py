@@ -1,17 +1,31 @@
 import io
+import os
+import stat
+import sys
 import tempfile
 
+try:
+    import resource
+except ImportError:  # pragma: no cover
+    resource = None
+
 import pytest
 
-from boa import Boa, backup
+from boa import Boa, app, backup
 from boa.core import (
     BytesSource,
     Destination,
+    FilePathDestination,
+    FilePathSource,
     FileStreamDestination,
     FileStreamSource,
     Source,
 )
-from boa.exception import InvalidDestinationException, InvalidSourceException
+from boa.exception import (
+    BatchBackupException,
+    InvalidDestinationException,
+    InvalidSourceException,
+)
 
 
 def test_stringio():
@@ -70,6 +84,35 @@ def test_boa_backup_simo():
         assert destination.filestream.read() == msg
 
 
+def test_boa_backup_simo_waves(monkeypatch):
+    monkeypatch.setattr(app, "BROADCAST_WAVE_SIZE", 2)
+    reads = []
+
+    class CountedSource(BytesSource):
+        def chunks(self, chunk_size=3):
+            reads.append(True)
+            return super().chunks(chunk_size)
+
+    destinations = [FileStreamDestination(io.BytesIO()) for _ in range(5)]
+    Boa().backup(CountedSource(b"foobar"), destinations)
+    # the next waves get the content read by the first one
+    assert reads == [True]
+    assert all(d.filestream.getvalue() == b"foobar" for d in destinations)
+
+
+@pytest.mark.skipif(resource is None, reason="file descriptor limits")
+@pytest.mark.parametrize("max_workers", [1, 4])
+def test_boa_backup_simo_fd_limit(tmp_path, max_workers):
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (512, hard))
+    try:
+        destinations = [FilePathDestination(tmp_path / str(i)) for i in range(1000)]
+        Boa(max_workers=max_workers).backup(BytesSource(b"foo"), destinations)
+    finally:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (soft, hard))
+    assert all(d.filepath.read_bytes() == b"foo" for d in destinations)
+
+
 def test_boa_backup_miso():
     boa = Boa()
     msg = b"foo"
@@ -155,3 +198,167 @@ def test_backup_wrong_source(src, dst):
 def test_backup_wrong_dest(src, dst):
     with pytest.raises(InvalidDestinationException):
         backup(src, dst)
+
+
+class ChunkSource(Source):
+    def __init__(self, chunks):
+        self._chunks = chunks
+        self.reads = 0
+
+    def chunks(self, chunk_size=None):
+        for chunk in self._chunks:
+            self.reads += 1
+            yield chunk
+
+
+class ChunkDestination(FileStreamDestination):
+    def __init__(self):
+        super().__init__(io.BytesIO())
+        self.written = []
+
+    def write_chunk(self, chunk):
+        self.written.append(chunk)
+        super().write_chunk(chunk)
+
+
+def test_boa_backup_streaming():
+    boa = Boa()
+    chunks = [b"foo", b"bar", b"baz"]
+    length = 3
+
+    # siso, chunks flow through without being merged
+    source, destination = ChunkSource(chunks), ChunkDestination()
+    boa.backup(source, destination)
+    assert destination.written == chunks
+
+    # simo, the source is read only once
+    source = ChunkSource(chunks)
+    destinations = [ChunkDestination() for _ in range(length)]
+    boa.backup(source, destinations)
+    assert source.reads == len(chunks)
+    for destination in destinations:
+        assert destination.written == chunks
+
+    # miso
+    sources = [ChunkSource(chunks) for _ in range(length)]
+    destination = ChunkDestination()
+    boa.backup(sources, destination)
+    assert destination.written == chunks * length
+
+
+class FailingDestination(Destination):
+    def write(self, content):
+        raise OSError("disk full")
+
+
+@pytest.mark.parametrize("max_workers", [1, 4, None])
+def test_boa_backup_concurrent(max_workers):
+    boa = Boa(max_workers=max_workers)
+    msg = b"foo"
+    length = 8
+
+    # mimo
+    sources = [BytesSource(msg * i) for i in range(length)]
+    destinations = [FileStreamDestination(io.BytesIO()) for _ in range(length)]
+    assert boa.backup(sources, destinations) == [None] * length
+    for i, destination in enumerate(destinations):
+        assert destination.filestream.getvalue() == msg * i
+
+    # simo
+    source = ChunkSource([b"foo", b"bar"])
+    destinations = [ChunkDestination() for _ in range(length)]
+    assert boa.backup(source, destinations) == [None] * length
+    for destination in destinations:
+        assert destination.filestream.getvalue() == b"foobar"
+
+
+@pytest.mark.parametrize("max_workers", [1, 4])
+def test_boa_backup_collect_errors(max_workers):
+    boa = Boa(max_workers=max_workers)
+    msg = b"foo"
+
+    # a failing job doesn't stop the others
+    sources = [BytesSource(msg) for _ in range(3)]
+    destinations = [
+        FileStreamDestination(io.BytesIO()),
+        FailingDestination(),
+        FileStreamDestination(io.BytesIO()),
+    ]
+    with pytest.raises(BatchBackupException) as excinfo:
+        boa.backup(sources, destinations)
+    assert excinfo.value.results == [None, None, None]
+    assert [type(error) for error in excinfo.value.errors] == [
+        type(None),
+        OSError,
+        type(None),
+    ]
+    assert destinations[0].filestream.getvalue() == msg
+    assert destinations[2].filestream.getvalue() == msg
+
+    # the same holds for broadcast
+    destinations[0].filestream.seek(0)
+    destinations[2].filestream.seek(0)
+    with pytest.raises(BatchBackupException) as excinfo:
+        boa.backup(BytesSource(msg), destinations)
+    assert isinstance(excinfo.value.errors[1], OSError)
+    assert destinations[0].filestream.getvalue() == msg
+    assert destinations[2].filestream.getvalue() == msg
+
+
+def test_boa_backup_processes():
+    boa = Boa(max_workers=2, use_processes=True)
+    msg = b"foo"
+    length = 3
+
+    sources, destinations = [], []
+    for i in range(length):
+        with tempfile.NamedTemporaryFile("w+b", delete=False) as fp:
+            fp.write(msg * i)
+        sources.append(FilePathSource(fp.name))
+        destinations.append(FilePathDestination(fp.name + ".bak"))
+
+    boa.backup(sources, destinations)
+    for i, destination in enumerate(destinations):
+        with open(destination.filepath, "rb") as f:
+            assert f.read() == msg * i
+
+
+def test_boa_backup_file_copy(monkeypatch):
+    msg = b"foo" * 1000
+    with tempfile.NamedTemporaryFile("w+b", delete=False) as fp:
+        fp.write(msg)
+    dst = FilePathDestination(fp.name + ".bak")
+
+    # file to file copies skip chunks
+    monkeypatch.setattr(FilePathSource, "chunks", None)
+    Boa().backup(FilePathSource(fp.name), dst)
+    with open(dst.filepath, "rb") as f:
+        assert f.read() == msg
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="directories are not synced")
+def test_boa_backup_durability(monkeypatch):
+    synced = []
+    fsync = os.fsync
+
+    def recording_fsync(fd):
+        if stat.S_ISDIR(os.fstat(fd).st_mode):
+            synced.append(True)
+        fsync(fd)
+
+    monkeypatch.setattr(os, "fsync", recording_fsync)
+    length = 3
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        sources = [BytesSource(b"foo") for _ in range(length)]
+        destinations = [
+            FilePathDestination(os.path.join(tmpdir, str(i)), durability="batch")
+            for i in range(length)
+        ]
+        # a single sync of their directory for the whole batch
+        Boa().backup(sources, destinations)
+        assert synced == [True]
+
+        # no sync without batched destinations
+        Boa().backup(BytesSource(b"foo"), FilePathDestination(destinations[0].filepath))
+        assert synced == [True]
@@ -0,0 +1,152 @@
+import concurrent.futures
+import hashlib
+import os
+import random
+import tempfile
+
+import pytest
+
+from boa import Boa
+from boa.chunkstore import (
+    _TABLE,
+    _WINDOW,
+    Chunker,
+    ChunkStore,
+    ChunkStoreDestination,
+    ChunkStoreSource,
+    _fingerprints,
+)
+from boa.core import BytesSource, FilePathDestination
+
+SIZES = dict(min_size=256, avg_size=1024, max_size=4096)
+
+
+def payload(size, seed=0):
+    return random.Random(seed).getrandbits(size * 8).to_bytes(size, "little")
+
+
+def chunk(data, feed=1000, **sizes):
+    chunker = Chunker(**sizes)
+    chunks = []
+    for start in range(0, len(data), feed):
+        end = start + feed
+        chunks.extend(chunker.update(data[start:end]))
+    chunks.extend(chunker.finish())
+    return chunks
+
+
+def count_chunks(root):
+    return sum(len(files) for _, _, files in os.walk(os.path.join(root, "chunks")))
+
+
+def test_chunker():
+    data = payload(64 * 1024)
+
+    chunks = chunk(data, **SIZES)
+    assert b"".join(chunks) == data
+    assert all(SIZES["min_size"] <= len(c) <= SIZES["max_size"] for c in chunks[:-1])
+
+    # cut points don't depend on how data is fed
+    assert chunk(data, feed=7, **SIZES) == chunks
+
+    # an insertion only changes nearby chunks
+    edited = data[:30000] + b"hello" + data[30000:]
+    common = set(chunks) & set(chunk(edited, **SIZES))
+    assert len(common) >= len(chunks) - 2
+
+    with pytest.raises(ValueError):
+        Chunker(min_size=10, avg_size=5, max_size=20)
+
+
+def test_fingerprints():
+    data = payload(1000)
+    fingerprints = _fingerprints(data, 5)
+    values = [_TABLE[b] for b in data]
+    for i in range(len(data)):
+        mixed = 0
+        for j in range(_WINDOW):
+            if i - j >= 0:
+                mixed ^= values[i - j] << j
+            if i - j - 1 >= 0:
+                mixed ^= values[i - j - 1] >> (8 - j)
+        assert fingerprints[i] == mixed & 0b11111
+
+
+def test_chunker_large_feeds():
+    data = payload(2 * 1024 * 1024)
+    chunks = chunk(data, feed=64 * 1024)
+    assert chunk(data, feed=len(data)) == chunks
+    assert len(chunks) > 8
+
+
+def test_concurrent_put():
+    store = ChunkStore(tempfile.mkdtemp())
+    with concurrent.futures.ThreadPoolExecutor(8) as executor:
+        digests = set(executor.map(store.put, [b"same chunk"] * 64))
+    assert len(digests) == 1
+    assert os.listdir(store.chunk_path(digests.pop()).parent) == [
+        hashlib.sha256(b"same chunk").hexdigest()
+    ]
+
+
+def test_chunkstore_dedup():
+    data = payload(256 * 1024)
+    edited = data[:100000] + b"hello" + data[100005:]
+
+    with tempfile.TemporaryDirectory() as root:
+        boa = Boa()
+        boa.backup(BytesSource(data), ChunkStoreDestination(root, "first", **SIZES))
+        stored = count_chunks(root)
+
+        # a repeated backup stores nothing new
+        boa.backup(BytesSource(data), ChunkStoreDestination(root, "second", **SIZES))
+        assert count_chunks(root) == stored
+
+        # a small change stores only a few chunks
+        boa.backup(BytesSource(edited), ChunkStoreDestination(root, "third", **SIZES))
+        assert stored < count_chunks(root) <= stored + 3
+
+        assert ChunkStore(root).recipes() == ["first", "second", "third"]
+        assert bytes(ChunkStoreSource(root, "first")) == data
+        assert bytes(ChunkStoreSource(root, "third")) == edited
+
+
+def test_chunkstore_same_name(tmp_path):
+    # destinations of the same recipe in one process don't share their temp file
+    first = ChunkStoreDestination(tmp_path, "same", **SIZES)
+    second = ChunkStoreDestination(tmp_path, "same", **SIZES)
+    first.open()
+    second.open()
+    first.write_chunk(b"first")
+    second.write_chunk(b"second")
+    first.close()
+    assert bytes(ChunkStoreSource(tmp_path, "same")) == b"first"
+    second.close()
+    assert bytes(ChunkStoreSource(tmp_path, "same")) == b"second"
+
+
+def test_chunkstore_strategies():
+    data = payload(32 * 1024)
+
+    with tempfile.TemporaryDirectory() as root:
+        # simo, alongside other destinations; recipes are timestamped
+        destination = ChunkStoreDestination(root, **SIZES)
+        results = Boa().backup(
+            BytesSource(data),
+            [destination, FilePathDestination(os.path.join(root, "plain"))],
+        )
+        assert results[0] == destination.recipe_name
+        assert bytes(ChunkStoreSource(root, destination.recipe_name)) == data
+
+        # miso
+        Boa().backup([BytesSource(data)] * 2, ChunkStoreDestination(root, "m", **SIZES))
+        assert bytes(ChunkStoreSource(root, "m")) == data * 2
+
+        # a failed backup leaves no recipe
+        def failing():
+            yield data
+            raise RuntimeError
+
+        with pytest.raises(RuntimeError):
+            ChunkStoreDestination(root, "failed", **SIZES).write_stream(failing())
+        assert "failed" not in ChunkStore(root).recipes()
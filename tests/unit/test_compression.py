@@ -0,0 +1,74 @@
+import bz2
+import gzip
+import io
+import lzma
+import random
+
+import pytest
+
+import boa.compression as compression
+from boa import Boa
+from boa.core import BytesSource, FileStreamDestination
+
+DECOMPRESS = {"gzip": gzip.decompress, "bz2": bz2.decompress, "lzma": lzma.decompress}
+
+
+def payload(size, seed=0):
+    rnd = random.Random(seed)
+    words = [b"foo", b"bar", b"baz", bytes([rnd.randrange(256)])]
+    return b"".join(rnd.choice(words) for _ in range(size // 3))
+
+
+@pytest.mark.parametrize("codec", sorted(compression.CODECS))
+@pytest.mark.parametrize("max_workers", [1, 4])
+def test_compression(codec, max_workers):
+    data = payload(100000)
+    source = compression.CompressedSource(
+        BytesSource(data), codec=codec, block_size=16384, max_workers=max_workers
+    )
+    chunks = list(source.chunks(4096))
+    assert all(len(chunk) <= 4096 for chunk in chunks)
+    compressed = b"".join(chunks)
+    assert len(compressed) < len(data)
+
+    # readable by standard tools
+    if codec in DECOMPRESS:
+        assert DECOMPRESS[codec](compressed) == data
+
+    # and by the matching stage
+    restored = compression.DecompressedSource(BytesSource(compressed), codec=codec)
+    assert bytes(restored) == data
+
+
+def test_compression_reproducible():
+    data = payload(50000)
+
+    def compress(max_workers):
+        return bytes(
+            compression.CompressedSource(
+                BytesSource(data), block_size=4096, max_workers=max_workers
+            )
+        )
+
+    assert compress(1) == compress(8)
+
+
+def test_compression_pipeline():
+    data = payload(20000)
+    destination = FileStreamDestination(io.BytesIO())
+    Boa().backup(compression.CompressedSource(BytesSource(data), "bz2"), destination)
+    assert bz2.decompress(destination.filestream.getvalue()) == data
+
+
+def test_compression_errors():
+    with pytest.raises(ValueError):
+        compression.CompressedSource(BytesSource(b""), codec="foo")
+
+    # empty content
+    assert bytes(compression.CompressedSource(BytesSource(b""))) == b""
+    assert bytes(compression.DecompressedSource(BytesSource(b""))) == b""
+
+    # truncated content
+    compressed = gzip.compress(payload(1000))
+    with pytest.raises(EOFError):
+        bytes(compression.DecompressedSource(BytesSource(compressed[:-10])))
@@ -0,0 +1,115 @@
+import io
+
+import pytest
+
+from boa import Boa, backup
+from boa.container import (
+    FOOTER,
+    Container,
+    ContainerSource,
+    Member,
+    member_name,
+    pack,
+)
+from boa.core import (
+    BytesSource,
+    DirectorySource,
+    FilePathDestination,
+    FilePathSource,
+    FileStreamDestination,
+)
+
+
+def test_member_name(tmp_path):
+    assert member_name(FilePathSource(tmp_path / "foo.txt"), 0) == "foo.txt"
+    assert member_name(DirectorySource(str(tmp_path) + "/"), 1) == tmp_path.name
+    assert member_name(BytesSource(b"foo"), 2) == "member-2"
+
+
+def test_container(tmp_path):
+    container = tmp_path / "bundle.boa"
+    sources = [BytesSource(b"foo"), BytesSource(b""), BytesSource(b"barbaz")]
+    with open(container, "wb") as f:
+        for chunk in pack(sources, ["a", "b", "c"]):
+            f.write(chunk)
+
+    reader = Container(container)
+    assert reader.names() == ["a", "b", "c"]
+    assert [member.size for member in reader.members()] == [3, 0, 6]
+    assert reader.read("c") == b"barbaz"
+    assert reader.read(1) == b""
+    with pytest.raises(KeyError):
+        reader.member("d")
+
+    destination = FileStreamDestination(io.BytesIO())
+    reader.extract("a", destination)
+    assert destination.filestream.getvalue() == b"foo"
+
+
+def test_container_source_chunk_size():
+    chunks = list(ContainerSource([BytesSource(b"x" * 100)], ["a"]).chunks(10))
+    assert chunks.count(b"x" * 10) == 10
+    assert bytes(ContainerSource([BytesSource(b"x" * 100)], ["a"])) == b"".join(chunks)
+
+
+def test_container_seeks(tmp_path, monkeypatch):
+    container = tmp_path / "bundle.boa"
+    sources = [BytesSource(bytes([i]) * 100000) for i in range(10)]
+    FilePathDestination(container).write_stream(ContainerSource(sources).chunks())
+
+    # only the index and the member itself are read
+    reads = []
+    real_open = open
+
+    def counting_open(*args, **kwargs):
+        f = real_open(*args, **kwargs)
+        read = f.read
+        f.read = lambda size=-1: reads.append(size) or read(size)
+        return f
+
+    monkeypatch.setattr("builtins.open", counting_open)
+    assert Container(container).read("member-7") == bytes([7]) * 100000
+    assert sum(reads) < 150000
+
+
+def test_container_invalid(tmp_path):
+    path = tmp_path / "invalid"
+    path.write_bytes(b"not a container")
+    with pytest.raises(ValueError):
+        Container(path).members()
+
+    # a truncated container has lost its index
+    sources = [BytesSource(b"foo")]
+    path.write_bytes(b"".join(pack(sources))[: -FOOTER.size // 2])
+    with pytest.raises(ValueError):
+        Container(path).members()
+
+    with pytest.raises(ValueError):
+        list(pack(sources, ["a", "b"]))
+
+
+def test_boa_backup_container(tmp_path):
+    (tmp_path / "a").write_bytes(b"foo")
+    (tmp_path / "b").write_bytes(b"bar")
+    sources = [FilePathSource(tmp_path / "a"), FilePathSource(tmp_path / "b")]
+    bundle = tmp_path / "bundle.boa"
+
+    Boa(container=True).backup(sources, FilePathDestination(bundle))
+    assert Container(bundle).members() == [
+        Member("a", 15, 3),
+        Member("b", 25, 3),
+    ]
+    assert Container(bundle).read("b") == b"bar"
+
+    # the incremental mode keeps the format
+    boa = Boa(container=True, incremental=True)
+    (tmp_path / "b").write_bytes(b"barbaz")
+    boa.backup(sources, FilePathDestination(bundle))
+    assert Container(bundle).read("b") == b"barbaz"
+    mtime = bundle.stat().st_mtime_ns
+    boa.backup(sources, FilePathDestination(bundle))
+    assert bundle.stat().st_mtime_ns == mtime
+
+    bundle.unlink()
+    backup([str(tmp_path / "a"), str(tmp_path / "b")], str(bundle), container=True)
+    assert Container(bundle).names() == ["a", "b"]
@@ -1,12 +1,20 @@
 import io
 import locale
+import os
+import stat
 import sys
+import tarfile
 import tempfile
 
 import pytest
 
 import boa.core as core
-from boa.exception import InvalidDestinationException, InvalidSourceException
+from boa.exception import (
+    CommandException,
+    CommandTimeoutException,
+    InvalidDestinationException,
+    InvalidSourceException,
+)
 
 is_win = sys.platform == "win32"
 
@@ -112,13 +120,15 @@ def test_destination_filepath():
     fp = tempfile.NamedTemporaryFile("w+t", delete=False)
     dst = core.FilePathDestination(fp.name)
     dst.write(bmsg)
-    assert fp.read() == msg
+    with open(fp.name, "rt") as f:
+        assert f.read() == msg
 
     # test binary file
     fp = tempfile.NamedTemporaryFile("w+b", delete=False)
     dst = core.FilePathDestination(fp.name)
     dst.write(bmsg)
-    assert fp.read() == bmsg
+    with open(fp.name, "rb") as f:
+        assert f.read() == bmsg
 
 
 @pytest.mark.parametrize(
@@ -199,3 +209,349 @@ def test_buffered():
 
     for _ in range(tries):
         assert bytes(source).strip() == bmsg
+
+
+def test_source_chunks():
+    msg = b"hello world"
+    chunk_size = 4
+
+    # bytes
+    chunks = list(core.BytesSource(msg).chunks(chunk_size))
+    assert all(len(chunk) <= chunk_size for chunk in chunks)
+    assert b"".join(chunks) == msg
+
+    # filepath
+    with tempfile.NamedTemporaryFile(delete=False) as fp:
+        fp.write(msg)
+    chunks = list(core.FilePathSource(fp.name).chunks(chunk_size))
+    assert all(len(chunk) <= chunk_size for chunk in chunks)
+    assert b"".join(chunks) == msg
+
+    # filestream, with a multi-byte encoding split across chunks
+    text = "añbñcñdñ"
+    stream = io.TextIOWrapper(io.BytesIO(text.encode("utf-16")), encoding="utf-16")
+    chunks = list(core.FileStreamSource(stream).chunks(chunk_size))
+    assert b"".join(chunks) == text.encode("utf-16")
+
+    # command
+    cmd = ["echo", "foo"]
+    chunks = list(core.CommandSource(cmd, shell=bool(is_win)).chunks(1))
+    assert all(len(chunk) <= 1 for chunk in chunks)
+    assert b"".join(chunks).strip() == b"foo"
+
+
+def test_source_not_implemented():
+    class Foo(core.Source):
+        pass
+
+    with pytest.raises(NotImplementedError):
+        bytes(Foo())
+
+    # sources implementing only __bytes__ are still streamed
+    class Bar(core.Source):
+        def __bytes__(self):
+            return b"bar"
+
+    assert list(Bar().chunks(2)) == [b"ba", b"r"]
+
+
+def test_destination_stream():
+    chunks = [b"foo", b"bar"]
+
+    # filepath
+    fp = tempfile.NamedTemporaryFile("w+b", delete=False)
+    dst = core.FilePathDestination(fp.name)
+    dst.write_stream(iter(chunks))
+    with open(fp.name, "rb") as f:
+        assert f.read() == b"foobar"
+
+    # text stream, with a multi-byte character split across chunks
+    stream = io.StringIO()
+    dst = core.FileStreamDestination(stream)
+    raw = "ñ".encode(core.get_encoding(stream))
+    dst.write_stream([raw[:1], raw[1:]])
+    assert stream.getvalue() == "ñ"
+
+
+def test_destination_stream_abort():
+    class Foo(core.StreamDestination):
+        def __init__(self):
+            self.chunks = []
+            self.committed = None
+
+        def open(self):
+            self.chunks = []
+
+        def write_chunk(self, chunk):
+            self.chunks.append(chunk)
+
+        def close(self):
+            self.committed = b"".join(self.chunks)
+
+    def failing():
+        yield b"foo"
+        raise RuntimeError
+
+    # partial content is never committed
+    dst = Foo()
+    with pytest.raises(RuntimeError):
+        dst.write_stream(failing())
+    assert dst.committed is None
+
+
+def test_destination_write_only():
+    class Foo(core.Destination):
+        def __init__(self):
+            self.contents = []
+
+        def write(self, content):
+            self.contents.append(content)
+
+    # chunks are collected and handed to write
+    dst = Foo()
+    dst.write_stream([b"foo", b"bar"])
+    assert dst.contents == [b"foobar"]
+
+    # a failing stream never reaches write
+    def failing():
+        yield b"foo"
+        raise RuntimeError
+
+    with pytest.raises(RuntimeError):
+        dst.write_stream(failing())
+    assert dst.contents == [b"foobar"]
+
+
+def make_tree(root, files):
+    for name, content in files.items():
+        path = os.path.join(root, *name.split("/"))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(content)
+
+
+def test_source_directory():
+    files = {
+        "a.txt": b"foo",
+        "empty.txt": b"",
+        "sub/b.log": b"bar" * 1000,
+        "sub/deep/c.txt": b"baz",
+        "skip/d.txt": b"qux",
+    }
+    with tempfile.TemporaryDirectory() as root:
+        make_tree(root, files)
+
+        # whole tree, through get_source
+        source = core.get_source(root)
+        assert isinstance(source, core.DirectorySource)
+        chunks = list(source.chunks(chunk_size=512))
+        assert all(len(chunk) <= 1536 for chunk in chunks)
+        raw = b"".join(chunks)
+        assert len(raw) % tarfile.RECORDSIZE == 0
+        with tarfile.open(fileobj=io.BytesIO(raw), mode="r|") as tar:
+            members = {m.name: tar.extractfile(m).read() for m in tar if m.isreg()}
+        assert members == files
+
+        # with filters
+        source = core.DirectorySource(
+            root, include=["*.txt"], exclude=["skip"], max_workers=2
+        )
+        with tarfile.open(fileobj=io.BytesIO(bytes(source))) as tar:
+            names = tar.getnames()
+        assert names == ["a.txt", "empty.txt", "sub", "sub/deep", "sub/deep/c.txt"]
+
+
+@pytest.mark.skipif(is_win, reason="symlinks require privileges on windows")
+def test_source_directory_symlink():
+    with tempfile.TemporaryDirectory() as root:
+        make_tree(root, {"a.txt": b"foo"})
+        os.symlink("a.txt", os.path.join(root, "link"))
+        with tarfile.open(fileobj=io.BytesIO(bytes(core.DirectorySource(root)))) as tar:
+            link = tar.getmember("link")
+        assert link.issym() and link.linkname == "a.txt"
+
+
+def test_source_command_streaming():
+    # large outputs on both stdout and stderr don't deadlock
+    size = 1024 * 1024
+    script = (
+        "import sys; "
+        f"sys.stderr.write('e' * {size}); sys.stderr.flush(); "
+        f"sys.stdout.write('o' * {size})"
+    )
+    source = core.CommandSource([sys.executable, "-c", script])
+    chunks = list(source.chunks(4096))
+    assert all(len(chunk) <= 4096 for chunk in chunks)
+    assert b"".join(chunks) == b"o" * size
+
+    # the destination file is written while streaming
+    with tempfile.TemporaryDirectory() as tmpdir:
+        dst = os.path.join(tmpdir, "out")
+        source = core.CommandSource([sys.executable, "-c", script], destination=dst)
+        assert len(bytes(source)) == size
+        assert os.path.getsize(dst) == size
+
+
+def test_source_command_failure():
+    script = "import sys; sys.stderr.write('boom'); sys.exit(3)"
+    source = core.CommandSource([sys.executable, "-c", script])
+    with pytest.raises(CommandException) as excinfo:
+        bytes(source)
+    assert excinfo.value.returncode == 3
+    assert excinfo.value.stderr == b"boom"
+
+    # unless not checked
+    source = core.CommandSource([sys.executable, "-c", script], check=False)
+    assert bytes(source) == b""
+
+    # a command running too long is killed
+    script = "import time; print('foo', flush=True); time.sleep(10)"
+    source = core.CommandSource([sys.executable, "-c", script], timeout=0.5)
+    with pytest.raises(CommandTimeoutException):
+        bytes(source)
+
+
+def copy_file(src, dst):
+    with open(src, "rb") as fin, open(dst, "wb") as fout:
+        core.copy_fd(fin.fileno(), fout.fileno())
+    with open(dst, "rb") as f:
+        return f.read()
+
+
+@pytest.mark.parametrize(
+    "unsupported",
+    [
+        [],
+        ["_reflink"],
+        ["_reflink", "_copy_file_range"],
+        ["_reflink", "_copy_file_range", "_sendfile"],
+    ],
+)
+def test_copy_fd(unsupported, monkeypatch):
+    def fail(*args):
+        raise OSError("not supported")
+
+    for name in unsupported:
+        if name == "_reflink":
+            monkeypatch.setattr(core, name, lambda *args: False)
+        else:
+            monkeypatch.setattr(core, name, fail)
+
+    msg = os.urandom(300000)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        src, dst = os.path.join(tmpdir, "src"), os.path.join(tmpdir, "dst")
+        with open(src, "wb") as f:
+            f.write(msg)
+        assert copy_file(src, dst) == msg
+
+        # empty file
+        with open(src, "wb"):
+            pass
+        assert copy_file(src, dst) == b""
+
+
+def test_source_mapped():
+    msg = os.urandom(10000)
+    with tempfile.NamedTemporaryFile(delete=False) as fp:
+        fp.write(msg)
+
+    source = core.MappedFilePathSource(fp.name)
+    chunks = list(source.chunks(4096))
+    assert all(isinstance(chunk, memoryview) for chunk in chunks)
+    assert [len(chunk) for chunk in chunks] == [4096, 4096, 1808]
+    assert bytes(source) == msg
+
+    # memoryviews flow into destinations
+    stream = io.BytesIO()
+    core.FileStreamDestination(stream).write_stream(source.chunks())
+    assert stream.getvalue() == msg
+
+    # empty file
+    with tempfile.NamedTemporaryFile(delete=False) as fp:
+        pass
+    assert bytes(core.MappedFilePathSource(fp.name)) == b""
+
+
+@pytest.mark.parametrize("durability", core.DURABILITIES)
+def test_destination_filepath_atomic(durability):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "dst")
+        dst = core.FilePathDestination(path, durability=durability)
+        dst.write(b"foo")
+        core.sync_destinations([dst])
+
+        # a failed backup keeps the previous copy, and leaves nothing behind
+        def failing():
+            yield b"bar"
+            raise RuntimeError
+
+        with pytest.raises(RuntimeError):
+            dst.write_stream(failing())
+        with open(path, "rb") as f:
+            assert f.read() == b"foo"
+        assert os.listdir(tmpdir) == ["dst"]
+
+        # preallocation is trimmed to the written content
+        dst.write_stream([b"foobar"], size=1024 * 1024)
+        core.sync_destinations([dst])
+        assert os.path.getsize(path) == 6
+
+    with pytest.raises(ValueError):
+        core.FilePathDestination("foo", durability="foo")
+
+
+@pytest.mark.skipif(is_win, reason="directories are not synced")
+def test_destination_filepath_batch(tmp_path, monkeypatch):
+    calls = []
+    fsync, replace = os.fsync, os.replace
+
+    def recording_fsync(fd):
+        calls.append(("fsync", stat.S_ISDIR(os.fstat(fd).st_mode)))
+        fsync(fd)
+
+    def recording_replace(src, dst):
+        calls.append(("replace", False))
+        replace(src, dst)
+
+    monkeypatch.setattr(os, "fsync", recording_fsync)
+    monkeypatch.setattr(os, "replace", recording_replace)
+    destinations = [
+        core.FilePathDestination(tmp_path / name, durability=core.DURABILITY_BATCH)
+        for name in ("a", "b")
+    ]
+    for destination in destinations:
+        destination.write(b"foo")
+    # staged until synced, but already readable back
+    assert calls == [] and not (tmp_path / "a").exists()
+    assert bytes(destinations[0].readback()) == b"foo"
+
+    core.sync_destinations(destinations)
+    # each file once, before being moved into place, then their directory once
+    assert calls == [("fsync", False)] * 2 + [("replace", False)] * 2 + [
+        ("fsync", True)
+    ]
+    assert (tmp_path / "a").read_bytes() == b"foo"
+    assert destinations[0].staged is None
+
+
+@pytest.mark.skipif(is_win, reason="posix permissions")
+def test_destination_filepath_batch_read_only(tmp_path):
+    # replacing a read-only file doesn't require writing to it
+    path = tmp_path / "dst"
+    path.write_bytes(b"old")
+    path.chmod(0o444)
+    destination = core.FilePathDestination(path, durability=core.DURABILITY_BATCH)
+    destination.write(b"new")
+    core.sync_destinations([destination])
+    assert path.read_bytes() == b"new"
+
+
+@pytest.mark.skipif(is_win, reason="posix permissions")
+def test_destination_filepath_mode():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "dst")
+        with open(path, "wb"):
+            pass
+        os.chmod(path, 0o600)
+        core.FilePathDestination(path).write(b"foo")
+        assert os.stat(path).st_mode & 0o777 == 0o600
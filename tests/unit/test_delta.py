@@ -0,0 +1,157 @@
+import os
+
+import pytest
+
+from boa import Boa
+from boa.core import BytesSource, FilePathSource, get_destination
+from boa.delta import (
+    DeltaFilePathDestination,
+    block_signature,
+    load_signature,
+    save_signature,
+)
+
+BLOCK_SIZE = 1024
+CONTENT = os.urandom(16 * BLOCK_SIZE + 100)
+
+
+def spy_reads(monkeypatch, destination):
+    """Count the blocks read back from the destination file"""
+    reads = []
+    open_ = destination.open
+
+    def spied_open():
+        open_()
+        if destination._in_place:
+            read = destination._file.read
+
+            def counted(size=-1):
+                reads.append(size)
+                return read(size)
+
+            destination._file.read = counted
+
+    monkeypatch.setattr(destination, "open", spied_open)
+    return reads
+
+
+def changed(content, *blocks):
+    content = bytearray(content)
+    for block in blocks:
+        content[block * BLOCK_SIZE] ^= 0xFF
+    return bytes(content)
+
+
+def backup(destination, content):
+    Boa().backup(BytesSource(content), destination)
+
+
+def test_new_file(tmp_path):
+    destination = DeltaFilePathDestination(tmp_path / "file", block_size=BLOCK_SIZE)
+    backup(destination, CONTENT)
+    assert (tmp_path / "file").read_bytes() == CONTENT
+    assert destination.signature_path.exists()
+
+
+def test_changed_blocks_only(tmp_path, monkeypatch):
+    filepath = tmp_path / "file"
+    backup(DeltaFilePathDestination(filepath, block_size=BLOCK_SIZE), CONTENT)
+    inode = os.stat(filepath).st_ino
+
+    destination = DeltaFilePathDestination(filepath, block_size=BLOCK_SIZE)
+    reads = spy_reads(monkeypatch, destination)
+    content = changed(CONTENT, 3, 16)
+    backup(destination, content)
+
+    assert filepath.read_bytes() == content
+    assert os.stat(filepath).st_ino == inode
+    assert (destination.blocks_written, destination.blocks_skipped) == (2, 15)
+    # signatures were cached, the file wasn't read
+    assert reads == []
+
+
+def test_without_signatures(tmp_path, monkeypatch):
+    filepath = tmp_path / "file"
+    filepath.write_bytes(CONTENT)
+
+    destination = DeltaFilePathDestination(filepath, block_size=BLOCK_SIZE)
+    reads = spy_reads(monkeypatch, destination)
+    content = changed(CONTENT, 0)
+    backup(destination, content)
+
+    assert filepath.read_bytes() == content
+    assert (destination.blocks_written, destination.blocks_skipped) == (1, 16)
+    assert len(reads) == 17
+
+
+def test_outdated_signatures(tmp_path):
+    filepath = tmp_path / "file"
+    destination = DeltaFilePathDestination(filepath, block_size=BLOCK_SIZE)
+    backup(destination, CONTENT)
+    # modified by someone else: signatures can't be trusted
+    filepath.write_bytes(changed(CONTENT, 5))
+
+    backup(destination, CONTENT)
+    assert filepath.read_bytes() == CONTENT
+    assert destination.blocks_written == 1
+
+
+@pytest.mark.parametrize("size", [0, 10, 3 * BLOCK_SIZE, len(CONTENT) + BLOCK_SIZE])
+def test_resized(tmp_path, size):
+    filepath = tmp_path / "file"
+    destination = DeltaFilePathDestination(filepath, block_size=BLOCK_SIZE)
+    backup(destination, CONTENT)
+
+    content = (CONTENT * 2)[:size]
+    backup(destination, content)
+    assert filepath.read_bytes() == content
+    blocks = [content[i:][:BLOCK_SIZE] for i in range(0, size, BLOCK_SIZE)]
+    signatures = load_signature(
+        destination.signature_path, BLOCK_SIZE, os.stat(filepath)
+    )
+    assert signatures == [block_signature(block) for block in blocks]
+
+
+def test_abort_invalidates_signatures(tmp_path):
+    filepath = tmp_path / "file"
+    destination = DeltaFilePathDestination(filepath, block_size=BLOCK_SIZE)
+    backup(destination, CONTENT)
+
+    def chunks():
+        yield changed(CONTENT, 0)[:BLOCK_SIZE]
+        raise RuntimeError
+
+    with pytest.raises(RuntimeError):
+        destination.write_stream(chunks())
+    assert not destination.signature_path.exists()
+
+    backup(destination, CONTENT)
+    assert filepath.read_bytes() == CONTENT
+
+
+def test_file_source(tmp_path):
+    source = tmp_path / "source"
+    source.write_bytes(CONTENT)
+    destination = DeltaFilePathDestination(tmp_path / "file", block_size=BLOCK_SIZE)
+    Boa().backup(FilePathSource(source), destination)
+    Boa().backup(FilePathSource(source), destination)
+    assert (tmp_path / "file").read_bytes() == CONTENT
+    assert (destination.blocks_written, destination.blocks_skipped) == (0, 17)
+
+
+def test_signature_format(tmp_path):
+    (tmp_path / "file").write_bytes(b"x")
+    stat = os.stat(tmp_path / "file")
+    signatures = [block_signature(b"a"), block_signature(b"b")]
+    save_signature(tmp_path / "sig", BLOCK_SIZE, signatures, stat)
+    assert load_signature(tmp_path / "sig", BLOCK_SIZE, stat) == signatures
+    assert load_signature(tmp_path / "sig", BLOCK_SIZE * 2, stat) is None
+    assert load_signature(tmp_path / "missing", BLOCK_SIZE, stat) is None
+
+
+def test_uri(tmp_path):
+    destination = get_destination(f"file://{tmp_path}/file?delta=1&block_size=4096")
+    assert isinstance(destination, DeltaFilePathDestination)
+    assert destination.block_size == 4096
+    with pytest.raises(ValueError):
+        get_destination(f"file://{tmp_path}/file?block_size=4096")
@@ -1,8 +1,16 @@
+import email.parser
+import http.server
+import json
+import socketserver
+import threading
+import time
+
 import dotenv
 import pytest
-from telegram.error import InvalidToken
+from telegram.error import InvalidToken, RetryAfter
 
 import boa.core as core
+from boa.exception import BatchBackupException
 from boa.ext.telegram import TelegramBotDestination
 from tests.utility import set_env
 
@@ -38,3 +46,152 @@ def test_send_ok():
         message="Sample message, even emojis are supported! ❤😁👍🙌😎🐱‍🚀✔👀",
     )
     dst.write(bytes(src))
+
+
+class FakeBotAPI(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    """Local stand-in for the Bot API, recording the documents sent"""
+
+    daemon_threads = True
+
+    def __init__(self, rate_limited=0):
+        super().__init__(("127.0.0.1", 0), FakeBotAPIHandler)
+        self.rate_limited = rate_limited
+        self.documents = []
+        self.lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_port}/bot"
+
+
+class FakeBotAPIHandler(http.server.BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        header = f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode()
+        fields = {}
+        for part in email.parser.BytesParser().parsebytes(header + body).get_payload():
+            name = part.get_param("name", header="content-disposition")
+            fields[name] = (part.get_filename(), part.get_payload(decode=True))
+
+        server = self.server
+        with server.lock:
+            if server.rate_limited:
+                server.rate_limited -= 1
+                description = "Too Many Requests: retry after 1"
+                parameters = {"retry_after": 1}
+                error = dict(ok=False, error_code=429, parameters=parameters)
+                return self._reply(429, dict(error, description=description))
+            chat_id = int(fields["chat_id"][1])
+            filename, document = fields["document"]
+            caption = fields["caption"][1].decode() if "caption" in fields else None
+            server.documents.append((chat_id, filename, caption, document))
+
+        chat = {"id": chat_id, "type": "private"}
+        message = {"message_id": len(server.documents), "date": 0, "chat": chat}
+        self._reply(200, {"ok": True, "result": message})
+
+
+@pytest.fixture
+def bot_api():
+    server = FakeBotAPI()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    env = {TOKEN: "123456:fake-token", CHAT_IDS: "1 2 3", "TELEGRAM_API_URL": ""}
+    with set_env(env):
+        yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_shared_bot(bot_api):
+    first = TelegramBotDestination(base_url=bot_api.base_url)
+    second = TelegramBotDestination(base_url=bot_api.base_url)
+    assert first.bot is second.bot
+
+
+def test_send_concurrent(bot_api):
+    dst = TelegramBotDestination(
+        filename="backup.tar", message="Backup", base_url=bot_api.base_url
+    )
+    results = dst.write(b"foobar")
+    assert [[message.chat.id for message in result] for result in results] == [
+        [1],
+        [2],
+        [3],
+    ]
+    assert sorted(bot_api.documents) == [
+        (chat_id, "backup.tar", "Backup", b"foobar") for chat_id in (1, 2, 3)
+    ]
+
+
+def test_send_parts(bot_api):
+    dst = TelegramBotDestination(filename="backup", base_url=bot_api.base_url)
+    dst.part_size = 4
+
+    dst.write(b"0123456789")
+    for chat_id in (1, 2, 3):
+        documents = [doc[1:] for doc in bot_api.documents if doc[0] == chat_id]
+        assert documents == [
+            ("backup.00001", "1/3", b"0123"),
+            ("backup.00002", "2/3", b"4567"),
+            ("backup.00003", "3/3", b"89"),
+        ]
+
+
+def test_send_rate_limited(bot_api, monkeypatch):
+    delays = []
+    monkeypatch.setattr(time, "sleep", delays.append)
+    dst = TelegramBotDestination(filename="backup", base_url=bot_api.base_url)
+
+    bot_api.rate_limited = 2
+    dst.write(b"foo")
+    assert delays == [1.0, 1.0]
+    assert len(bot_api.documents) == 3
+
+    # chats keep failing once out of retries
+    bot_api.rate_limited = 100
+    dst.max_retries = 1
+    with pytest.raises(BatchBackupException) as excinfo:
+        dst.write(b"foo")
+    assert all(isinstance(error, RetryAfter) for error in excinfo.value.errors)
+
+
+def test_send_streaming(bot_api):
+    dst = TelegramBotDestination(filename="backup", base_url=bot_api.base_url)
+    dst.part_size = 4
+    sent = []
+
+    def chunks():
+        yield b"01"
+        yield b"2345"
+        # the first part went out once the second one began
+        sent.append(len(bot_api.documents))
+        yield b"6789"
+
+    dst.write_stream(chunks())
+    assert sent == [3]
+    for chat_id in (1, 2, 3):
+        documents = [doc[1:] for doc in bot_api.documents if doc[0] == chat_id]
+        # without a size, only the last part knows the count
+        assert documents == [
+            ("backup.00001", "1", b"0123"),
+            ("backup.00002", "2", b"4567"),
+            ("backup.00003", "3/3", b"89"),
+        ]
+
+
+def test_updater(bot_api):
+    dst = TelegramBotDestination(base_url=bot_api.base_url)
+    assert dst.updater.bot is dst.bot
+    assert dst.updater is dst.updater
@@ -0,0 +1,126 @@
+import io
+import os
+import tempfile
+from unittest import mock
+
+import pytest
+
+import boa.manifest as manifest
+from boa import Boa, backup
+from boa.core import (
+    BytesSource,
+    FilePathDestination,
+    FilePathSource,
+    FileStreamDestination,
+)
+
+
+def age(filepath, seconds=3600):
+    """Move the mtime of a file back in time, out of the racy window"""
+    stat = os.stat(filepath)
+    os.utime(filepath, ns=(stat.st_atime_ns, stat.st_mtime_ns - seconds * 10**9))
+
+
+@pytest.fixture
+def tmpdir_path():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        yield tmpdir
+
+
+def make_file(dirpath, name, content):
+    filepath = os.path.join(dirpath, name)
+    with open(filepath, "wb") as f:
+        f.write(content)
+    age(filepath)
+    return filepath
+
+
+def test_manifest_skip(tmpdir_path):
+    src = make_file(tmpdir_path, "src", b"foo")
+    dst = os.path.join(tmpdir_path, "out", "dst")
+    boa = Boa(incremental=True)
+
+    boa.backup(FilePathSource(src), FilePathDestination(dst))
+    with open(dst, "rb") as f:
+        assert f.read() == b"foo"
+    entries = manifest.Manifest.for_destination(FilePathDestination(dst)).entries
+    assert len(entries) == 1 and entries[0]["size"] == 3
+
+    # unchanged metadata, nor written nor hashed
+    with mock.patch.object(FilePathDestination, "open") as opened:
+        with mock.patch.object(manifest, "file_digest") as digest:
+            boa.backup(FilePathSource(src), FilePathDestination(dst))
+    opened.assert_not_called()
+    digest.assert_not_called()
+
+    # changed content is written again
+    make_file(tmpdir_path, "src", b"foobar")
+    boa.backup(FilePathSource(src), FilePathDestination(dst))
+    with open(dst, "rb") as f:
+        assert f.read() == b"foobar"
+
+    # a missing destination is written again
+    os.remove(dst)
+    boa.backup(FilePathSource(src), FilePathDestination(dst))
+    with open(dst, "rb") as f:
+        assert f.read() == b"foobar"
+
+
+def test_manifest_ambiguous(tmpdir_path):
+    src = make_file(tmpdir_path, "src", b"foo")
+    dst = os.path.join(tmpdir_path, "dst")
+    boa = Boa(incremental=True)
+    boa.backup(FilePathSource(src), FilePathDestination(dst))
+
+    # touched, but same content: hashed and skipped
+    os.utime(src)
+    with mock.patch.object(FilePathDestination, "open") as opened:
+        boa.backup(FilePathSource(src), FilePathDestination(dst))
+    opened.assert_not_called()
+
+    # same size and mtime, different content: hashed since mtime is racy
+    stat = os.stat(src)
+    with open(src, "wb") as f:
+        f.write(b"bar")
+    os.utime(src, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    boa.backup(FilePathSource(src), FilePathDestination(dst))
+    with open(dst, "rb") as f:
+        assert f.read() == b"bar"
+
+
+def test_manifest_miso_simo(tmpdir_path):
+    srcs = [make_file(tmpdir_path, f"src{i}", b"foo") for i in range(3)]
+    dsts = [os.path.join(tmpdir_path, f"dst{i}") for i in range(3)]
+
+    backup(srcs, dsts[0], incremental=True)
+    backup(srcs[0], dsts, incremental=True, max_workers=2)
+
+    # a different set of sources is never skipped
+    backup(srcs[:2], dsts[0], incremental=True)
+    with open(dsts[0], "rb") as f:
+        assert f.read() == b"foo" * 2
+
+    # only outdated destinations are written
+    backup(srcs[0], dsts, incremental=True)
+    os.remove(dsts[1])
+    with mock.patch.object(FilePathDestination, "write_chunk", autospec=True) as w:
+        backup(srcs[0], dsts, incremental=True)
+    assert [call[0][0].filepath.name for call in w.call_args_list] == ["dst1"]
+
+
+def test_manifest_untracked(tmpdir_path):
+    dst = os.path.join(tmpdir_path, "dst")
+
+    # non-file sources are always written, and leave no manifest
+    backup(b"foo", dst, incremental=True)
+    backup(b"bar", dst, incremental=True)
+    with open(dst, "rb") as f:
+        assert f.read() == b"bar"
+    assert not os.path.exists(dst + manifest.MANIFEST_SUFFIX)
+
+    # non-file destinations are always written
+    src = make_file(tmpdir_path, "src", b"foo")
+    destination = FileStreamDestination(io.BytesIO())
+    Boa(incremental=True).backup(FilePathSource(src), destination)
+    Boa(incremental=True).backup(BytesSource(b"bar"), destination)
+    assert destination.filestream.getvalue() == b"foobar"
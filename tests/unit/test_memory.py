@@ -0,0 +1,158 @@
+import gc
+import mmap
+
+import pytest
+
+from boa import Boa, memory
+from boa.core import Buffer, BytesSource, Destination
+from boa.memory import MemoryBudget, SpooledBuffer, get_budget, set_memory_budget
+from boa.metrics import MetricsCollector
+
+
+class WriteOnlyDestination(Destination):
+    def __init__(self):
+        self.content = None
+        self.kind = None
+
+    def write(self, content):
+        self.kind = type(content)
+        # kept after close(), which releases the buffer
+        self.content = content
+
+
+def test_budget():
+    budget = MemoryBudget(10)
+    assert budget.reserve(6)
+    assert not budget.reserve(5)
+    assert budget.reserve(4)
+    budget.release(8)
+    assert budget.stats() == {
+        "limit": 10,
+        "used": 2,
+        "high_water": 10,
+        "spills": 0,
+        "spilled_bytes": 0,
+    }
+    budget.reset_high_water()
+    assert budget.high_water == 2
+    assert MemoryBudget(None).reserve(2**40)
+    with pytest.raises(ValueError):
+        MemoryBudget(-1)
+
+
+def test_in_memory():
+    budget = MemoryBudget(100)
+    with SpooledBuffer(budget) as buffer:
+        buffer.write(b"abc")
+        buffer.write(memoryview(b"def"))
+        assert not buffer.spilled
+        assert budget.used == 6
+        assert b"".join(buffer.chunks(4)) == b"abcdef"
+        assert buffer.getvalue() == b"abcdef"
+        assert budget.used == 6
+    assert budget.used == 0
+
+
+def test_spill(tmp_path):
+    budget = MemoryBudget(10)
+    buffer = SpooledBuffer(budget, dir=tmp_path)
+    buffer.write(b"x" * 8)
+    buffer.write(b"y" * 8)
+    assert buffer.spilled and len(buffer) == 16
+    # the memory was given back, the content moved to disk
+    assert (budget.used, budget.spills, budget.spilled_bytes) == (0, 1, 8)
+    assert list(buffer.chunks(5)) == [b"xxxxx", b"xxxyy", b"yyyyy", b"y"]
+    buffer.write(b"z")
+    content = buffer.getvalue()
+    assert isinstance(content, mmap.mmap)
+    assert content[:] == b"x" * 8 + b"y" * 8 + b"z"
+    buffer.close()
+    assert budget.used == 0
+
+
+def test_join_within_budget():
+    # joining the chunks copies them, which needs room too
+    budget = MemoryBudget(10)
+    buffer = SpooledBuffer(budget)
+    buffer.write(b"a" * 4)
+    buffer.write(b"b" * 4)
+    assert bytes(buffer.getvalue()) == b"a" * 4 + b"b" * 4
+    assert buffer.spilled
+    buffer.close()
+
+
+def test_released_when_collected():
+    budget = MemoryBudget(100)
+    buffer = SpooledBuffer(budget)
+    buffer.write(b"abc")
+    del buffer
+    gc.collect()
+    assert budget.used == 0
+
+
+def test_buffer():
+    budget = MemoryBudget(4)
+    source = Buffer(BytesSource(b"hello world"), budget)
+    for _ in range(3):
+        assert bytes(source) == b"hello world"
+        assert b"".join(source.chunks(3)) == b"hello world"
+    assert source.size() == 11
+    assert source.buffer.spilled
+    source.close()
+
+
+def test_destination_spills(monkeypatch):
+    budget = MemoryBudget(1024)
+    monkeypatch.setattr(memory, "_budget", budget)
+    destination = WriteOnlyDestination()
+    content = bytes(range(256)) * 16
+    Boa().backup(BytesSource(content), destination)
+    assert destination.content == content
+    # a spilled content is read back, write() only gets bytes
+    assert destination.kind is bytes
+    assert budget.used == 0 and budget.spills == 1
+
+    destination.write_stream([b"small"])
+    assert destination.kind is bytes
+
+
+def test_destination_abort(monkeypatch):
+    budget = MemoryBudget(1024)
+    monkeypatch.setattr(memory, "_budget", budget)
+
+    def chunks():
+        yield b"partial"
+        raise RuntimeError
+
+    destination = WriteOnlyDestination()
+    with pytest.raises(RuntimeError):
+        destination.write_stream(chunks())
+    assert destination.content is None
+    assert budget.used == 0
+
+
+def test_set_memory_budget(monkeypatch):
+    monkeypatch.setattr(memory, "_budget", MemoryBudget())
+    set_memory_budget(1024)
+    assert get_budget().limit == 1024
+    set_memory_budget(None)
+    assert get_budget().reserve(2**40)
+    with pytest.raises(ValueError):
+        set_memory_budget(-1)
+
+
+def test_metrics():
+    budget = MemoryBudget(1000)
+    budget.reserve(300)
+    budget.release(100)
+    budget.spilled(50)
+    exported = MetricsCollector(budget=budget).export()
+    assert "boa_memory_used_bytes 200\n" in exported
+    assert "boa_memory_high_water_bytes 300\n" in exported
+    assert "boa_memory_limit_bytes 1000\n" in exported
+    assert "boa_memory_spills_total 1\n" in exported
+    assert "# TYPE boa_memory_used_bytes gauge" in exported
+    assert (
+        "boa_memory_limit_bytes"
+        not in MetricsCollector(budget=MemoryBudget(None)).export()
+    )
@@ -0,0 +1,132 @@
+import io
+import logging
+
+import pytest
+
+from boa import Boa
+from boa.core import (
+    BytesSource,
+    CommandSource,
+    Destination,
+    FilePathDestination,
+    FilePathSource,
+    FileStreamDestination,
+)
+from boa.exception import BatchBackupException
+from boa.metrics import LoggingObserver, MetricsCollector, Observers, describe
+
+
+class FailingDestination(Destination):
+    label = "failing"
+
+    def write(self, content):
+        raise OSError("destination unavailable")
+
+
+def test_describe(tmp_path):
+    assert describe(FilePathSource(tmp_path / "a")) == f"FilePathSource:{tmp_path}/a"
+    assert describe(CommandSource(["echo", "a b"])) == "CommandSource:echo 'a b'"
+    assert describe(BytesSource(b"foo")) == "BytesSource"
+
+    destination = FileStreamDestination(io.BytesIO())
+    destination.label = "stream"
+    assert describe(destination) == "stream"
+
+
+@pytest.mark.parametrize("max_workers", [1, 4])
+def test_metrics_collector(max_workers):
+    collector = MetricsCollector(label=lambda obj: obj.label)
+    boa = Boa(max_workers=max_workers, observer=collector)
+
+    def source(label, content=b"foobar"):
+        source = BytesSource(content)
+        source.label = label
+        return source
+
+    def destination(label):
+        destination = FileStreamDestination(io.BytesIO())
+        destination.label = label
+        return destination
+
+    boa.backup(source("a"), destination("x"))
+    boa.backup([source("a"), source("b")], destination("y"))
+    boa.backup(source("c"), [destination("z"), destination("z")])
+    boa.backup([source("a"), source("b")], [destination("x"), destination("y")])
+
+    assert collector.read_bytes == {"a": 18, "b": 12, "c": 6}
+    assert collector.write_bytes == {"x": 12, "y": 18, "z": 12}
+    assert collector.write_count == {"x": 2, "y": 3, "z": 2}
+    assert collector.backups == {
+        ("siso", "success"): 1,
+        ("miso", "success"): 1,
+        ("simo", "success"): 1,
+        ("mimo", "success"): 1,
+    }
+    if max_workers > 1:
+        # the broadcast queued its chunk for both destinations
+        assert set(collector.wait_seconds) == {"z"}
+
+    with pytest.raises(BatchBackupException):
+        boa.backup(source("a"), [destination("x"), FailingDestination()])
+    assert collector.errors == {("failing", "OSError"): 1}
+    assert collector.backups["simo", "failure"] == 1
+
+
+def test_metrics_collector_export(tmp_path):
+    collector = MetricsCollector(buckets=[0.5, 1e9])
+    src, dst = tmp_path / "src", tmp_path / "dst"
+    src.write_bytes(b"foo")
+
+    # file to file copies are reported as a single write
+    boa = Boa(observer=collector)
+    boa.backup(FilePathSource(src), FilePathDestination(dst))
+    with pytest.raises(OSError):
+        boa.backup(BytesSource(b"foo"), FailingDestination())
+
+    lines = collector.export().splitlines()
+    label = f'destination="FilePathDestination:{dst}"'
+    assert "# TYPE boa_destination_write_seconds histogram" in lines
+    assert f"boa_destination_write_bytes_total{{{label}}} 3" in lines
+    assert (
+        f'boa_destination_write_seconds_bucket{{{label},le="1000000000.0"}} 1' in lines
+    )
+    assert f'boa_destination_write_seconds_bucket{{{label},le="+Inf"}} 1' in lines
+    assert f"boa_destination_write_seconds_count{{{label}}} 1" in lines
+    assert (
+        'boa_destination_errors_total{destination="failing",error="OSError"} 1' in lines
+    )
+    assert 'boa_backups_total{strategy="siso",status="failure"} 1' in lines
+    assert 'boa_backups_total{strategy="siso",status="success"} 1' in lines
+
+
+def test_logging_observer(caplog):
+    source, destination = BytesSource(b"foo"), FileStreamDestination(io.BytesIO())
+    collector = MetricsCollector()
+    boa = Boa(observer=Observers(collector, LoggingObserver()))
+
+    with caplog.at_level(logging.INFO, logger="boa"):
+        boa.backup(source, destination)
+    # chunk events are only logged at debug level
+    (record,) = caplog.records
+    assert record.boa["event"] == "finished"
+    assert record.boa["strategy"] == "siso"
+    assert record.boa["error"] is None
+
+    caplog.clear()
+    with caplog.at_level(logging.DEBUG, logger="boa"):
+        boa.backup(source, destination)
+    events = [record.boa["event"] for record in caplog.records]
+    assert events == ["read", "write", "finished"]
+    assert caplog.records[1].boa["destination"] == "FileStreamDestination"
+    assert collector.write_bytes == {"FileStreamDestination": 6}
+
+
+def test_observer_processes():
+    collector = MetricsCollector()
+    boa = Boa(max_workers=2, use_processes=True, observer=collector)
+    sources = [BytesSource(b"foo") for _ in range(2)]
+    boa.backup(sources, [FileStreamDestination(io.BytesIO()) for _ in range(2)])
+    # pairs are written in other processes, only the batch is reported
+    assert not collector.write_bytes
+    assert collector.backups == {("mimo", "success"): 1}
+    assert boa.observer is collector
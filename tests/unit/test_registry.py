@@ -0,0 +1,132 @@
+import subprocess
+import sys
+
+import pytest
+
+from boa import registry
+from boa.chunkstore import ChunkStoreDestination, ChunkStoreSource
+from boa.core import (
+    BytesSource,
+    CommandSource,
+    DirectorySource,
+    FilePathDestination,
+    FilePathSource,
+    get_destination,
+    get_source,
+)
+from boa.exception import InvalidDestinationException, InvalidSourceException
+from boa.registry import Registry, is_uri
+from boa.versions import VersionedDestination
+
+
+@pytest.mark.parametrize(
+    "obj, expected",
+    [
+        ("file:///tmp/a", True),
+        ("cmd://echo hello", True),
+        ("chunkstore://store?name=a", True),
+        ("/tmp/a", False),
+        ("C://a", False),
+        ("a/b://c", False),
+        (b"file:///tmp/a", False),
+    ],
+)
+def test_is_uri(obj, expected):
+    assert is_uri(obj) is expected
+
+
+def test_file_uri(tmp_path):
+    (tmp_path / "a.txt").write_bytes(b"content")
+    source = get_source(f"file://{tmp_path}/a%2Etxt")
+    assert isinstance(source, FilePathSource)
+    assert bytes(source) == b"content"
+    assert isinstance(get_source(f"file://{tmp_path}"), DirectorySource)
+
+    destination = get_destination(f"file://{tmp_path}/b.txt?durability=file")
+    assert isinstance(destination, FilePathDestination)
+    assert destination.durability == "file"
+
+
+def test_command_uri():
+    source = get_source("cmd://echo 'hello world'?timeout=5&nice=1")
+    assert isinstance(source, CommandSource)
+    assert source.args == ["echo", "hello world"]
+    assert (source.timeout, source.nice) == (5.0, 1)
+    assert bytes(source) == b"hello world\n"
+    assert bytes(get_source("cmd://echo a | tr a b?shell=true")) == b"b\n"
+
+
+def test_chunkstore_uri(tmp_path):
+    destination = get_destination(f"chunkstore://{tmp_path}?name=backup")
+    assert isinstance(destination, ChunkStoreDestination)
+    destination.write(b"content")
+    source = get_source(f"chunkstore://{tmp_path}?name=backup")
+    assert isinstance(source, ChunkStoreSource)
+    assert bytes(source) == b"content"
+
+
+def test_versions_uri(tmp_path):
+    destination = get_destination(f"versions://{tmp_path}?name=db&last=2&daily=7")
+    assert isinstance(destination, VersionedDestination)
+    assert destination.name == "db"
+    assert (destination.retention.last, destination.retention.tiers[0][0]) == (2, 7)
+
+
+def test_invalid_uris(tmp_path):
+    with pytest.raises(InvalidSourceException):
+        get_source("unknown://a")
+    with pytest.raises(InvalidDestinationException):
+        get_destination("cmd://echo")
+    with pytest.raises(ValueError):
+        get_source(f"file://{tmp_path}?unknown=1")
+    with pytest.raises(ValueError):
+        get_source(f"chunkstore://{tmp_path}")
+
+
+def test_register():
+    sources = Registry("source", "boa.tests", InvalidSourceException)
+    sources.register("bytes", lambda uri: BytesSource(uri.path.encode()))
+    sources.register("path", "os.path:join")
+    sources.register_type(int, lambda n: BytesSource(bytes(n)))
+    assert bytes(sources.get("bytes://a/b")) == b"/b"
+    assert sources.factory("path") is __import__("os").path.join
+    assert bytes(sources.get(3)) == bytes(3)
+    with pytest.raises(InvalidSourceException):
+        sources.get(1.5)
+
+
+def test_entry_points(monkeypatch):
+    class EntryPoint:
+        name = "plugin"
+
+        def load(self):
+            return lambda uri: BytesSource(uri.netloc.encode())
+
+    calls = []
+
+    def entry_points(group):
+        calls.append(group)
+        return [EntryPoint()]
+
+    monkeypatch.setattr(registry, "_entry_points", entry_points)
+    sources = Registry("source", "boa.tests", InvalidSourceException)
+    sources.register("known", lambda uri: BytesSource(b"known"))
+    # known schemes don't look for entry points
+    assert bytes(sources.get("known://")) == b"known"
+    assert calls == []
+    assert bytes(sources.get("plugin://data")) == b"data"
+    assert bytes(sources.get("plugin://again")) == b"again"
+    assert calls == ["boa.tests"]
+    assert sources.schemes() == ["known", "plugin"]
+
+
+def test_import_is_lazy():
+    code = (
+        "import sys, boa; "
+        "print(sorted(m for m in ('asyncio', 'telegram', 'boa.uri', 'boa.ext.telegram') "
+        "if m in sys.modules))"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code], stdout=subprocess.PIPE, check=True
+    ).stdout
+    assert output.strip() == b"[]"
@@ -0,0 +1,170 @@
+import hashlib
+import io
+import os
+
+import pytest
+
+from boa import Boa
+from boa.chunkstore import ChunkStoreDestination, ChunkStoreSource
+from boa.core import BytesSource, FilePathDestination, FilePathSource, FileStreamSource
+from boa.resume import Journal, _RollingHash, backup_resumable, resume_point
+
+INTERVAL = 64 * 1024
+CONTENT = os.urandom(1024 * 1024)
+
+
+class Interrupted(Exception):
+    pass
+
+
+def interrupt(destination, after):
+    """Make a destination fail once after bytes were written"""
+    write_chunk = destination.write_chunk
+    written = []
+
+    def failing_write_chunk(chunk):
+        if sum(written) >= after:
+            raise Interrupted
+        written.append(len(chunk))
+        write_chunk(chunk)
+
+    destination.write_chunk = failing_write_chunk
+    return destination
+
+
+def spy_reopen(monkeypatch, cls):
+    offsets = []
+    reopen = cls.reopen
+    monkeypatch.setattr(
+        cls,
+        "reopen",
+        lambda self, offset: offsets.append(offset) or reopen(self, offset),
+    )
+    return offsets
+
+
+def test_rolling_hash():
+    rolling = _RollingHash(hashlib.sha256(), 0)
+    for chunk in (b"foo", b"bar", b"baz"):
+        rolling.feed(chunk)
+    rolling.advance(4)
+    assert rolling.offset == 4
+    rolling.advance(9)
+    assert rolling.hexdigest() == hashlib.sha256(b"foobarbaz").hexdigest()
+
+
+def test_rolling_hash_window():
+    # chunks are hashed as they are fed, but the last window bytes
+    rolling = _RollingHash(hashlib.sha256(), 0, window=4)
+    for chunk in (b"foo", b"bar", b"baz", b"qux"):
+        rolling.feed(chunk)
+    assert rolling.offset == 6
+    rolling.advance(7)
+    with pytest.raises(ValueError):
+        rolling.advance(5)
+    rolling.advance(12)
+    assert rolling.hexdigest() == hashlib.sha256(b"foobarbazqux").hexdigest()
+
+
+def test_resume_file(tmp_path, monkeypatch):
+    src, dst = tmp_path / "src", tmp_path / "dst"
+    src.write_bytes(CONTENT)
+    offsets = spy_reopen(monkeypatch, FilePathDestination)
+    boa = Boa(checkpoint_interval=INTERVAL)
+
+    destination = interrupt(FilePathDestination(dst, resumable=True), 500000)
+    with pytest.raises(Interrupted):
+        boa.backup(FilePathSource(src), destination)
+    assert not dst.exists()
+    assert destination.partial_path.exists()
+    journal = Journal(destination.journal_path()).load()
+    assert journal["offset"] == 500000 - 500000 % INTERVAL + INTERVAL
+
+    # the next backup continues from the last checkpoint
+    boa.backup(FilePathSource(src), FilePathDestination(dst, resumable=True))
+    assert offsets == [0, journal["offset"]]
+    assert dst.read_bytes() == CONTENT
+    assert not destination.partial_path.exists()
+    assert not os.path.exists(destination.journal_path())
+
+
+def test_resume_restart(tmp_path):
+    src, dst = tmp_path / "src", tmp_path / "dst"
+    src.write_bytes(CONTENT)
+    destination = interrupt(FilePathDestination(dst, resumable=True), 200000)
+    with pytest.raises(Interrupted):
+        backup_resumable(FilePathSource(src), destination, INTERVAL)
+    journal = Journal(destination.journal_path())
+    assert resume_point(FilePathSource(src), destination, journal)[0] > 0
+
+    # a corrupted partial file is written again
+    with open(destination.partial_path, "r+b") as f:
+        f.write(b"corrupted")
+    assert resume_point(FilePathSource(src), destination, journal)[0] == 0
+
+    # and so is a changed source
+    destination = interrupt(FilePathDestination(dst, resumable=True), 200000)
+    with pytest.raises(Interrupted):
+        backup_resumable(FilePathSource(src), destination, INTERVAL)
+    src.write_bytes(CONTENT[::-1] + b"changed")
+    assert resume_point(FilePathSource(src), destination, journal)[0] == 0
+
+    destination = FilePathDestination(dst, resumable=True)
+    result, checksum = backup_resumable(FilePathSource(src), destination, INTERVAL)
+    assert dst.read_bytes() == CONTENT[::-1] + b"changed"
+    assert checksum == hashlib.sha256(CONTENT[::-1] + b"changed").hexdigest()
+
+
+def test_resume_stream(tmp_path, monkeypatch):
+    dst = tmp_path / "dst"
+    offsets = spy_reopen(monkeypatch, FilePathDestination)
+    boa = Boa(checkpoint_interval=INTERVAL, verify=True)
+
+    destination = interrupt(FilePathDestination(dst, resumable=True), 300000)
+    with pytest.raises(Interrupted):
+        boa.backup(FileStreamSource(io.BytesIO(CONTENT)), destination)
+
+    # streams are checked by hashing the same prefix
+    stream = io.BytesIO(b"header" + CONTENT)
+    stream.seek(6)
+    destination = FilePathDestination(dst, resumable=True)
+    boa.backup(FileStreamSource(stream), destination)
+    assert offsets[1] > 0
+    assert dst.read_bytes() == CONTENT
+
+    # a different stream starts again
+    destination = interrupt(FilePathDestination(dst, resumable=True), 300000)
+    with pytest.raises(Interrupted):
+        boa.backup(FileStreamSource(io.BytesIO(CONTENT)), destination)
+    destination = FilePathDestination(dst, resumable=True)
+    boa.backup(FileStreamSource(io.BytesIO(CONTENT[::-1])), destination)
+    assert offsets[-1] == 0
+    assert dst.read_bytes() == CONTENT[::-1]
+
+
+def test_resume_chunkstore(tmp_path, monkeypatch):
+    (tmp_path / "src").write_bytes(CONTENT)
+    source = FilePathSource(tmp_path / "src")
+    offsets = spy_reopen(monkeypatch, ChunkStoreDestination)
+    boa = Boa(checkpoint_interval=INTERVAL)
+
+    destination = ChunkStoreDestination(tmp_path / "store", "backup", resumable=True)
+    with pytest.raises(Interrupted):
+        boa.backup(source, interrupt(destination, 600000))
+    assert destination.store.recipes() == []
+
+    destination = ChunkStoreDestination(tmp_path / "store", "backup", resumable=True)
+    assert boa.backup(source, destination) == "backup"
+    assert 0 < offsets[1] < len(CONTENT)
+    assert bytes(ChunkStoreSource(tmp_path / "store", "backup")) == CONTENT
+
+    with pytest.raises(ValueError):
+        ChunkStoreDestination(tmp_path / "store", resumable=True)
+
+
+def test_resume_not_seekable(tmp_path):
+    # sources which can't seek are written from the start
+    destination = FilePathDestination(tmp_path / "dst", resumable=True)
+    Boa().backup(BytesSource(b"foo"), destination)
+    assert (tmp_path / "dst").read_bytes() == b"foo"
+    assert not destination.partial_path.exists()
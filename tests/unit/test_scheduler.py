@@ -0,0 +1,271 @@
+import datetime
+import json
+import threading
+import time
+
+import pytest
+
+from boa import memory
+from boa.__main__ import main
+from boa.scheduler import Job, Schedule, Scheduler, load_config
+
+START = datetime.datetime(2021, 3, 1, 12, 0)  # a Monday
+
+
+class Clock:
+    def __init__(self, now=START):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, **kwargs):
+        self.now += datetime.timedelta(**kwargs)
+
+
+class Runner:
+    """Run jobs only when released, recording those running at once"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.release = {}
+        self.running = set()
+        self.peak = 0
+
+    def __call__(self, job):
+        with self.lock:
+            event = self.release.setdefault(job.name, threading.Event())
+            self.running.add(job.name)
+            self.peak = max(self.peak, len(self.running))
+        event.wait(5)
+        with self.lock:
+            self.running.discard(job.name)
+            self.release.pop(job.name)
+        if job.name.startswith("failing"):
+            raise RuntimeError("failed")
+
+    def finish(self, name):
+        with self.lock:
+            self.release.setdefault(name, threading.Event()).set()
+
+
+def job(name, destination="/backups/a", schedule="* * * * *", **options):
+    return Job(name, schedule, "/data", destination, **options)
+
+
+@pytest.mark.parametrize(
+    "expression, after, expected",
+    [
+        ("* * * * *", START, START.replace(minute=1)),
+        ("*/15 * * * *", START.replace(minute=7), START.replace(minute=15)),
+        ("30 2 * * *", START, datetime.datetime(2021, 3, 2, 2, 30)),
+        ("0 0 1 * *", START, datetime.datetime(2021, 4, 1)),
+        (
+            "0 9 * * 1-5",
+            datetime.datetime(2021, 3, 5, 10),
+            datetime.datetime(2021, 3, 8, 9),
+        ),
+        ("0 0 * * 7", START, datetime.datetime(2021, 3, 7)),
+        # either restricted day field matches
+        ("0 0 13 * 5", START, datetime.datetime(2021, 3, 5)),
+        ("0 0,12 * * *", START, datetime.datetime(2021, 3, 2)),
+        ("@hourly", START, START.replace(hour=13)),
+        ("@yearly", START, datetime.datetime(2022, 1, 1)),
+        ("0 0 29 2 *", START, datetime.datetime(2024, 2, 29)),
+    ],
+)
+def test_schedule_next(expression, after, expected):
+    assert Schedule(expression).next(after) == expected
+
+
+@pytest.mark.parametrize(
+    "expression",
+    ["* * * *", "60 * * * *", "* * 0 * *", "5-1 * * * *", "*/0 * * * *", "a * * * *"],
+)
+def test_schedule_invalid(expression):
+    with pytest.raises(ValueError):
+        Schedule(expression)
+
+
+def test_schedule_never():
+    with pytest.raises(ValueError):
+        Schedule("0 0 30 2 *").next(START)
+
+
+def test_overlapping_run_skipped():
+    clock, runner = Clock(), Runner()
+    scheduler = Scheduler([job("a")], runner=runner, clock=clock)
+    assert scheduler.jobs["a"].next_run == START.replace(minute=1)
+
+    clock.advance(minutes=1)
+    scheduler.tick()
+    clock.advance(minutes=1)
+    scheduler.tick()
+    status = scheduler.status()["jobs"][0]
+    assert status["status"] == "running"
+    assert status["skipped"] == 1
+    assert status["next_run"] == START.replace(minute=3).isoformat()
+
+    runner.finish("a")
+    scheduler.join()
+    status = scheduler.status()["jobs"][0]
+    assert status["status"] == "success"
+    assert status["runs"] == 1
+    scheduler.shutdown()
+
+
+def test_concurrency_limits():
+    clock, runner = Clock(), Runner()
+    jobs = [job("a"), job("b"), job("c", "/other/c"), job("d", "/other/d")]
+    scheduler = Scheduler(
+        jobs,
+        max_workers=2,
+        destination_limits={"/backups": 1},
+        runner=runner,
+        clock=clock,
+    )
+    clock.advance(minutes=1)
+    scheduler.tick()
+    # b waits for /backups, d for a worker
+    assert {j["name"]: j["status"] for j in scheduler.status()["jobs"]} == {
+        "a": "running",
+        "b": "pending",
+        "c": "running",
+        "d": "pending",
+    }
+    for name in "acbd":
+        runner.finish(name)
+    scheduler.join()
+    assert runner.peak == 2
+    assert all(j["status"] == "success" for j in scheduler.status()["jobs"])
+    scheduler.shutdown()
+
+
+def test_priority():
+    runner = Runner()
+    jobs = [job("a"), job("bulk", priority="bulk"), job("urgent", priority="urgent")]
+    scheduler = Scheduler(jobs, max_workers=1, runner=runner, clock=Clock())
+    for name in ("a", "bulk", "urgent"):
+        scheduler.trigger(name)
+    runner.finish("a")
+    runner.finish("urgent")
+    for _ in range(500):
+        if scheduler.jobs["urgent"].status == "success":
+            break
+        time.sleep(0.01)
+    assert scheduler.jobs["urgent"].status == "success"
+    assert scheduler.jobs["bulk"].status == "running"
+    runner.finish("bulk")
+    scheduler.join()
+    scheduler.shutdown()
+
+
+def test_throttles():
+    scheduler = Scheduler(
+        [
+            Job(
+                "a",
+                "@daily",
+                {"command": ["true"], "nice": 10},
+                "/backups/a",
+                throttle={"bytes_per_second": 1000},
+            )
+        ],
+        throttle={"ops_per_second": 10},
+        destination_throttles={"/backups": {"bytes_per_second": 100}},
+    )
+    a = scheduler.jobs["a"]
+    assert a.sources().throttle is a.throttle
+    assert a.sources().nice == 10
+    assert a.destinations().throttle is scheduler.destination_throttles["/backups"]
+    assert a.shared_throttle is scheduler.throttle
+    with pytest.raises(ValueError):
+        job("b", priority="high")
+    scheduler.shutdown()
+
+
+def test_failure_and_status_file(tmp_path):
+    status_file = tmp_path / "status.json"
+    runner = Runner()
+    scheduler = Scheduler(
+        [job("failing")], status_file=status_file, runner=runner, clock=Clock()
+    )
+    assert scheduler.trigger("failing")
+    assert not scheduler.trigger("failing")
+    runner.finish("failing")
+    scheduler.join()
+    scheduler.shutdown()
+
+    status = json.loads(status_file.read_text())["jobs"][0]
+    assert status["status"] == "failure"
+    assert status["failures"] == 1
+    assert "failed" in status["last_error"]
+    assert "high_water" in json.loads(status_file.read_text())["memory"]
+
+
+def test_duplicate_names():
+    with pytest.raises(ValueError):
+        Scheduler([job("a"), job("a")])
+
+
+def test_run_once(tmp_path, capsys):
+    source = tmp_path / "data.txt"
+    source.write_bytes(b"content")
+    config = {
+        "status_file": str(tmp_path / "status.json"),
+        "jobs": [
+            {
+                "name": "data",
+                "schedule": "@daily",
+                "source": str(source),
+                "destination": [
+                    str(tmp_path / "a.txt"),
+                    str(tmp_path / "b.txt"),
+                    {"versions": str(tmp_path / "versions"), "retention": {"last": 3}},
+                ],
+                "verify": True,
+            },
+            {
+                "name": "command",
+                "schedule": "@daily",
+                "source": {"command": ["echo", "hello"]},
+                "destination": {"chunkstore": str(tmp_path / "store"), "name": "echo"},
+            },
+        ],
+    }
+    config_file = tmp_path / "boa.json"
+    config_file.write_text(json.dumps(config))
+    assert load_config(config_file) == config
+
+    assert main(["run", str(config_file), "--once", "data", "command"]) == 0
+    assert (tmp_path / "a.txt").read_bytes() == b"content"
+    assert (tmp_path / "b.txt").read_bytes() == b"content"
+    versions = (tmp_path / "versions").glob("backup.*Z.????????")
+    assert [p.read_bytes() for p in versions] == [b"content"]
+
+    capsys.readouterr()
+    assert main(["status", str(tmp_path / "status.json")]) == 0
+    out = capsys.readouterr().out
+    assert "data: success" in out
+    assert "command: success" in out
+
+
+def test_load_toml(tmp_path):
+    pytest.importorskip("tomllib")
+    config_file = tmp_path / "boa.toml"
+    config_file.write_text(
+        'max_workers = 2\n[destination_limits]\n"/mnt" = 1\n'
+        '[[jobs]]\nname = "a"\nschedule = "@daily"\nsource = "/data"\ndestination = "/mnt/a"\n'
+    )
+    scheduler = Scheduler.from_config(load_config(config_file))
+    assert scheduler.max_workers == 2
+    assert list(scheduler.jobs) == ["a"]
+    scheduler.shutdown()
+
+
+def test_memory_budget(monkeypatch):
+    monkeypatch.setattr(memory, "_budget", memory.MemoryBudget())
+    scheduler = Scheduler.from_config({"memory_budget": 1024, "jobs": []})
+    assert memory.get_budget().limit == 1024
+    assert scheduler.status()["memory"]["limit"] == 1024
+    scheduler.shutdown()
@@ -0,0 +1,184 @@
+import json
+import os
+
+import pytest
+
+from boa import Boa
+from boa.container import (
+    FOOTER,
+    INDEX_MAGIC,
+    MAGIC,
+    MEMBER_HEADER,
+    MEMBER_MAGIC,
+    Container,
+    ContainerSource,
+    Member,
+    pack,
+)
+from boa.core import BytesSource, FilePathDestination, get_destination, get_source
+from boa.sparse import (
+    HOLE_MIN_SIZE,
+    Hole,
+    SparseFilePathDestination,
+    SparseFilePathSource,
+    extents,
+    hole,
+    record_holes,
+)
+
+MiB = 1024 * 1024
+DATA = os.urandom(3 * HOLE_MIN_SIZE)
+
+
+def sparse_file(path, size=8 * MiB, at=(2 * MiB,)):
+    with open(path, "wb") as f:
+        for offset in at:
+            f.seek(offset)
+            f.write(DATA)
+        f.truncate(size)
+    return path
+
+
+def expected(size=8 * MiB, at=(2 * MiB,)):
+    content = bytearray(size)
+    for offset in at:
+        end = offset + len(DATA)
+        content[offset:end] = DATA
+    return bytes(content)
+
+
+def allocated(path):
+    return os.stat(path).st_blocks * 512
+
+
+@pytest.fixture
+def supports_holes(tmp_path):
+    path = sparse_file(tmp_path / "probe")
+    if allocated(path) >= 8 * MiB:
+        pytest.skip("The filesystem doesn't support sparse files")
+    os.remove(path)
+
+
+def test_hole_is_bytes():
+    assert hole(10) == bytes(10)
+    assert hole(10) is hole(10)
+    assert isinstance(hole(10), Hole)
+
+
+def test_extents(tmp_path, supports_holes):
+    path = sparse_file(tmp_path / "file")
+    with open(path, "rb") as f:
+        found = list(extents(f.fileno(), 0, 8 * MiB))
+    data = [(start, end) for start, end, is_data in found if is_data]
+    assert len(data) == 1
+    start, end = data[0]
+    assert start <= 2 * MiB and end >= 2 * MiB + len(DATA)
+    assert found[0][:2] == (0, start) and found[-1][1] == 8 * MiB
+
+
+def test_source(tmp_path, supports_holes):
+    source = SparseFilePathSource(sparse_file(tmp_path / "file"))
+    chunks = list(source.chunks(MiB))
+    assert b"".join(chunks) == expected()
+    assert sum(len(c) for c in chunks if isinstance(c, Hole)) >= 7 * MiB
+    offset = 2 * MiB + 1
+    assert b"".join(source.chunks_from(offset)) == expected()[offset:]
+
+
+def test_source_zero_blocks(tmp_path):
+    # written zeros, holes or not, are detected as such
+    path = tmp_path / "file"
+    path.write_bytes(DATA + bytes(4 * HOLE_MIN_SIZE) + DATA)
+    chunks = list(SparseFilePathSource(path).chunks(HOLE_MIN_SIZE))
+    assert b"".join(chunks) == path.read_bytes()
+    assert sum(isinstance(c, Hole) for c in chunks) == 4
+
+
+@pytest.mark.parametrize("at", [(2 * MiB,), (0, 8 * MiB - len(DATA)), ()])
+def test_destination(tmp_path, supports_holes, at):
+    source = SparseFilePathSource(sparse_file(tmp_path / "source", at=at))
+    destination = tmp_path / "destination"
+    Boa().backup(source, SparseFilePathDestination(destination))
+    assert destination.read_bytes() == expected(at=at)
+    assert allocated(destination) < MiB
+
+
+def test_destination_zero_chunks(tmp_path, supports_holes):
+    # holes of sources unaware of them are found in the zeros
+    content = DATA + bytes(8 * MiB)
+    destination = tmp_path / "destination"
+    Boa().backup(BytesSource(content), SparseFilePathDestination(destination))
+    assert destination.read_bytes() == content
+    assert allocated(destination) < MiB
+
+
+def test_write_file(tmp_path, supports_holes):
+    source = sparse_file(tmp_path / "source")
+    destination = SparseFilePathDestination(tmp_path / "destination")
+    destination.write_file(source)
+    assert (tmp_path / "destination").read_bytes() == expected()
+    assert allocated(tmp_path / "destination") < MiB
+
+
+def test_dense_destination(tmp_path):
+    # holes are plain zeros for other destinations
+    source = SparseFilePathSource(sparse_file(tmp_path / "source", size=MiB, at=(0,)))
+    Boa().backup(source, FilePathDestination(tmp_path / "destination"))
+    assert (tmp_path / "destination").read_bytes() == expected(size=MiB, at=(0,))
+
+
+def test_record_holes():
+    holes = []
+    chunks = [b"ab", hole(3), hole(3), b"c", hole(2)]
+    assert list(record_holes(iter(chunks), holes)) == chunks
+    assert holes == [(2, 6), (9, 2)]
+
+
+def test_container(tmp_path, supports_holes):
+    source = SparseFilePathSource(sparse_file(tmp_path / "source"))
+    bundle = tmp_path / "bundle.boa"
+    FilePathDestination(bundle).write_stream(
+        pack([source, BytesSource(b"dense")], ["disk", "b"])
+    )
+    # holes are in the index, not in the container
+    assert os.path.getsize(bundle) < MiB
+    disk, b = Container(bundle).members()
+    assert disk.size == 8 * MiB and disk.holes
+    assert (b.size, b.holes) == (5, ())
+
+    restored = tmp_path / "restored"
+    Container(bundle).extract("disk", SparseFilePathDestination(restored))
+    assert restored.read_bytes() == expected()
+    assert allocated(restored) < MiB
+    assert Container(bundle).read("b") == b"dense"
+
+
+def test_container_version_1(tmp_path):
+    # containers written before hole maps are still read
+    index = json.dumps({"version": 1, "members": [["a", 15, 3]]}).encode()
+    header = MEMBER_HEADER.pack(MEMBER_MAGIC, 1) + b"a"
+    bundle = tmp_path / "bundle.boa"
+    bundle.write_bytes(
+        MAGIC + header + b"foo" + index + FOOTER.pack(18, len(index), INDEX_MAGIC)
+    )
+    assert Container(bundle).members() == [Member("a", 15, 3, ())]
+    assert Container(bundle).read("a") == b"foo"
+
+
+def test_uris(tmp_path):
+    (tmp_path / "file").write_bytes(b"")
+    assert isinstance(
+        get_source(f"file://{tmp_path}/file?sparse=1"), SparseFilePathSource
+    )
+    destination = get_destination(f"file://{tmp_path}/file?sparse=1&resumable=1")
+    assert isinstance(destination, SparseFilePathDestination)
+    assert destination.resumable
+    with pytest.raises(ValueError):
+        get_destination(f"file://{tmp_path}/file?sparse=1&delta=1")
+
+
+def test_container_source(tmp_path, supports_holes):
+    source = SparseFilePathSource(sparse_file(tmp_path / "source"))
+    bundle = tmp_path / "bundle.boa"
+    Boa().backup(ContainerSource([source]), FilePathDestination(bundle))
+    assert Container(bundle).read("source") == expected()
@@ -0,0 +1,143 @@
+import sqlite3
+import sys
+import threading
+import time
+
+import pytest
+
+from boa import Boa, backup
+from boa.core import FilePathDestination, get_source
+from boa.exception import SQLiteBusyException
+from boa.sqlite import SQLiteSource
+
+ROWS = 2000
+# Connection.backup(), taking the snapshots, was added in Python 3.7.
+is_py36 = sys.version_info < (3, 7)
+requires_backup = pytest.mark.skipif(is_py36, reason="requires Python 3.7")
+
+
+@pytest.fixture
+def database(tmp_path):
+    path = tmp_path / "app.db"
+    with sqlite3.connect(str(path)) as connection:
+        connection.execute("create table items (id integer primary key, value text)")
+        connection.executemany(
+            "insert into items (value) values (?)",
+            (("x" * 100,) for _ in range(ROWS)),
+        )
+    connection.close()
+    return path
+
+
+def count(path):
+    connection = sqlite3.connect(str(path))
+    try:
+        assert connection.execute("pragma integrity_check").fetchone() == ("ok",)
+        return connection.execute("select count(*) from items").fetchone()[0]
+    finally:
+        connection.close()
+
+
+@requires_backup
+def test_backup(tmp_path, database):
+    steps = []
+    source = SQLiteSource(
+        database, pages=4, sleep=0, progress=lambda *status: steps.append(status)
+    )
+    Boa().backup(source, FilePathDestination(tmp_path / "copy.db"))
+    assert count(tmp_path / "copy.db") == ROWS
+    assert len(steps) > 1
+    assert steps[-1][1] == 0
+
+
+@requires_backup
+def test_connection(tmp_path):
+    connection = sqlite3.connect(":memory:", check_same_thread=False)
+    connection.execute("create table items (value text)")
+    connection.execute("insert into items values ('a')")
+    with pytest.raises(SQLiteBusyException):
+        # its own transaction would lock the backup out
+        bytes(SQLiteSource(connection))
+    connection.commit()
+    source = get_source(connection)
+    assert isinstance(source, SQLiteSource)
+    backup(connection, str(tmp_path / "copy.db"))
+    assert count(tmp_path / "copy.db") == 1
+    # the connection is still usable
+    assert connection.execute("select value from items").fetchall() == [("a",)]
+    connection.close()
+
+
+@requires_backup
+def test_concurrent_writes(tmp_path, database):
+    writes = 20
+
+    def write():
+        connection = sqlite3.connect(str(database), timeout=10)
+        for _ in range(writes):
+            with connection:
+                connection.execute("insert into items (value) values ('y')")
+            time.sleep(0.005)
+        connection.close()
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    try:
+        source = SQLiteSource(database, pages=1, sleep=0.001)
+        Boa().backup(source, FilePathDestination(tmp_path / "copy.db"))
+    finally:
+        writer.join()
+    # a consistent snapshot, taken at some point of the writes
+    assert ROWS <= count(tmp_path / "copy.db") <= ROWS + writes
+
+
+@requires_backup
+def test_sleep_between_steps(tmp_path, database):
+    start = time.monotonic()
+    Boa().backup(
+        SQLiteSource(database, pages=16, sleep=0.02),
+        FilePathDestination(tmp_path / "copy.db"),
+    )
+    steps = -(-database.stat().st_size // (16 * 4096))
+    assert time.monotonic() - start >= (steps - 1) * 0.02
+
+
+@requires_backup
+def test_busy_timeout(tmp_path, database):
+    locker = sqlite3.connect(str(database), isolation_level=None)
+    locker.execute("begin exclusive")
+    try:
+        with pytest.raises(SQLiteBusyException):
+            bytes(SQLiteSource(database, busy_timeout=0.2))
+    finally:
+        locker.execute("rollback")
+        locker.close()
+
+
+@requires_backup
+def test_read_only(tmp_path, database):
+    Boa().backup(SQLiteSource(database), FilePathDestination(tmp_path / "copy.db"))
+    # no journal or WAL files were created next to the database
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["app.db", "copy.db"]
+
+
+@requires_backup
+def test_missing_database(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        bytes(SQLiteSource(tmp_path / "missing.db"))
+    assert not (tmp_path / "missing.db").exists()
+
+
+@requires_backup
+def test_uri(tmp_path, database):
+    source = get_source(f"sqlite://{database}?pages=10&sleep=0.5")
+    assert isinstance(source, SQLiteSource)
+    assert (source.pages, source.sleep) == (10, 0.5)
+    backup(f"sqlite://{database}", str(tmp_path / "copy.db"))
+    assert count(tmp_path / "copy.db") == ROWS
+
+
+@pytest.mark.skipif(not is_py36, reason="Connection.backup is available")
+def test_not_implemented(database):
+    with pytest.raises(NotImplementedError):
+        bytes(SQLiteSource(database))
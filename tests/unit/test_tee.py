@@ -0,0 +1,139 @@
+import io
+import threading
+import time
+
+import pytest
+
+from boa.core import FileStreamDestination
+from boa.tee import tee
+
+
+class SlowDestination(FileStreamDestination):
+    def __init__(self, delay=0.0, fail_at=None):
+        super().__init__(io.BytesIO())
+        self.delay = delay
+        self.fail_at = fail_at
+        self.written = 0
+        self.aborted = False
+
+    def write_chunk(self, chunk):
+        time.sleep(self.delay)
+        if self.written == self.fail_at:
+            raise OSError("disk full")
+        self.written += 1
+        super().write_chunk(chunk)
+
+    def abort(self):
+        self.aborted = True
+        super().abort()
+
+
+def test_tee():
+    chunks = [bytes([i]) * 4 for i in range(16)]
+    destinations = [SlowDestination() for _ in range(3)]
+    outcomes = tee(iter(chunks), destinations, queue_size=2)
+    assert outcomes == [(None, None)] * 3
+    for destination in destinations:
+        assert destination.filestream.getvalue() == b"".join(chunks)
+
+
+def test_tee_backpressure():
+    queue_size = 2
+    read = []
+    slow = SlowDestination(delay=0.01)
+    lag = []
+
+    def chunks():
+        for i in range(10):
+            read.append(i)
+            lag.append(len(read) - slow.written)
+            yield b"x"
+
+    tee(chunks(), [SlowDestination(), slow], queue_size=queue_size)
+    # the reader is at most a full queue (plus the chunks in flight) ahead
+    assert max(lag) <= queue_size + 2
+
+
+def test_tee_concurrent():
+    delay, length = 0.05, 4
+    destinations = [SlowDestination(delay=delay) for _ in range(length)]
+    start = time.monotonic()
+    tee(iter([b"foo"] * 2), destinations)
+    assert time.monotonic() - start < delay * 2 * length
+
+
+def test_tee_errors():
+    # a failing destination is aborted, the others complete
+    destinations = [SlowDestination(fail_at=1), SlowDestination()]
+    outcomes = tee(iter([b"foo"] * 20), destinations, queue_size=1)
+    assert isinstance(outcomes[0][1], OSError)
+    assert destinations[0].aborted
+    assert outcomes[1] == (None, None)
+    assert destinations[1].filestream.getvalue() == b"foo" * 20
+
+    # a failing source aborts every destination
+    def failing():
+        yield b"foo"
+        raise RuntimeError
+
+    destinations = [SlowDestination(), SlowDestination()]
+    threads = threading.active_count()
+    with pytest.raises(RuntimeError):
+        tee(failing(), destinations)
+    assert all(destination.aborted for destination in destinations)
+    assert threading.active_count() == threads
+
+
+class CountingDestination(SlowDestination):
+    active = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def write_chunk(self, chunk):
+        cls = type(self)
+        with cls.lock:
+            cls.active += 1
+            cls.peak = max(cls.peak, cls.active)
+        try:
+            super().write_chunk(chunk)
+        finally:
+            with cls.lock:
+                cls.active -= 1
+
+
+def test_tee_max_workers():
+    threads = threading.active_count()
+    peak_threads = []
+    destinations = [CountingDestination(delay=0.01) for _ in range(6)]
+
+    def chunks():
+        for _ in range(5):
+            peak_threads.append(threading.active_count())
+            yield b"foo"
+
+    outcomes = tee(chunks(), destinations, queue_size=1, max_workers=2)
+    assert outcomes == [(None, None)] * 6
+    assert CountingDestination.peak == 2
+    # the source is read once, by the first wave of writers
+    assert max(peak_threads) == threads + 2
+    assert len(peak_threads) == 5
+    for destination in destinations:
+        assert destination.filestream.getvalue() == b"foo" * 5
+
+
+class Fatal(BaseException):
+    pass
+
+
+class FatalDestination(SlowDestination):
+    def write_chunk(self, chunk):
+        raise Fatal
+
+
+def test_tee_base_exception():
+    # a writer dying of a non-Exception must not block the reader
+    destinations = [FatalDestination(), SlowDestination()]
+    outcomes = tee(iter([b"foo"] * 20), destinations, queue_size=1)
+    assert isinstance(outcomes[0][1], Fatal)
+    assert destinations[0].aborted
+    assert outcomes[1] == (None, None)
@@ -0,0 +1,127 @@
+import os
+import pickle
+import shutil
+import threading
+import time
+
+import pytest
+
+from boa import Boa
+from boa.core import (
+    IOPRIO_CLASS_IDLE,
+    BytesSource,
+    CommandSource,
+    FilePathDestination,
+    FilePathSource,
+)
+from boa.throttle import (
+    PRIORITY_BULK,
+    PRIORITY_URGENT,
+    Throttle,
+    TokenBucket,
+    throttled,
+)
+
+
+def elapsed(func, *args):
+    start = time.monotonic()
+    func(*args)
+    return time.monotonic() - start
+
+
+def test_token_bucket_rate():
+    bucket = TokenBucket(1000, burst=100)
+
+    def consume():
+        for _ in range(4):
+            bucket.acquire(100)
+
+    # the first 100 tokens are in the bucket
+    assert elapsed(consume) >= 0.29
+
+
+def test_token_bucket_debt():
+    bucket = TokenBucket(1000, burst=100)
+    # larger than the burst, granted at once
+    assert elapsed(bucket.acquire, 300) < 0.1
+    assert elapsed(bucket.acquire, 100) >= 0.29
+
+
+def test_token_bucket_invalid():
+    with pytest.raises(ValueError):
+        TokenBucket(0)
+
+
+def test_token_bucket_priority():
+    bucket = TokenBucket(100, burst=10)
+    bucket.acquire(10)
+    order = []
+
+    def acquire(name, priority):
+        bucket.acquire(10, priority)
+        order.append(name)
+
+    bulk = threading.Thread(target=acquire, args=("bulk", PRIORITY_BULK))
+    urgent = threading.Thread(target=acquire, args=("urgent", PRIORITY_URGENT))
+    bulk.start()
+    time.sleep(0.02)
+    urgent.start()
+    bulk.join(5)
+    urgent.join(5)
+    assert order == ["urgent", "bulk"]
+
+
+def test_throttle_ops():
+    throttle = Throttle(ops_per_second=20)
+    chunks = [b"x"] * 30
+    # 20 operations in the bucket, 10 more at 20 per second
+    assert elapsed(list, throttled(chunks, [throttle])) >= 0.45
+
+
+def test_throttle_pickle():
+    throttle = pickle.loads(pickle.dumps(Throttle(1000, 10)))
+    throttle.acquire(10)
+    assert throttle.bytes.rate == 1000
+
+
+def test_boa_throttle(tmp_path):
+    content = os.urandom(256 * 1024)
+    source = tmp_path / "source"
+    source.write_bytes(content)
+    destination = tmp_path / "destination"
+
+    # four 64 KiB chunks, each waiting for 64 KiB at 512 KiB per second
+    # but the first, whose tokens are in the bucket
+    throttle = Throttle(bytes_per_second=512 * 1024, burst_seconds=0.1)
+    boa = Boa(throttle=throttle)
+    seconds = elapsed(
+        boa.backup, FilePathSource(source), FilePathDestination(destination)
+    )
+    assert seconds >= 0.3
+    assert destination.read_bytes() == content
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_destination_throttle(tmp_path, max_workers):
+    throttled_destination = FilePathDestination(tmp_path / "slow")
+    throttled_destination.throttle = Throttle(ops_per_second=50, burst_seconds=0.1)
+    destinations = [throttled_destination, FilePathDestination(tmp_path / "fast")]
+    source = BytesSource(b"x" * 1000)
+    source.chunks = lambda chunk_size=100: BytesSource.chunks(source, 100)
+
+    seconds = elapsed(Boa(max_workers=max_workers).backup, source, destinations)
+    assert seconds >= 0.09
+    assert (tmp_path / "slow").read_bytes() == b"x" * 1000
+    assert (tmp_path / "fast").read_bytes() == b"x" * 1000
+
+
+def test_command_nice():
+    base = os.nice(0)
+    assert bytes(CommandSource(["nice"], nice=3)).strip() == str(base + 3).encode()
+    output = bytes(CommandSource("nice", shell=True, nice=3))
+    assert output.strip() == str(base + 3).encode()
+
+
+@pytest.mark.skipif(shutil.which("ionice") is None, reason="ionice not available")
+def test_command_ionice():
+    assert bytes(CommandSource(["ionice"], ionice=IOPRIO_CLASS_IDLE)).strip() == b"idle"
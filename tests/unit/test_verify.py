@@ -0,0 +1,121 @@
+import hashlib
+import io
+
+import pytest
+
+from boa import Boa, backup
+from boa.chunkstore import ChunkStoreDestination
+from boa.core import (
+    BytesSource,
+    Destination,
+    FilePathDestination,
+    FilePathSource,
+    FileStreamDestination,
+)
+from boa.exception import BatchBackupException, ChecksumMismatchException
+from boa.verify import CHECKSUM_SUFFIX, check
+
+
+class CorruptingDestination(FileStreamDestination):
+    """Destination flipping the first byte it writes"""
+
+    def __init__(self):
+        super().__init__(io.BytesIO())
+
+    def close(self):
+        super().close()
+        buffer = self.filestream.getbuffer()
+        buffer[0] ^= 0xFF
+        del buffer
+
+
+class WriteOnlyDestination(Destination):
+    def write(self, content):
+        self.content = content
+
+
+def sha256(content):
+    return hashlib.sha256(content).hexdigest()
+
+
+def test_check(tmp_path):
+    destination = FilePathDestination(tmp_path / "foo")
+    destination.write(b"foo")
+    assert check(destination, sha256(b"foo")) == sha256(b"foo")
+    recorded = (tmp_path / ("foo" + CHECKSUM_SUFFIX)).read_text()
+    assert recorded == f"{sha256(b'foo')}  foo\n"
+
+    with pytest.raises(ChecksumMismatchException) as excinfo:
+        check(destination, sha256(b"bar"))
+    assert str(tmp_path / "foo") in str(excinfo.value)
+    assert excinfo.value.actual == sha256(b"foo")
+
+    # destinations which can't be read back are trusted
+    destination = WriteOnlyDestination()
+    destination.write(b"foo")
+    assert check(destination, sha256(b"bar")) is None
+
+
+def test_readback(tmp_path):
+    stream = io.BytesIO(b"head")
+    stream.seek(0, io.SEEK_END)
+    destination = FileStreamDestination(stream)
+    assert destination.readback() is None
+    destination.write(b"foo")
+    assert bytes(destination.readback()) == b"foo"
+
+    destination = ChunkStoreDestination(tmp_path)
+    destination.write(b"foo")
+    assert bytes(destination.readback()) == b"foo"
+
+
+@pytest.mark.parametrize("max_workers", [1, 4])
+def test_boa_backup_verify(tmp_path, max_workers):
+    boa = Boa(max_workers=max_workers, verify=True)
+    (tmp_path / "src").write_bytes(b"foo")
+    source = FilePathSource(tmp_path / "src")
+
+    # siso and miso
+    boa.backup(source, FilePathDestination(tmp_path / "a"))
+    assert (tmp_path / "a.sha256").read_text().startswith(sha256(b"foo"))
+    boa.backup([source, source], FilePathDestination(tmp_path / "b"))
+    assert (tmp_path / "b.sha256").read_text().startswith(sha256(b"foofoo"))
+    with pytest.raises(ChecksumMismatchException):
+        boa.backup(source, CorruptingDestination())
+
+    # simo and mimo, every mismatched pair fails on its own
+    destinations = [FileStreamDestination(io.BytesIO()), CorruptingDestination()]
+    with pytest.raises(BatchBackupException) as excinfo:
+        boa.backup(BytesSource(b"foo"), destinations)
+    assert excinfo.value.errors[0] is None
+    assert isinstance(excinfo.value.errors[1], ChecksumMismatchException)
+
+    sources = [BytesSource(b"foo"), BytesSource(b"bar"), BytesSource(b"baz")]
+    destinations = [
+        CorruptingDestination(),
+        FileStreamDestination(io.BytesIO()),
+        CorruptingDestination(),
+    ]
+    with pytest.raises(BatchBackupException) as excinfo:
+        boa.backup(sources, destinations)
+    errors = excinfo.value.errors
+    assert [type(error) for error in errors] == [
+        ChecksumMismatchException,
+        type(None),
+        ChecksumMismatchException,
+    ]
+    assert errors[2].expected == sha256(b"baz")
+
+
+def test_backup_verify(tmp_path, monkeypatch):
+    (tmp_path / "src").write_bytes(b"foo")
+    # the source is only read once
+    reads = []
+    chunks = FilePathSource.chunks
+    monkeypatch.setattr(
+        FilePathSource, "chunks", lambda self: reads.append(self) or chunks(self)
+    )
+    backup(str(tmp_path / "src"), str(tmp_path / "dst"), verify=True)
+    assert (tmp_path / "dst").read_bytes() == b"foo"
+    assert len(reads) == 2  # the source, then the destination read back
+    assert reads[1].filepath == tmp_path / "dst"
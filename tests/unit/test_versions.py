@@ -0,0 +1,143 @@
+import datetime
+import pathlib
+
+import pytest
+
+from boa import Boa
+from boa.core import BytesSource
+from boa.versions import GarbageCollector, Retention, Version, VersionedDestination
+
+
+def at(*args):
+    dt = datetime.datetime(*args)
+    return Version(pathlib.Path(dt.isoformat()), dt)
+
+
+def names(versions):
+    return [v.time.isoformat() for v in versions]
+
+
+def test_retention_keeps_all():
+    versions = [at(2021, 1, day) for day in range(1, 10)]
+    assert Retention().expired(versions) == []
+
+
+def test_retention_last():
+    versions = [at(2021, 1, day) for day in range(1, 6)]
+    expired = Retention(last=2).expired(versions)
+    assert names(expired) == names(versions[:3])
+
+
+def test_retention_tiers():
+    # every 6 hours for 60 days, from Friday 2021-01-01
+    start = datetime.datetime(2021, 1, 1)
+    versions = [
+        Version(pathlib.Path(str(i)), start + datetime.timedelta(hours=6 * i))
+        for i in range(4 * 60)
+    ]
+    retention = Retention(last=2, daily=3, weekly=3, monthly=3)
+    kept = sorted(
+        set(versions) - set(retention.expired(versions)), key=lambda v: v.time
+    )
+    assert names(kept) == [
+        "2021-01-31T18:00:00",  # monthly
+        "2021-02-21T18:00:00",  # weekly
+        "2021-02-27T18:00:00",  # daily
+        "2021-02-28T18:00:00",  # daily, weekly and monthly
+        "2021-03-01T12:00:00",  # last
+        "2021-03-01T18:00:00",  # last, daily, weekly and monthly
+    ]
+
+
+def test_retention_invalid():
+    with pytest.raises(ValueError):
+        Retention(last=-1)
+
+
+def test_garbage_collector(tmp_path):
+    paths = [tmp_path / f"v{i}" for i in range(10)]
+    for path in paths:
+        path.write_bytes(b"x")
+    collector = GarbageCollector(batch_size=3, pause=0)
+    collector.collect(paths + paths[:2] + [tmp_path / "missing"])
+    assert collector.drain(5)
+    assert collector.pending() == []
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_garbage_collector_steps(tmp_path):
+    paths = [tmp_path / f"v{i}" for i in range(5)]
+    for path in paths:
+        path.write_bytes(b"x")
+    collector = GarbageCollector(batch_size=2, pause=0)
+    collector._queue.extend(paths)
+    collector._queued.update(paths)
+    assert collector.step() == 2
+    assert sorted(tmp_path.iterdir()) == paths[2:]
+
+
+def test_versioned_destination(tmp_path):
+    collector = GarbageCollector(pause=0)
+    destination = VersionedDestination(
+        tmp_path / "versions", "db", Retention(last=2), collector=collector
+    )
+    for i in range(4):
+        Boa(verify=True).backup(BytesSource(f"content {i}".encode()), destination)
+    collector.drain(5)
+    # the checksums of expired versions are deleted too
+    assert len(list((tmp_path / "versions").glob("*.sha256"))) == 2
+
+    versions = destination.versions()
+    assert len(versions) == 2
+    assert [v.path.read_bytes() for v in versions] == [b"content 2", b"content 3"]
+    assert bytes(destination.source()) == b"content 3"
+    assert bytes(destination.readback()) == b"content 3"
+
+
+def test_versioned_destination_failure(tmp_path):
+    destination = VersionedDestination(tmp_path, "db")
+
+    def chunks():
+        yield b"partial"
+        raise RuntimeError
+
+    with pytest.raises(RuntimeError):
+        destination.write_stream(chunks())
+    assert destination.versions() == []
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_versioned_destination_concurrent(tmp_path, monkeypatch):
+    # writers starting at the same microsecond keep their own version
+    now = datetime.datetime(2021, 1, 1, tzinfo=datetime.timezone.utc)
+
+    class FrozenDatetime(datetime.datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return now
+
+    monkeypatch.setattr(datetime, "datetime", FrozenDatetime)
+    first = VersionedDestination(tmp_path, "db")
+    second = VersionedDestination(tmp_path, "db")
+    first.open()
+    second.open()
+    first.write_chunk(b"first")
+    second.write_chunk(b"second")
+    first.close()
+    second.close()
+    versions = first.versions()
+    assert sorted(v.path.read_bytes() for v in versions) == [b"first", b"second"]
+    assert {v.time for v in versions} == {datetime.datetime(2021, 1, 1)}
+
+
+def test_versioned_destination_legacy(tmp_path):
+    # versions named before the suffix are still listed
+    (tmp_path / "db.20210101T000000.000000Z").write_bytes(b"old")
+    (tmp_path / "db.20210102T000000.000000Z.0123abcd").write_bytes(b"new")
+    versions = VersionedDestination(tmp_path, "db").versions()
+    assert [v.path.read_bytes() for v in versions] == [b"old", b"new"]
+
+
+def test_versioned_destination_name():
+    with pytest.raises(ValueError):
+        VersionedDestination("/tmp", "a/b")